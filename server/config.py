@@ -4,6 +4,44 @@ import os
 GROQ_API_KEY      = os.environ.get("GROQ_API_KEY", "")
 GROQ_MODEL        = os.environ.get("GROQ_MODEL", "llama-3.3-70b-versatile")
 GROQ_MAX_TOKENS   = int(os.environ.get("GROQ_MAX_TOKENS", 4000))
+GROQ_FAST_MODEL   = os.environ.get("GROQ_FAST_MODEL", "llama-3.1-8b-instant")
+# HTTP pool shared by all in-flight Groq calls in one worker process
+GROQ_MAX_CONNECTIONS = int(os.environ.get("GROQ_MAX_CONNECTIONS", 500))
+GROQ_TIMEOUT_SECS    = float(os.environ.get("GROQ_TIMEOUT_SECS", 120))
+# Worker processes on this host (exported by gunicorn.conf.py). Budgets meant
+# for the whole host are shared through local SQLite files when there are several
+WEB_CONCURRENCY         = int(os.environ.get("WEB_CONCURRENCY", 1))
+# Upstream admission control — see services/governor.py. The token budget is
+# per host: memory (one worker) | sqlite (drawn on by every worker on the
+# host). Concurrency and the wait queue are per worker process.
+GROQ_TOKENS_PER_MINUTE  = int(os.environ.get("GROQ_TOKENS_PER_MINUTE", 30000))
+GROQ_BUDGET_BACKEND     = os.environ.get("GROQ_BUDGET_BACKEND", "sqlite" if WEB_CONCURRENCY > 1 else "memory")
+GROQ_BUDGET_SQLITE_PATH = os.environ.get("GROQ_BUDGET_SQLITE_PATH", "/tmp/lectureai_groq_budget.db")
+GROQ_MAX_CONCURRENT     = int(os.environ.get("GROQ_MAX_CONCURRENT", 64))
+GROQ_QUEUE_MAX          = int(os.environ.get("GROQ_QUEUE_MAX", 256))
+GROQ_QUEUE_TIMEOUT_SECS = float(os.environ.get("GROQ_QUEUE_TIMEOUT_SECS", 30))
+GROQ_MAX_RETRIES        = int(os.environ.get("GROQ_MAX_RETRIES", 3))
+
+# Per prompt kind: model, max_tokens, temperature and governor priority
+# (live | interactive | bulk). Kinds on GROQ_FAST_MODEL fall back to
+# GROQ_MODEL when their output fails validation. json_mode requests Groq's
+# JSON object output; turn it off for models that do not support it.
+MODEL_POLICIES = {
+    "notes":             {"model": GROQ_MODEL,      "max_tokens": 4000, "temperature": 0.7, "priority": "bulk"},
+    "slideshow":         {"model": GROQ_MODEL,      "max_tokens": 6000, "temperature": 0.7, "priority": "bulk", "json_mode": True},
+    "quiz":              {"model": GROQ_MODEL,      "max_tokens": 900,  "temperature": 0.7, "priority": "bulk", "json_mode": True},
+    "adaptive_question": {"model": GROQ_MODEL,      "max_tokens": 400,  "temperature": 0.7, "priority": "interactive", "json_mode": True},
+    "study_plan":        {"model": GROQ_MODEL,      "max_tokens": 1500, "temperature": 0.7, "priority": "interactive"},
+    "video_script":      {"model": GROQ_MODEL,      "max_tokens": 1200, "temperature": 0.7, "priority": "interactive"},
+    "slide_outline":     {"model": GROQ_MODEL,      "max_tokens": 2000, "temperature": 0.7, "priority": "bulk", "json_mode": True},
+    "ai_feedback":       {"model": GROQ_FAST_MODEL, "max_tokens": 300,  "temperature": 0.7, "priority": "interactive"},
+    "rubric":            {"model": GROQ_FAST_MODEL, "max_tokens": 900,  "temperature": 0.7, "priority": "interactive"},
+    "live_question":     {"model": GROQ_FAST_MODEL, "max_tokens": 400,  "temperature": 0.7, "priority": "live"},
+    "confusion_rescue":  {"model": GROQ_FAST_MODEL, "max_tokens": 500,  "temperature": 0.7, "priority": "live"},
+    "pacing_check":      {"model": GROQ_FAST_MODEL, "max_tokens": 300,  "temperature": 0.7, "priority": "live"},
+    "concept_check":     {"model": GROQ_FAST_MODEL, "max_tokens": 300,  "temperature": 0.7, "priority": "live"},
+    "student_question":  {"model": GROQ_FAST_MODEL, "max_tokens": 350,  "temperature": 0.7, "priority": "live"},
+}
 
 # ── Supabase ────────────────────────────────────────────────────
 SUPABASE_URL         = os.environ.get("SUPABASE_URL", "")
@@ -15,12 +53,83 @@ PORT         = int(os.environ.get("PORT", 5000))
 FLASK_ENV    = os.environ.get("FLASK_ENV", "production")
 SECRET_KEY   = os.environ.get("SECRET_KEY", "change-me-in-production")
 
+# ── Storage ─────────────────────────────────────────────────────
+# sqlite (DATA_DIR on this host) | supabase | memory (per worker, lost on restart).
+# STORAGE_TABLE_BACKENDS overrides single tables, e.g. "reactions=memory,lecture_library=supabase"
+STORAGE_BACKEND        = os.environ.get("STORAGE_BACKEND", "sqlite")
+STORAGE_TABLE_BACKENDS = {
+    table.strip(): backend.strip()
+    for table, _, backend in (pair.partition("=") for pair in os.environ.get("STORAGE_TABLE_BACKENDS", "").split(","))
+    if backend.strip()
+}
+
+# ── SQLite (storage backend) ────────────────────────────────────
+# Point DATA_DIR at a persistent disk in production; /tmp is wiped on every deploy
+DATA_DIR               = os.environ.get("DATA_DIR", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data"))
+DB_PATH                = os.environ.get("DB_PATH", os.path.join(DATA_DIR, "lectureai.db"))
+SQLITE_POOL_SIZE       = int(os.environ.get("SQLITE_POOL_SIZE", 16))        # idle connections kept per worker
+SQLITE_CACHE_KB        = int(os.environ.get("SQLITE_CACHE_KB", 16384))      # page cache per connection
+SQLITE_MMAP_MB         = int(os.environ.get("SQLITE_MMAP_MB", 128))
+SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get("SQLITE_BUSY_TIMEOUT_MS", 5000))
+SNAPSHOT_DIR           = os.environ.get("SNAPSHOT_DIR", os.path.join(DATA_DIR, "snapshots"))
+SNAPSHOT_INTERVAL_SECS = int(os.environ.get("SNAPSHOT_INTERVAL_SECS", 600))     # 0 disables snapshots
+SNAPSHOT_KEEP          = int(os.environ.get("SNAPSHOT_KEEP", 6))
+VACUUM_INTERVAL_HOURS  = float(os.environ.get("VACUUM_INTERVAL_HOURS", 24))
+VACUUM_MIN_FREE_RATIO  = float(os.environ.get("VACUUM_MIN_FREE_RATIO", 0.2))    # VACUUM only above this share of free pages
+
 # ── Rate Limits ─────────────────────────────────────────────────
 RATE_LIMIT_AI_MAX      = int(os.environ.get("RATE_LIMIT_AI_MAX", 10))
 RATE_LIMIT_AI_WINDOW   = int(os.environ.get("RATE_LIMIT_AI_WINDOW", 60))
+# memory (per worker) | sqlite (shared by workers on one host) | supabase (shared by all hosts).
+# N workers with memory limiters would allow N× the limit, so more than one
+# worker (WEB_CONCURRENCY) defaults to sqlite
+RATE_LIMIT_BACKEND     = os.environ.get("RATE_LIMIT_BACKEND", "sqlite" if WEB_CONCURRENCY > 1 else "memory")
+RATE_LIMIT_SQLITE_PATH = os.environ.get("RATE_LIMIT_SQLITE_PATH", "/tmp/lectureai_ratelimit.db")
+
+# ── Live push (services/live.py) ────────────────────────────────
+# memory: viewers only see writes handled by their own worker (fine with one worker).
+# sqlite: workers on one host relay events through a small local file.
+LIVE_BUS             = os.environ.get("LIVE_BUS", "sqlite")
+LIVE_BUS_SQLITE_PATH = os.environ.get("LIVE_BUS_SQLITE_PATH", "/tmp/lectureai_live.db")
+LIVE_BUS_POLL_MS     = int(os.environ.get("LIVE_BUS_POLL_MS", 250))
+LIVE_HEARTBEAT_SECS  = int(os.environ.get("LIVE_HEARTBEAT_SECS", 15))
+LIVE_QUEUE_MAX       = int(os.environ.get("LIVE_QUEUE_MAX", 100))      # per viewer; overflow forces a resync
+
+# ── Write-behind ingestion (services/ingest.py) ─────────────────
+# Reactions, confusion taps and attendance marks are acknowledged at once and
+# written in batches. A full queue drops new events; the spill files let a
+# restarted worker write what a crashed one had acknowledged.
+INGEST_QUEUE_MAX = int(os.environ.get("INGEST_QUEUE_MAX", 10000))     # pending events per queue, per worker
+INGEST_BATCH     = int(os.environ.get("INGEST_BATCH", 500))
+INGEST_FLUSH_MS  = int(os.environ.get("INGEST_FLUSH_MS", 200))
+INGEST_SPILL_DIR = os.environ.get("INGEST_SPILL_DIR", os.path.join(DATA_DIR, "ingest"))    # empty disables spilling
+
+# ── Class cache (services/class_cache.py) ───────────────────────
+# Parsed class records and notes per code, per worker; writes invalidate them
+# in every worker, the TTL only bounds staleness if that message is missed
+CLASS_CACHE_TTL_SECS    = int(os.environ.get("CLASS_CACHE_TTL_SECS", 300))
+CLASS_CACHE_MAX_ENTRIES = int(os.environ.get("CLASS_CACHE_MAX_ENTRIES", 1000))
+
+# ── Lecture library views (services/library_views.py) ──────────
+# Views are counted in memory and added to view_count and the trending score
+# in one bulk update per interval. Trending decays with this half-life; a new
+# value applies to each lecture's rank from its next view.
+LIBRARY_VIEW_FLUSH_SECS           = float(os.environ.get("LIBRARY_VIEW_FLUSH_SECS", 10))
+LIBRARY_TRENDING_HALF_LIFE_HOURS  = float(os.environ.get("LIBRARY_TRENDING_HALF_LIFE_HOURS", 72))
 
 # ── AI Cache TTL ────────────────────────────────────────────────
 AI_CACHE_TTL_HOURS = int(os.environ.get("AI_CACHE_TTL_HOURS", 24))
+# In-process L1 tier in front of the Supabase ai_cache table (per worker)
+AI_CACHE_L1_MAX_ENTRIES = int(os.environ.get("AI_CACHE_L1_MAX_ENTRIES", 512))
+AI_CACHE_L1_MAX_BYTES   = int(os.environ.get("AI_CACHE_L1_MAX_BYTES", 32 * 1024 * 1024))
+# Coalesce identical cache misses across workers via a lock row in ai_cache
+AI_FILL_LOCK_ENABLED = os.environ.get("AI_FILL_LOCK_ENABLED", "0") == "1"
+AI_FILL_LOCK_SECS    = int(os.environ.get("AI_FILL_LOCK_SECS", 90))
+
+# ── Semantic cache (Layer 2 live tools) ─────────────────────────
+SEMANTIC_CACHE_ENABLED   = os.environ.get("SEMANTIC_CACHE_ENABLED", "1") == "1"
+SEMANTIC_CACHE_THRESHOLD = float(os.environ.get("SEMANTIC_CACHE_THRESHOLD", 0.9))
+SEMANTIC_CACHE_TTL_SECS  = int(os.environ.get("SEMANTIC_CACHE_TTL_SECS", 3 * 3600))
 
 # ── Sendgrid / Email ────────────────────────────────────────────
 SENDGRID_API_KEY  = os.environ.get("SENDGRID_API_KEY", "")
@@ -0,0 +1,381 @@
+"""Versioned schema migrations for the SQLite store.
+
+The applied version lives in PRAGMA user_version. Each migration runs in
+its own write transaction, so gunicorn workers starting together apply it
+exactly once. Append new migrations to MIGRATIONS; never edit a shipped one.
+
+    python -m db.migrations            # migrate DB_PATH
+    python -m db.migrations --check    # migrate, then verify hot queries use their indexes
+"""
+import re
+import sqlite3
+import sys
+
+# Tables exactly as app.py's old init_db() created them
+BASELINE = [
+    """CREATE TABLE IF NOT EXISTS classes (
+        code TEXT PRIMARY KEY, teacher_email TEXT, teacher_name TEXT,
+        topic TEXT, level TEXT, data TEXT)""",
+    """CREATE TABLE IF NOT EXISTS assignments (
+        id TEXT PRIMARY KEY, class_code TEXT, teacher_email TEXT,
+        title TEXT, description TEXT, due_date TEXT,
+        max_score INTEGER DEFAULT 100, created_at TEXT)""",
+    """CREATE TABLE IF NOT EXISTS submissions (
+        id TEXT PRIMARY KEY, assignment_id TEXT, class_code TEXT,
+        student_email TEXT, student_name TEXT, content TEXT,
+        submitted_at TEXT, score INTEGER DEFAULT -1, feedback TEXT DEFAULT '')""",
+    """CREATE TABLE IF NOT EXISTS tests (
+        id TEXT PRIMARY KEY, class_code TEXT, teacher_email TEXT,
+        title TEXT, questions TEXT, time_limit INTEGER DEFAULT 0, created_at TEXT)""",
+    """CREATE TABLE IF NOT EXISTS test_submissions (
+        id TEXT PRIMARY KEY, test_id TEXT, class_code TEXT,
+        student_email TEXT, student_name TEXT, answers TEXT,
+        score INTEGER DEFAULT 0, total INTEGER DEFAULT 0, submitted_at TEXT)""",
+    """CREATE TABLE IF NOT EXISTS attendance (
+        id TEXT PRIMARY KEY, class_code TEXT, teacher_email TEXT,
+        student_name TEXT, session_date TEXT,
+        present INTEGER DEFAULT 1, created_at TEXT)""",
+    """CREATE TABLE IF NOT EXISTS discussions (
+        id TEXT PRIMARY KEY, class_code TEXT, student_name TEXT,
+        student_email TEXT, question TEXT, reply TEXT DEFAULT '',
+        replied_by TEXT DEFAULT '', created_at TEXT)""",
+    """CREATE TABLE IF NOT EXISTS reactions (
+        id TEXT PRIMARY KEY, class_code TEXT, student_email TEXT,
+        student_name TEXT, reaction TEXT, created_at TEXT)""",
+    # FIX: confusion_events was missing — heatmap broke silently
+    """CREATE TABLE IF NOT EXISTS confusion_events (
+        id TEXT PRIMARY KEY, class_code TEXT, student_email TEXT,
+        student_name TEXT, slide_index INTEGER DEFAULT 0,
+        slide_title TEXT DEFAULT '', created_at TEXT)""",
+    """CREATE TABLE IF NOT EXISTS lecture_library (
+        id TEXT PRIMARY KEY,
+        teacher_email TEXT NOT NULL,
+        teacher_name TEXT,
+        title TEXT NOT NULL,
+        topic TEXT NOT NULL,
+        subject TEXT DEFAULT '',
+        level TEXT DEFAULT 'Intermediate',
+        institution TEXT DEFAULT '',
+        notes TEXT NOT NULL,
+        class_code TEXT DEFAULT '',
+        is_public INTEGER DEFAULT 1,
+        view_count INTEGER DEFAULT 0,
+        saved_at TEXT NOT NULL,
+        year TEXT DEFAULT '')""",
+]
+
+
+# Every timestamp is written by datetime('now') as 'YYYY-MM-DD HH:MM:SS' UTC,
+# which sorts and compares correctly as plain text — so queries can range
+# over the raw column (and its index) instead of wrapping it in datetime().
+TIMESTAMP_COLUMNS = {
+    "assignments": "created_at",
+    "submissions": "submitted_at",
+    "tests": "created_at",
+    "test_submissions": "submitted_at",
+    "attendance": "created_at",
+    "discussions": "created_at",
+    "reactions": "created_at",
+    "confusion_events": "created_at",
+    "lecture_library": "saved_at",
+}
+
+CANONICAL_TIMESTAMPS = [
+    f"""UPDATE {table} SET {col}=datetime({col})
+    WHERE datetime({col}) IS NOT NULL AND {col} != datetime({col})"""
+    for table, col in TIMESTAMP_COLUMNS.items()
+]
+
+# Natural keys the handlers already treat as unique (select-then-update).
+# Older databases may hold duplicates from concurrent requests; keep the
+# most recently inserted row of each group.
+UNIQUE_KEYS = {
+    "ux_submissions_assignment_student": ("submissions", "assignment_id, student_email"),
+    "ux_test_submissions_test_student": ("test_submissions", "test_id, student_email"),
+    "ux_attendance_class_date_student": ("attendance", "class_code, session_date, student_name"),
+    "ux_library_teacher_topic": ("lecture_library", "teacher_email, topic"),
+}
+
+UNIQUE_CONSTRAINTS = [
+    stmt
+    for name, (table, cols) in UNIQUE_KEYS.items()
+    for stmt in (
+        f"DELETE FROM {table} WHERE rowid NOT IN (SELECT MAX(rowid) FROM {table} GROUP BY {cols})",
+        f"CREATE UNIQUE INDEX IF NOT EXISTS {name} ON {table} ({cols})",
+    )
+]
+
+INDEXES = [
+    "CREATE INDEX IF NOT EXISTS idx_assignments_class_created ON assignments (class_code, created_at)",
+    "CREATE INDEX IF NOT EXISTS idx_submissions_assignment_submitted ON submissions (assignment_id, submitted_at)",
+    "CREATE INDEX IF NOT EXISTS idx_tests_class_created ON tests (class_code, created_at)",
+    "CREATE INDEX IF NOT EXISTS idx_test_submissions_test_submitted ON test_submissions (test_id, submitted_at)",
+    "CREATE INDEX IF NOT EXISTS idx_reactions_class_created ON reactions (class_code, created_at)",
+    "CREATE INDEX IF NOT EXISTS idx_confusion_class_created ON confusion_events (class_code, created_at)",
+    "CREATE INDEX IF NOT EXISTS idx_discussions_class_created ON discussions (class_code, created_at)",
+    "CREATE INDEX IF NOT EXISTS idx_library_public_saved ON lecture_library (is_public, saved_at)",
+]
+
+# Incremental confusion heatmap: per-slide counters, the distinct students
+# behind them and per-minute history, backfilled from the raw events. A
+# student is keyed by email, falling back to name for anonymous joins.
+CONFUSION_COUNTERS = [
+    """CREATE TABLE IF NOT EXISTS confusion_slides (
+        class_code TEXT NOT NULL,
+        slide_index INTEGER NOT NULL,
+        slide_title TEXT DEFAULT '',
+        events INTEGER DEFAULT 0,
+        students INTEGER DEFAULT 0,
+        last_at TEXT,
+        PRIMARY KEY (class_code, slide_index))""",
+    """CREATE TABLE IF NOT EXISTS confusion_students (
+        class_code TEXT NOT NULL,
+        slide_index INTEGER NOT NULL,
+        student_email TEXT NOT NULL,
+        PRIMARY KEY (class_code, slide_index, student_email))""",
+    """CREATE TABLE IF NOT EXISTS confusion_history (
+        class_code TEXT NOT NULL,
+        minute TEXT NOT NULL,
+        slide_index INTEGER NOT NULL,
+        events INTEGER DEFAULT 0,
+        PRIMARY KEY (class_code, minute, slide_index))""",
+    """INSERT OR IGNORE INTO confusion_students (class_code, slide_index, student_email)
+    SELECT DISTINCT class_code, slide_index, COALESCE(NULLIF(student_email, ''), student_name, '')
+    FROM confusion_events""",
+    # The bare slide_title comes from the MAX(created_at) row, i.e. the latest title
+    """INSERT OR REPLACE INTO confusion_slides
+        (class_code, slide_index, slide_title, events, students, last_at)
+    SELECT class_code, slide_index, slide_title, COUNT(*),
+           COUNT(DISTINCT COALESCE(NULLIF(student_email, ''), student_name, '')), MAX(created_at)
+    FROM confusion_events GROUP BY class_code, slide_index""",
+    """INSERT OR REPLACE INTO confusion_history (class_code, minute, slide_index, events)
+    SELECT class_code, substr(created_at, 1, 16), slide_index, COUNT(*)
+    FROM confusion_events GROUP BY class_code, substr(created_at, 1, 16), slide_index""",
+]
+
+# Full-text index over the library: FTS5 with BM25 ranking and prefix indexes.
+# It keeps its own copy of the text under a stable docid — lecture_library has
+# no INTEGER PRIMARY KEY, so its rowids may change on VACUUM and cannot back an
+# external-content index. Triggers keep it in step with every write.
+_LIBRARY_TEXT = "topic, title, subject, teacher_name, notes"
+_LIBRARY_DOCID = "(SELECT docid FROM lecture_library_docids WHERE id={}.id)"
+
+LIBRARY_SEARCH = [
+    """CREATE TABLE IF NOT EXISTS lecture_library_docids (
+        docid INTEGER PRIMARY KEY,
+        id TEXT NOT NULL UNIQUE)""",
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS lecture_library_fts USING fts5(
+        id UNINDEXED, {_LIBRARY_TEXT},
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3')""",
+    f"""CREATE TRIGGER IF NOT EXISTS lecture_library_fts_insert AFTER INSERT ON lecture_library BEGIN
+        INSERT INTO lecture_library_docids (id) VALUES (new.id);
+        INSERT INTO lecture_library_fts (rowid, id, {_LIBRARY_TEXT})
+        VALUES ({_LIBRARY_DOCID.format("new")}, new.id, new.topic, new.title, new.subject,
+                new.teacher_name, new.notes);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS lecture_library_fts_update
+    AFTER UPDATE OF {_LIBRARY_TEXT} ON lecture_library BEGIN
+        DELETE FROM lecture_library_fts WHERE rowid={_LIBRARY_DOCID.format("old")};
+        INSERT INTO lecture_library_fts (rowid, id, {_LIBRARY_TEXT})
+        VALUES ({_LIBRARY_DOCID.format("new")}, new.id, new.topic, new.title, new.subject,
+                new.teacher_name, new.notes);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS lecture_library_fts_delete AFTER DELETE ON lecture_library BEGIN
+        DELETE FROM lecture_library_fts WHERE rowid={_LIBRARY_DOCID.format("old")};
+        DELETE FROM lecture_library_docids WHERE id=old.id;
+    END""",
+    "INSERT OR IGNORE INTO lecture_library_docids (id) SELECT id FROM lecture_library",
+    f"""INSERT INTO lecture_library_fts (rowid, id, {_LIBRARY_TEXT})
+    SELECT d.docid, l.id, l.topic, l.title, l.subject, l.teacher_name, l.notes
+    FROM lecture_library l JOIN lecture_library_docids d ON d.id=l.id""",
+]
+
+# Library browsing pages by keyset on (saved_at, id); the id tie-breaker must be
+# in the index or every page sorts its ties in a temp b-tree
+LIBRARY_KEYSET = [
+    "CREATE INDEX IF NOT EXISTS idx_library_public_saved_id ON lecture_library (is_public, saved_at, id)",
+    "DROP INDEX IF EXISTS idx_library_public_saved",
+]
+
+# Trending library lectures: views weighted by how recently they happened, kept
+# as an additive score so the ranking is an index scan (LibraryRepo.add_views)
+LIBRARY_TRENDING = [
+    "ALTER TABLE lecture_library ADD COLUMN trend_score REAL DEFAULT 0",
+    "CREATE INDEX IF NOT EXISTS idx_library_public_trend ON lecture_library (is_public, trend_score, id)",
+]
+
+# Class metadata lives in columns; fields without one go to `extra`, and notes
+# (and any later per-class artifact) to class_artifacts, so attaching notes
+# neither rewrites nor reparses the class row. `data` is emptied, not dropped.
+_CLASS_COLUMN_KEYS = "'$.code', '$.teacherEmail', '$.teacherName', '$.topic', '$.level', '$.notes'"
+
+CLASS_COLUMNS = [
+    "ALTER TABLE classes ADD COLUMN extra TEXT DEFAULT '{}'",
+    """CREATE TABLE IF NOT EXISTS class_artifacts (
+        class_code TEXT NOT NULL,
+        kind TEXT NOT NULL,
+        body TEXT DEFAULT '',
+        updated_at TEXT,
+        PRIMARY KEY (class_code, kind))""",
+    """INSERT OR REPLACE INTO class_artifacts (class_code, kind, body, updated_at)
+    SELECT code, 'notes', json_extract(data, '$.notes'), datetime('now') FROM classes
+    WHERE json_valid(data) AND COALESCE(json_extract(data, '$.notes'), '') != ''""",
+    f"""UPDATE classes SET extra=json_remove(data, {_CLASS_COLUMN_KEYS}), data=NULL
+    WHERE json_valid(data)""",
+]
+
+# Trending as a decayed total kept as of its last view, ranked by when it
+# will have decayed to one view (storage.backends.Decay): migration 8's
+# epoch-weighted score grew without bound. Those scores are reset rather
+# than converted, since the half-life they were built with isn't known here;
+# trending refills from new views within a half-life.
+LIBRARY_TRENDING_DECAY = [
+    "ALTER TABLE lecture_library ADD COLUMN trend_at REAL DEFAULT 0",
+    "ALTER TABLE lecture_library ADD COLUMN trend_rank REAL DEFAULT 0",
+    "UPDATE lecture_library SET trend_score=0",
+    "CREATE INDEX IF NOT EXISTS idx_library_public_trend_rank ON lecture_library (is_public, trend_rank, id)",
+    "DROP INDEX IF EXISTS idx_library_public_trend",
+]
+
+MIGRATIONS: list[tuple[int, str, list[str]]] = [
+    (1, "baseline tables", BASELINE),
+    (2, "canonical text timestamps", CANONICAL_TIMESTAMPS),
+    (3, "dedupe and enforce natural keys", UNIQUE_CONSTRAINTS),
+    (4, "indexes for hot access paths", INDEXES),
+    (5, "confusion heatmap counters", CONFUSION_COUNTERS),
+    (6, "library full-text index", LIBRARY_SEARCH),
+    (7, "library keyset index", LIBRARY_KEYSET),
+    (8, "library trending score", LIBRARY_TRENDING),
+    (9, "class columns and artifacts", CLASS_COLUMNS),
+    (10, "library trending by decayed total", LIBRARY_TRENDING_DECAY),
+]
+
+LATEST = MIGRATIONS[-1][0]
+
+
+def current_version(conn: sqlite3.Connection) -> int:
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn: sqlite3.Connection) -> int:
+    """Apply every pending migration; returns the resulting version.
+
+    `conn` must be in autocommit mode (isolation_level=None).
+    """
+    for version, name, statements in MIGRATIONS:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Re-read under the write lock: another worker may have just applied it
+            if current_version(conn) >= version:
+                conn.execute("ROLLBACK")
+                continue
+            for statement in statements:
+                conn.execute(statement)
+            conn.execute(f"PRAGMA user_version={version}")
+            conn.execute("COMMIT")
+        except BaseException:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        print(f"[migrations] applied {version}: {name}")
+    conn.execute("PRAGMA optimize")
+    return current_version(conn)
+
+
+# ── Query plan check ────────────────────────────────────────────
+# The hot queries the storage repositories issue and the index each must
+# use. Keep in step with storage/ when either changes.
+
+HOT_QUERIES = [
+    ("SELECT * FROM assignments WHERE class_code=? ORDER BY created_at DESC",
+     "idx_assignments_class_created"),
+    ("SELECT id FROM submissions WHERE assignment_id=? AND student_email=?",
+     "ux_submissions_assignment_student"),
+    ("SELECT * FROM submissions WHERE assignment_id=? ORDER BY submitted_at DESC",
+     "idx_submissions_assignment_submitted"),
+    ("SELECT * FROM tests WHERE class_code=? ORDER BY created_at DESC",
+     "idx_tests_class_created"),
+    ("SELECT id FROM assignments WHERE class_code=?",
+     "idx_assignments_class_created"),
+    ("""SELECT COUNT(*), SUM(CASE WHEN score >= ? THEN 1 ELSE 0 END) FROM submissions
+        WHERE assignment_id IN (?,?,?)""",
+     "idx_submissions_assignment_submitted"),
+    ("SELECT COUNT(*), SUM(score), SUM(total) FROM test_submissions WHERE test_id IN (?,?,?)",
+     "idx_test_submissions_test_submitted"),
+    ("SELECT id FROM test_submissions WHERE test_id=? AND student_email=?",
+     "ux_test_submissions_test_student"),
+    ("SELECT * FROM test_submissions WHERE test_id=? ORDER BY submitted_at DESC",
+     "idx_test_submissions_test_submitted"),
+    ("""DELETE FROM reactions WHERE class_code=? AND student_email=?
+        AND created_at > datetime('now', '-30 seconds')""",
+     "idx_reactions_class_created"),
+    ("""SELECT reaction, COUNT(*) as cnt FROM reactions
+        WHERE class_code=? AND created_at > datetime('now', '-5 minutes') GROUP BY reaction""",
+     "idx_reactions_class_created"),
+    ("""SELECT student_name, slide_index, slide_title, created_at FROM confusion_events
+        WHERE class_code=? ORDER BY created_at DESC LIMIT 200""",
+     "idx_confusion_class_created"),
+    ("SELECT * FROM confusion_slides WHERE class_code=? ORDER BY slide_index",
+     "sqlite_autoindex_confusion_slides_1"),
+    ("SELECT * FROM confusion_history WHERE class_code=? AND minute > ? ORDER BY minute",
+     "sqlite_autoindex_confusion_history_1"),
+    ("SELECT id FROM attendance WHERE class_code=? AND student_name=? AND session_date=?",
+     "ux_attendance_class_date_student"),
+    ("SELECT * FROM attendance WHERE class_code=? ORDER BY session_date DESC, student_name",
+     "ux_attendance_class_date_student"),
+    ("SELECT * FROM discussions WHERE class_code=? ORDER BY created_at DESC",
+     "idx_discussions_class_created"),
+    ("SELECT id FROM lecture_library WHERE teacher_email=? AND topic=?",
+     "ux_library_teacher_topic"),
+    ("""SELECT t.id, bm25(lecture_library_fts) AS rank FROM lecture_library_fts
+        JOIN lecture_library t ON t.id=lecture_library_fts.id
+        WHERE lecture_library_fts MATCH ? AND t.is_public=?""",
+     "sqlite_autoindex_lecture_library_1"),
+    ("""SELECT id, title, saved_at FROM lecture_library WHERE is_public=1
+        AND (saved_at, id) < (?, ?) ORDER BY saved_at DESC, id DESC LIMIT ?""",
+     "idx_library_public_saved_id"),
+    ("""SELECT id, title, trend_score, trend_at FROM lecture_library WHERE is_public=1
+        ORDER BY trend_rank DESC, id DESC LIMIT ?""",
+     "idx_library_public_trend_rank"),
+    ("SELECT id, trend_score, trend_at FROM lecture_library WHERE id IN (?, ?)",
+     "sqlite_autoindex_lecture_library_1"),
+    ("UPDATE lecture_library SET trend_score=?, trend_at=?, trend_rank=? WHERE id=?",
+     "sqlite_autoindex_lecture_library_1"),
+    ("UPDATE lecture_library SET view_count=view_count+? WHERE id=?",
+     "sqlite_autoindex_lecture_library_1"),
+]
+
+
+def explain(conn: sqlite3.Connection, sql: str) -> list[str]:
+    params = (None,) * sql.count("?")
+    return [row[-1] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params)]
+
+
+def check(conn: sqlite3.Connection) -> list[str]:
+    """Problems with the hot query plans: a missing index, or a sort the index should avoid."""
+    problems = []
+    for sql, index in HOT_QUERIES:
+        plan = explain(conn, sql)
+        summary = re.sub(r"\s+", " ", sql).strip()
+        if not any(re.search(rf"USING (COVERING )?INDEX {index}\b", step) for step in plan):
+            problems.append(f"{summary}\n    expected {index}, got: {plan}")
+        elif "ORDER BY" in sql and any("TEMP B-TREE FOR ORDER BY" in step for step in plan):
+            problems.append(f"{summary}\n    sorts in a temp b-tree: {plan}")
+    return problems
+
+
+if __name__ == "__main__":
+    import os
+    from config import DATA_DIR, DB_PATH
+    # The app's restore() creates these before connecting; a fresh checkout has neither
+    os.makedirs(DATA_DIR, exist_ok=True)
+    os.makedirs(os.path.dirname(DB_PATH) or ".", exist_ok=True)
+    from db.sqlite_client import connection
+    with connection() as conn:
+        print(f"[migrations] schema version {migrate(conn)} (latest {LATEST})")
+        if "--check" in sys.argv:
+            failures = check(conn)
+            for failure in failures:
+                print(f"[migrations] FAIL {failure}")
+            print(f"[migrations] {len(HOT_QUERIES) - len(failures)}/{len(HOT_QUERIES)} hot queries use their index")
+            sys.exit(1 if failures else 0)
@@ -0,0 +1,184 @@
+"""Online snapshots, startup restore and compaction for the SQLite store.
+
+Snapshots use the sqlite3 backup API a few hundred pages at a time, so
+writers keep going while a copy is taken. One worker per host (whoever
+holds the maintenance flock) runs the schedule; the others stay idle
+and take over if it exits.
+
+    python -m db.snapshots            # take a snapshot now
+    python -m db.snapshots --restore  # replace DB_PATH with the latest snapshot
+"""
+import atexit
+import fcntl
+import glob
+import os
+import shutil
+import sqlite3
+import sys
+import threading
+import time
+from config import (DB_PATH, SNAPSHOT_DIR, SNAPSHOT_INTERVAL_SECS, SNAPSHOT_KEEP,
+                    VACUUM_INTERVAL_HOURS, VACUUM_MIN_FREE_RATIO)
+
+_PAGES_PER_STEP = 256
+
+
+def _snapshot_paths(snapshot_dir: str) -> list[str]:
+    # Names sort chronologically: snap-YYYYmmddTHHMMSS.db
+    return sorted(glob.glob(os.path.join(snapshot_dir, "snap-*.db")))
+
+
+def snapshot(db_path: str = DB_PATH, snapshot_dir: str = SNAPSHOT_DIR,
+             keep: int = SNAPSHOT_KEEP) -> str:
+    """Copy the live database into a new snapshot file; returns its path."""
+    os.makedirs(snapshot_dir, exist_ok=True)
+    path = os.path.join(snapshot_dir, time.strftime("snap-%Y%m%dT%H%M%S.db", time.gmtime()))
+    tmp = path + ".tmp"
+    src = sqlite3.connect(db_path)
+    dst = sqlite3.connect(tmp)
+    try:
+        # sleep between steps lets writers in; the copy stays consistent
+        src.backup(dst, pages=_PAGES_PER_STEP, sleep=0.005)
+    finally:
+        dst.close()
+        src.close()
+    os.replace(tmp, path)       # a half-written snapshot is never visible
+    for old in _snapshot_paths(snapshot_dir)[:-keep]:
+        os.remove(old)
+    return path
+
+
+def latest_snapshot(snapshot_dir: str = SNAPSHOT_DIR) -> str | None:
+    paths = _snapshot_paths(snapshot_dir)
+    return paths[-1] if paths else None
+
+
+def _is_healthy(db_path: str) -> bool:
+    if not os.path.exists(db_path) or os.path.getsize(db_path) == 0:
+        return False
+    try:
+        conn = sqlite3.connect(db_path)
+        try:
+            return conn.execute("PRAGMA quick_check").fetchone()[0] == "ok"
+        finally:
+            conn.close()
+    except sqlite3.DatabaseError:
+        return False
+
+
+def restore(db_path: str = DB_PATH, snapshot_dir: str = SNAPSHOT_DIR,
+            force: bool = False) -> str | None:
+    """Put the latest snapshot in place if the database is missing or corrupt.
+
+    Holds an exclusive flock so workers booting together restore once.
+    Returns the snapshot used, or None when nothing was restored.
+    """
+    os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+    with open(db_path + ".restore.lock", "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        if not force and _is_healthy(db_path):
+            return None
+        source = latest_snapshot(snapshot_dir)
+        if source is None:
+            return None
+        tmp = db_path + ".restoring"
+        shutil.copyfile(source, tmp)
+        for suffix in ("-wal", "-shm"):
+            # A stale WAL would be replayed on top of the restored file
+            if os.path.exists(db_path + suffix):
+                os.remove(db_path + suffix)
+        os.replace(tmp, db_path)
+        print(f"[snapshots] restored {db_path} from {source}")
+        return source
+
+
+def compact(conn: sqlite3.Connection, min_free_ratio: float = VACUUM_MIN_FREE_RATIO) -> bool:
+    """Checkpoint the WAL; VACUUM only when enough of the file is free pages.
+
+    Returns True if a VACUUM ran.
+    """
+    pages = conn.execute("PRAGMA page_count").fetchone()[0]
+    free = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    vacuumed = False
+    if pages and free / pages >= min_free_ratio:
+        conn.execute("VACUUM")
+        vacuumed = True
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    conn.execute("PRAGMA optimize")
+    return vacuumed
+
+
+class Maintenance:
+    """Background snapshot + compaction schedule for one host.
+
+    Snapshots are skipped while PRAGMA data_version is unchanged, so an
+    idle database does not churn out identical copies.
+    """
+
+    def __init__(self, db_path: str = DB_PATH, snapshot_dir: str = SNAPSHOT_DIR,
+                 snapshot_every: float = SNAPSHOT_INTERVAL_SECS,
+                 vacuum_every: float = VACUUM_INTERVAL_HOURS * 3600):
+        self.db_path = db_path
+        self.snapshot_dir = snapshot_dir
+        self.snapshot_every = snapshot_every
+        self.vacuum_every = vacuum_every
+        self._lock_file = None
+        self._conn: sqlite3.Connection | None = None
+        self._seen_version: int | None = None
+        self._next_vacuum = time.monotonic() + vacuum_every
+
+    def _lead(self) -> bool:
+        """Try to become this host's maintenance worker."""
+        if self._lock_file is None:
+            self._lock_file = open(self.db_path + ".maintenance.lock", "w")
+            try:
+                fcntl.flock(self._lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                self._lock_file.close()
+                self._lock_file = None
+                return False
+            # isolation_level=None: VACUUM cannot run inside a transaction
+            self._conn = sqlite3.connect(self.db_path, isolation_level=None)
+            atexit.register(self.final_snapshot)
+        return True
+
+    def tick(self) -> None:
+        if not self._lead():
+            return
+        version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+        if version != self._seen_version:
+            path = snapshot(self.db_path, self.snapshot_dir)
+            self._seen_version = version
+            print(f"[snapshots] wrote {path}")
+        if time.monotonic() >= self._next_vacuum:
+            if compact(self._conn):
+                print(f"[snapshots] vacuumed {self.db_path}")
+            self._next_vacuum = time.monotonic() + self.vacuum_every
+
+    def final_snapshot(self) -> None:
+        """Last copy on clean shutdown, so a redeploy loses nothing since the previous tick."""
+        try:
+            self.tick()
+        except Exception as e:
+            print(f"[snapshots] final snapshot failed: {e}")
+
+    def run(self) -> None:
+        while True:
+            time.sleep(self.snapshot_every)
+            try:
+                self.tick()
+            except Exception as e:
+                print(f"[snapshots] maintenance error: {e}")
+
+    def start(self) -> None:
+        if self.snapshot_every <= 0:
+            return
+        threading.Thread(target=self.run, name="sqlite-maintenance", daemon=True).start()
+
+
+if __name__ == "__main__":
+    if "--restore" in sys.argv:
+        used = restore(force=True)
+        print(f"[snapshots] {'restored from ' + used if used else 'no snapshot to restore'}")
+    else:
+        print(f"[snapshots] wrote {snapshot()}")
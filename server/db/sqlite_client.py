@@ -0,0 +1,133 @@
+import queue
+import sqlite3
+import time
+from contextlib import contextmanager
+from typing import Iterator
+from config import (DB_PATH, SQLITE_POOL_SIZE, SQLITE_CACHE_KB, SQLITE_MMAP_MB,
+                    SQLITE_BUSY_TIMEOUT_MS)
+from db.migrations import migrate
+from db.snapshots import restore
+
+
+# Under gevent, SQLite's busy handler sleeps inside C and stalls every greenlet
+# in the worker, so connections get only a short busy_timeout there and the
+# wait for the write lock happens in immediate(), with a cooperative sleep.
+_COOPERATIVE_BUSY_MS = 5
+
+
+def cooperative() -> bool:
+    """True when gevent has monkey-patched this process (the default gunicorn worker)."""
+    try:
+        from gevent import monkey
+    except ImportError:
+        return False
+    return monkey.is_module_patched("time")
+
+
+def busy_timeout_ms() -> int:
+    """busy_timeout for a new connection: the full wait, or a short slice under gevent."""
+    return _COOPERATIVE_BUSY_MS if cooperative() else SQLITE_BUSY_TIMEOUT_MS
+
+
+@contextmanager
+def immediate(conn: sqlite3.Connection, timeout_ms: int = SQLITE_BUSY_TIMEOUT_MS) -> Iterator[sqlite3.Connection]:
+    """One write transaction on `conn`; commits on success, rolls back on error.
+
+    BEGIN IMMEDIATE takes the write lock up front, so concurrent writers
+    wait for it instead of failing with "database is locked" when a read
+    transaction tries to upgrade. The wait is retried here, up to
+    `timeout_ms`, with time.sleep, which yields to other greenlets.
+    """
+    deadline = time.monotonic() + timeout_ms / 1000
+    delay = 0.001
+    while True:
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            break
+        except sqlite3.OperationalError as e:
+            if "database is locked" not in str(e) or time.monotonic() >= deadline:
+                raise
+            time.sleep(delay)
+            delay = min(delay * 2, 0.05)
+    try:
+        yield conn
+    except BaseException:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
+
+
+class ConnectionPool:
+    """Long-lived SQLite connections handed out one borrower at a time.
+
+    Connections are opened lazily in autocommit mode with WAL and tuned
+    pragmas, and kept (up to `size` idle) for reuse instead of being
+    reopened per request. A pool rather than a thread-local cache because
+    under the gevent worker every request is its own greenlet, and a
+    greenlet-local connection would die with the request.
+    """
+
+    def __init__(self, path: str, size: int):
+        self.path = path
+        self._idle: queue.LifoQueue[sqlite3.Connection] = queue.LifoQueue(maxsize=size)
+
+    def _open(self) -> sqlite3.Connection:
+        busy_ms = busy_timeout_ms()
+        conn = sqlite3.connect(self.path, timeout=busy_ms / 1000,
+                               isolation_level=None, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")       # durable at checkpoints; safe with WAL
+        conn.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_KB}")
+        conn.execute(f"PRAGMA mmap_size={SQLITE_MMAP_MB * 1024 * 1024}")
+        conn.execute(f"PRAGMA busy_timeout={busy_ms}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        return conn
+
+    def acquire(self) -> sqlite3.Connection:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            return self._open()
+
+    def release(self, conn: sqlite3.Connection) -> None:
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+            self._idle.put_nowait(conn)
+        except (sqlite3.Error, queue.Full):
+            # Pool is full, or the connection is broken — either way drop it
+            conn.close()
+
+
+_pool = ConnectionPool(DB_PATH, SQLITE_POOL_SIZE)
+
+
+@contextmanager
+def connection() -> Iterator[sqlite3.Connection]:
+    """Borrow a pooled connection in autocommit mode (reads, single statements)."""
+    conn = _pool.acquire()
+    try:
+        yield conn
+    finally:
+        _pool.release(conn)
+
+
+@contextmanager
+def transaction() -> Iterator[sqlite3.Connection]:
+    """Borrow a connection inside one write transaction (see immediate())."""
+    with connection() as conn, immediate(conn):
+        yield conn
+
+
+def init_schema() -> None:
+    """Restore a missing/corrupt database from its latest snapshot, then migrate it."""
+    restore()
+    with connection() as conn:
+        # Workers starting together queue on the migration lock; nothing is being served yet
+        conn.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+        try:
+            migrate(conn)
+        finally:
+            conn.execute(f"PRAGMA busy_timeout={busy_timeout_ms()}")
@@ -0,0 +1,23 @@
+-- Class records split out of the classes.data JSON blob on Supabase (Postgres).
+-- Run once in the SQL editor, after deploying the code that reads the new
+-- layout; the SQLite equivalent is migration 9 in server/db/migrations.py.
+
+alter table classes add column if not exists extra text default '{}';
+
+create table if not exists class_artifacts (
+    class_code text not null,
+    kind text not null,
+    body text default '',
+    updated_at text,
+    primary key (class_code, kind)
+);
+
+insert into class_artifacts (class_code, kind, body, updated_at)
+select code, 'notes', data::jsonb->>'notes', now()::text from classes
+where coalesce(data::jsonb->>'notes', '') <> ''
+on conflict (class_code, kind) do update set body = excluded.body, updated_at = excluded.updated_at;
+
+update classes
+set extra = (data::jsonb - 'code' - 'teacherEmail' - 'teacherName' - 'topic' - 'level' - 'notes')::text,
+    data = null
+where data is not null;
@@ -0,0 +1,56 @@
+-- Full-text search for the lecture library on Supabase (Postgres).
+-- Run once in the SQL editor. SupabaseBackend.text_search() calls these
+-- functions over PostgREST; the SQLite equivalent is migration 6 in
+-- server/db/migrations.py.
+--
+-- Weights mirror LibraryRepo.SEARCH_FIELDS: topic and title A, subject and
+-- teacher_name B, notes D. `query` is a prefix tsquery built by the backend
+-- ('linear:* & regr:*'); rank is negated so that lower is better, as in
+-- SQLite's bm25().
+
+create or replace function lecture_library_document(
+    topic text, title text, subject text, teacher_name text, notes text)
+returns tsvector language sql immutable as $$
+    select setweight(to_tsvector('english', coalesce(topic, '')), 'A')
+        || setweight(to_tsvector('english', coalesce(title, '')), 'A')
+        || setweight(to_tsvector('english', coalesce(subject, '')), 'B')
+        || setweight(to_tsvector('english', coalesce(teacher_name, '')), 'B')
+        || setweight(to_tsvector('english', coalesce(notes, '')), 'D')
+$$;
+
+create index if not exists idx_library_search on lecture_library using gin (
+    lecture_library_document(topic, title, subject, teacher_name, notes));
+
+create or replace function lecture_library_matches(query text, filters jsonb)
+returns table (lecture lecture_library, rank float8) language sql stable as $$
+    select l, -ts_rank_cd(lecture_library_document(l.topic, l.title, l.subject, l.teacher_name, l.notes),
+                          to_tsquery('english', query))::float8
+    from lecture_library l
+    where lecture_library_document(l.topic, l.title, l.subject, l.teacher_name, l.notes)
+            @@ to_tsquery('english', query)
+      and (filters->>'is_public' is null or l.is_public = (filters->>'is_public')::boolean)
+      and (filters->>'level' is null or l.level = filters->>'level')
+      and (filters->>'year' is null or l.year = filters->>'year')
+      and (filters->>'teacher_email' is null or l.teacher_email = filters->>'teacher_email')
+$$;
+
+-- One page, best first; (after_rank, after_id) is the last row of the previous
+-- page, skip_rows an offset for pages asked for by number. The drop replaces
+-- the earlier signature, which would otherwise remain as an ambiguous overload.
+drop function if exists lecture_library_search(text, jsonb, float8, text, int);
+
+create or replace function lecture_library_search(
+    query text, filters jsonb default '{}', after_rank float8 default null,
+    after_id text default null, max_rows int default null, skip_rows int default 0)
+returns setof jsonb language sql stable as $$
+    select to_jsonb(m.lecture) - 'notes' || jsonb_build_object('rank', m.rank)
+    from lecture_library_matches(query, filters) m
+    where after_id is null or (m.rank, (m.lecture).id::text) > (after_rank, after_id)
+    order by m.rank, (m.lecture).id::text
+    limit max_rows offset skip_rows
+$$;
+
+create or replace function lecture_library_search_count(query text, filters jsonb default '{}')
+returns bigint language sql stable as $$
+    select count(*) from lecture_library_matches(query, filters)
+$$;
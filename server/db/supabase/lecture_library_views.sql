@@ -0,0 +1,51 @@
+-- Bulk view counting and the trending score for the lecture library on
+-- Supabase (Postgres). Run once in the SQL editor. SupabaseBackend.increment_many()
+-- calls lecture_library_increment over PostgREST; the SQLite equivalent is
+-- migrations 8 and 10 in server/db/migrations.py.
+
+alter table lecture_library add column if not exists trend_score float8 default 0;
+alter table lecture_library add column if not exists trend_at float8 default 0;
+alter table lecture_library add column if not exists trend_rank float8 default 0;
+
+-- Rows never viewed since trend_at existed may hold an old epoch-weighted score
+update lecture_library set trend_score = 0 where coalesce(trend_at, 0) = 0;
+
+create index if not exists idx_library_public_trend_rank
+    on lecture_library (is_public, trend_rank desc, id desc);
+drop index if exists idx_library_public_trend;
+
+-- A decayed total as of `as_of` plus n views at `at`, as storage.backends.Decay.add():
+-- the total is aged to the later of the two, and ranked by when it decays to 1.
+-- Terms aged by more than 2^-60 are dropped, since Postgres raises on float underflow.
+create or replace function lecture_library_trend_add(total float8, as_of float8, n float8,
+                                                     at float8, half_life_secs float8)
+returns table (new_total float8, new_as_of float8, new_rank float8)
+language plpgsql immutable as $$
+declare
+    since float8 := coalesce(nullif(as_of, 0), at);
+    t float8 := greatest(coalesce(nullif(as_of, 0), at), at);
+begin
+    new_total := case when (since - t) / half_life_secs > -60
+                      then coalesce(total, 0) * power(2, (since - t) / half_life_secs) else 0 end
+               + case when (at - t) / half_life_secs > -60
+                      then n * power(2, (at - t) / half_life_secs) else 0 end;
+    new_as_of := t;
+    new_rank := case when new_total > 0 then t + half_life_secs * ln(new_total) / ln(2) else 0 end;
+    return next;
+end $$;
+
+drop function if exists lecture_library_increment(jsonb);
+
+-- deltas: {"<lecture id>": {"view_count": n, "trend_score": n}, ...}, seen at `at`
+-- (unix seconds). One UPDATE, so concurrent flushes from several workers never
+-- lose a view.
+create or replace function lecture_library_increment(deltas jsonb, at float8, half_life_secs float8)
+returns void language sql as $$
+    update lecture_library l
+    set view_count = coalesce(l.view_count, 0) + coalesce((d.value->>'view_count')::int, 0),
+        (trend_score, trend_at, trend_rank) = (
+            select * from lecture_library_trend_add(l.trend_score, l.trend_at,
+                coalesce((d.value->>'trend_score')::float8, 0), at, half_life_secs))
+    from jsonb_each(deltas) d
+    where l.id::text = d.key
+$$;
@@ -0,0 +1,29 @@
+# Gunicorn settings for LectureAI.
+#
+# Every AI route spends almost all of its time waiting on Groq over HTTP, so
+# the default sync worker (one request per process) leaves the CPU idle while
+# a few lecture generations queue everyone else. The gevent worker patches
+# sockets so each process multiplexes many in-flight LLM calls cooperatively.
+#
+#   gunicorn -c server/gunicorn.conf.py --chdir server app:app
+#
+# Environment overrides:
+#   WEB_WORKER_CLASS    gevent (default) | sync | gthread
+#   WEB_CONCURRENCY     worker processes (default 2)
+#   WORKER_CONNECTIONS  concurrent requests per gevent worker (default 500)
+#   WORKER_THREADS      threads per gthread worker (default 32)
+#   WORKER_TIMEOUT      seconds before a silent worker is killed (default 180)
+import os
+
+bind              = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+worker_class      = os.environ.get("WEB_WORKER_CLASS", "gevent")
+workers           = int(os.environ.get("WEB_CONCURRENCY", 2))
+# The app sizes per-host shared state (Groq token budget, rate limits) by the worker count
+os.environ["WEB_CONCURRENCY"] = str(workers)
+worker_connections = int(os.environ.get("WORKER_CONNECTIONS", 500))
+threads           = int(os.environ.get("WORKER_THREADS", 32)) if worker_class == "gthread" else 1
+# Notes/slideshow generations can take 40 s+; SSE streams stay open longer
+timeout           = int(os.environ.get("WORKER_TIMEOUT", 180))
+graceful_timeout  = 30
+keepalive         = 5
+accesslog         = "-"
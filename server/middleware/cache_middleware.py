@@ -1,39 +1,146 @@
 import hashlib
 import json
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime, timezone, timedelta
 from db.supabase_client import supabase
-from config import AI_CACHE_TTL_HOURS
+from config import AI_CACHE_TTL_HOURS, AI_CACHE_L1_MAX_ENTRIES, AI_CACHE_L1_MAX_BYTES
 
 
-def _cache_key(prompt_key: str, params: dict) -> str:
-    raw = f"{prompt_key}:{params.get('topic','')}:{params.get('level','')}:{params.get('language','English')}"
-    return hashlib.md5(raw.encode()).hexdigest()
+class L1Cache:
+    """Bounded, TTL-aware LRU kept in process memory.
+
+    Sized by entry count and by total UTF-8 bytes of cached responses.
+    Entries carry the same expiry as their ai_cache row, so the L1 tier
+    never serves something the table would already consider stale.
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._data: OrderedDict[str, tuple[str, float, int]] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> str | None:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            response, expires, _ = entry
+            if expires <= time.time():
+                self._remove(key)
+                return None
+            self._data.move_to_end(key)
+            return response
+
+    def put(self, key: str, response: str, expires: float) -> None:
+        size = len(response.encode("utf-8"))
+        if size > self.max_bytes or expires <= time.time():
+            return
+        with self._lock:
+            self._remove(key)
+            self._data[key] = (response, expires, size)
+            self._bytes += size
+            while len(self._data) > self.max_entries or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._data)))
+
+    def invalidate(self, key: str) -> None:
+        with self._lock:
+            self._remove(key)
+
+    def _remove(self, key: str) -> None:
+        entry = self._data.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[2]
+
+
+_l1 = L1Cache(AI_CACHE_L1_MAX_ENTRIES, AI_CACHE_L1_MAX_BYTES)
+
+
+# Bump whenever the canonical form below or the shape of a cached value
+# changes, so old rows stop matching (v3: quiz entries hold validated JSON)
+CACHE_KEY_VERSION = 3
+
+_stats: dict[str, dict[str, int]] = {}
+_stats_lock = threading.Lock()
+
+
+def _count(prompt_key: str, outcome: str) -> None:
+    with _stats_lock:
+        counters = _stats.setdefault(prompt_key, {"l1_hits": 0, "hits": 0, "misses": 0})
+        counters[outcome] += 1
+
+
+def cache_stats() -> dict:
+    """Hit/miss counters per prompt_key for this worker process."""
+    with _stats_lock:
+        per_key = {k: dict(v) for k, v in _stats.items()}
+    for counters in per_key.values():
+        total = counters["l1_hits"] + counters["hits"] + counters["misses"]
+        counters["hit_rate"] = round((counters["l1_hits"] + counters["hits"]) / total, 3) if total else 0.0
+    return {"key_version": CACHE_KEY_VERSION, "prompt_keys": per_key}
+
+
+def _canonical(value):
+    """Normalise a prompt parameter: collapse whitespace, casefold, stringify scalars."""
+    if isinstance(value, dict):
+        return {str(k): _canonical(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_canonical(v) for v in value]
+    if value is None:
+        return ""
+    return " ".join(str(value).split()).casefold()
+
+
+def cache_key(prompt_key: str, params: dict) -> str:
+    """Hash every prompt-affecting parameter, so differing prompts never share an entry."""
+    canon = {"v": CACHE_KEY_VERSION, "kind": prompt_key, "params": _canonical(params)}
+    raw = json.dumps(canon, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def _lookup(key: str) -> tuple[str | None, str]:
+    """Find a live entry; returns (response, tier) with tier "l1_hits", "hits" or "misses"."""
+    hit = _l1.get(key)
+    if hit is not None:
+        return hit, "l1_hits"
+    sb = supabase()
+    result = sb.table("ai_cache") \
+        .select("response,expires_at") \
+        .eq("cache_key", key) \
+        .gt("expires_at", datetime.now(timezone.utc).isoformat()) \
+        .limit(1) \
+        .execute()
+    if result.data:
+        row = result.data[0]
+        try:
+            _l1.put(key, row["response"], datetime.fromisoformat(row["expires_at"]).timestamp())
+        except (TypeError, ValueError):
+            pass
+        return row["response"], "hits"
+    return None, "misses"
 
 
 def get_cached(prompt_key: str, params: dict) -> str | None:
-    """Return cached AI response or None."""
+    """Return cached AI response or None (L1 memory first, then Supabase)."""
+    response, tier = None, "misses"
     try:
-        key = _cache_key(prompt_key, params)
-        sb = supabase()
-        result = sb.table("ai_cache") \
-            .select("response") \
-            .eq("cache_key", key) \
-            .gt("expires_at", datetime.now(timezone.utc).isoformat()) \
-            .limit(1) \
-            .execute()
-        if result.data:
-            return result.data[0]["response"]
+        response, tier = _lookup(cache_key(prompt_key, params))
     except Exception as e:
         print(f"[cache] get error: {e}")
-    return None
+    _count(prompt_key, tier)
+    return response
 
 
 def set_cache(prompt_key: str, params: dict, response: str,
               ttl_hours: int = AI_CACHE_TTL_HOURS) -> None:
-    """Store an AI response in Supabase cache."""
+    """Store an AI response in the L1 tier and the Supabase cache."""
     try:
-        key = _cache_key(prompt_key, params)
-        expires = (datetime.now(timezone.utc) + timedelta(hours=ttl_hours)).isoformat()
+        key = cache_key(prompt_key, params)
+        expires_dt = datetime.now(timezone.utc) + timedelta(hours=ttl_hours)
+        _l1.put(key, response, expires_dt.timestamp())
         sb = supabase()
         sb.table("ai_cache").upsert({
             "cache_key": key,
@@ -42,7 +149,66 @@ def set_cache(prompt_key: str, params: dict, response: str,
             "level": params.get("level", ""),
             "language": params.get("language", "English"),
             "response": response,
-            "expires_at": expires,
+            "expires_at": expires_dt.isoformat(),
         }).execute()
     except Exception as e:
         print(f"[cache] set error: {e}")
+
+
+# ── Cross-process fill lock ─────────────────────────────────────
+# A short-lived "lock:<key>" row in ai_cache marks that some worker is already
+# generating <key>. Inserting it fails on the primary key if another worker
+# holds it; expired locks are cleared first so a crashed holder never wedges.
+
+_UNIQUE_VIOLATION = "23505"     # Postgres SQLSTATE, carried as APIError.code by postgrest
+
+
+def acquire_fill_lock(prompt_key: str, params: dict, lease_secs: int) -> bool | None:
+    """Try to become the single worker generating this entry.
+
+    True if we hold the lock, False if another worker does, None if the
+    lock table could not be reached (generate without waiting).
+    """
+    lock_key = "lock:" + cache_key(prompt_key, params)
+    now = datetime.now(timezone.utc)
+    try:
+        sb = supabase()
+        sb.table("ai_cache").delete() \
+            .eq("cache_key", lock_key) \
+            .lt("expires_at", now.isoformat()).execute()
+        sb.table("ai_cache").insert({
+            "cache_key": lock_key,
+            "prompt_key": prompt_key,
+            "response": "",
+            "expires_at": (now + timedelta(seconds=lease_secs)).isoformat(),
+        }).execute()
+        return True
+    except Exception as e:
+        if str(getattr(e, "code", "")) == _UNIQUE_VIOLATION:
+            return False
+        print(f"[cache] lock error: {e}")
+        return None
+
+
+def release_fill_lock(prompt_key: str, params: dict) -> None:
+    try:
+        supabase().table("ai_cache").delete() \
+            .eq("cache_key", "lock:" + cache_key(prompt_key, params)).execute()
+    except Exception as e:
+        print(f"[cache] lock release error: {e}")
+
+
+def wait_for_fill(prompt_key: str, params: dict, timeout_secs: float,
+                  poll_secs: float = 0.5) -> str | None:
+    """Poll for an entry another worker is generating; None on timeout."""
+    key = cache_key(prompt_key, params)
+    deadline = time.time() + timeout_secs
+    while time.time() < deadline:
+        try:
+            response, _ = _lookup(key)
+            if response is not None:
+                return response
+        except Exception as e:
+            print(f"[cache] wait error: {e}")
+        time.sleep(poll_secs)
+    return None
@@ -0,0 +1,33 @@
+import hashlib
+import json
+from flask import Response, request
+
+
+def conditional_json(payload: dict) -> Response:
+    """JSON response with a strong ETag; 304 with no body if the client already has it.
+
+    Works for POST too: browsers never cache POST responses, so the client
+    keeps the last body itself and sends its ETag back as If-None-Match.
+    """
+    body = json.dumps(payload, separators=(",", ":"), sort_keys=True, default=str).encode("utf-8")
+    return conditional_body(body, hashlib.sha256(body).hexdigest()[:32])
+
+
+def conditional_body(body: bytes, etag: str, encoded: dict[str, bytes] | None = None) -> Response:
+    """A prepared JSON body and its ETag, as conditional_json() sends them.
+
+    `encoded` holds precompressed copies by content coding ("br", "gzip");
+    the best one the client accepts is sent as is. Each coding gets its own
+    ETag, since the bytes differ, and any of them revalidates.
+    """
+    encoded = encoded or {}
+    headers = {"ETag": f'"{etag}"', "Cache-Control": "no-cache"}
+    if encoded:
+        headers["Vary"] = "Accept-Encoding"
+    if any(request.if_none_match.contains(t) for t in (etag, *(f"{etag}-{enc}" for enc in encoded))):
+        return Response(status=304, headers=headers)
+    for enc in ("br", "gzip"):
+        if enc in encoded and enc in request.accept_encodings:
+            return Response(encoded[enc], mimetype="application/json",
+                            headers={**headers, "ETag": f'"{etag}-{enc}"', "Content-Encoding": enc})
+    return Response(body, mimetype="application/json", headers=headers)
@@ -1,35 +1,197 @@
-from collections import defaultdict
-from functools import wraps
+import math
+import sqlite3
+import threading
 import time
-from flask import request, jsonify
-from config import RATE_LIMIT_AI_MAX, RATE_LIMIT_AI_WINDOW
+from functools import wraps
+from typing import NamedTuple
+from flask import request, jsonify, make_response
+from config import (RATE_LIMIT_AI_MAX, RATE_LIMIT_AI_WINDOW, RATE_LIMIT_BACKEND,
+                    RATE_LIMIT_SQLITE_PATH)
+from db.sqlite_client import busy_timeout_ms, immediate
+
+
+class RateLimitResult(NamedTuple):
+    allowed: bool
+    limit: int
+    remaining: int
+    retry_after: int        # seconds until the next request would be allowed (0 if allowed)
+
+
+# ── Sliding-window counter ──────────────────────────────────────
+# Each identifier keeps only (window_start, count in current window, count in
+# previous window). The previous window's count is weighted by how much of it
+# still overlaps the sliding window, which approximates a true sliding log in
+# O(1) time and memory per identifier.
+
+def _estimate(state: tuple[float, int, int], now: float, window: int) -> tuple[float, int, int, float]:
+    """Roll `state` forward to `now`; return (window_start, curr, prev, estimated count)."""
+    start, curr, prev = state
+    elapsed_windows = int((now - start) // window)
+    if elapsed_windows >= 2:
+        start, curr, prev = start + elapsed_windows * window, 0, 0
+    elif elapsed_windows == 1:
+        start, curr, prev = start + window, 0, curr
+    weight = 1 - (now - start) / window
+    return start, curr, prev, prev * weight + curr
+
+
+def _retry_after(start: float, curr: int, prev: int, limit: int, window: int, now: float) -> int:
+    """Seconds until the estimate drops below `limit` again."""
+    if curr < limit and prev > 0:
+        # Still inside this window: wait for the previous window's weight to decay
+        t = start + window * (1 - (limit - curr) / prev)
+    else:
+        # Next window: this window's count becomes the decaying previous count
+        t = start + window + window * (1 - limit / max(curr, 1))
+    return max(1, math.ceil(t - now))
+
+
+def _decide(state, limit: int, window: int, now: float, consume: bool):
+    start, curr, prev, est = _estimate(state, now, window)
+    allowed = est < limit
+    if allowed and consume:
+        curr += 1
+        est += 1
+    remaining = max(0, int(limit - est))
+    retry = 0 if allowed else _retry_after(start, curr, prev, limit, window, now)
+    return (start, curr, prev), RateLimitResult(allowed, limit, remaining, retry)
+
+
+# ── Backends ────────────────────────────────────────────────────
+
+class MemoryBackend:
+    """Per-process state; idle identifiers are swept periodically."""
+
+    def __init__(self, sweep_every: int = 60):
+        self._state: dict[str, tuple[float, int, int]] = {}
+        self._lock = threading.Lock()
+        self._sweep_every = sweep_every
+        self._next_sweep = time.time() + sweep_every
+
+    def apply(self, key: str, limit: int, window: int, now: float, consume: bool) -> RateLimitResult:
+        with self._lock:
+            if now >= self._next_sweep:
+                self._sweep(now, window)
+            state = self._state.get(key, (now, 0, 0))
+            state, result = _decide(state, limit, window, now, consume)
+            if consume:
+                self._state[key] = state
+            return result
+
+    def _sweep(self, now: float, window: int) -> None:
+        # A key whose window started two windows ago has a zero estimate
+        idle = [k for k, (start, _, _) in self._state.items() if now - start >= 2 * window]
+        for k in idle:
+            del self._state[k]
+        self._next_sweep = now + self._sweep_every
+
+    def __len__(self) -> int:
+        return len(self._state)
+
+
+class SQLiteBackend:
+    """State in a local SQLite file, shared by every gunicorn worker on the host."""
+
+    def __init__(self, path: str, sweep_every: int = 60):
+        self.path = path
+        self._local = threading.local()
+        self._sweep_every = sweep_every
+        self._next_sweep = 0.0
+        conn = self._conn()
+        conn.execute("""CREATE TABLE IF NOT EXISTS rate_limits (
+            key TEXT PRIMARY KEY, window_start REAL, curr INTEGER, prev INTEGER)""")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=busy_timeout_ms() / 1000, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=OFF")
+            self._local.conn = conn
+        return conn
+
+    def apply(self, key: str, limit: int, window: int, now: float, consume: bool) -> RateLimitResult:
+        with immediate(self._conn()) as conn:
+            if now >= self._next_sweep:
+                conn.execute("DELETE FROM rate_limits WHERE window_start < ?", (now - 2 * window,))
+                self._next_sweep = now + self._sweep_every
+            row = conn.execute(
+                "SELECT window_start, curr, prev FROM rate_limits WHERE key=?", (key,)
+            ).fetchone()
+            state, result = _decide(row or (now, 0, 0), limit, window, now, consume)
+            if consume:
+                conn.execute(
+                    """INSERT INTO rate_limits (key, window_start, curr, prev) VALUES(?,?,?,?)
+                    ON CONFLICT(key) DO UPDATE SET window_start=excluded.window_start,
+                    curr=excluded.curr, prev=excluded.prev""",
+                    (key, *state))
+        return result
+
+
+class SupabaseBackend:
+    """State in the Supabase `rate_limits` table, shared across hosts.
+
+    Read-modify-write without a transaction, so concurrent hits on the same
+    key can undercount slightly; acceptable for abuse protection.
+    """
+
+    def __init__(self, sweep_every: int = 300):
+        self._sweep_every = sweep_every
+        self._next_sweep = 0.0
+
+    def apply(self, key: str, limit: int, window: int, now: float, consume: bool) -> RateLimitResult:
+        from db.supabase_client import supabase
+        table = supabase().table("rate_limits")
+        if now >= self._next_sweep:
+            table.delete().lt("window_start", now - 2 * window).execute()
+            self._next_sweep = now + self._sweep_every
+        rows = table.select("window_start,curr,prev").eq("key", key).limit(1).execute().data
+        row = (rows[0]["window_start"], rows[0]["curr"], rows[0]["prev"]) if rows else (now, 0, 0)
+        state, result = _decide(row, limit, window, now, consume)
+        if consume:
+            table.upsert({"key": key, "window_start": state[0], "curr": state[1],
+                          "prev": state[2]}, on_conflict="key").execute()
+        return result
 
 
 class RateLimiter:
-    def __init__(self):
-        self.requests: dict[str, list[float]] = defaultdict(list)
+    def __init__(self, backend=None):
+        self.backend = backend or MemoryBackend()
+
+    def check(self, identifier: str, max_requests: int = RATE_LIMIT_AI_MAX,
+              window_secs: int = RATE_LIMIT_AI_WINDOW) -> RateLimitResult:
+        """Count one request against `identifier` if allowed."""
+        return self.backend.apply(identifier, max_requests, window_secs, time.time(), True)
 
     def is_allowed(self, identifier: str, max_requests: int = RATE_LIMIT_AI_MAX,
                    window_secs: int = RATE_LIMIT_AI_WINDOW) -> bool:
-        now = time.time()
-        self.requests[identifier] = [
-            t for t in self.requests[identifier]
-            if now - t < window_secs
-        ]
-        if len(self.requests[identifier]) >= max_requests:
-            return False
-        self.requests[identifier].append(now)
-        return True
+        return self.check(identifier, max_requests, window_secs).allowed
 
     def remaining(self, identifier: str, max_requests: int = RATE_LIMIT_AI_MAX,
                   window_secs: int = RATE_LIMIT_AI_WINDOW) -> int:
-        now = time.time()
-        recent = [t for t in self.requests[identifier] if now - t < window_secs]
-        return max(0, max_requests - len(recent))
+        return self.backend.apply(identifier, max_requests, window_secs, time.time(), False).remaining
+
+
+def _make_backend(name: str):
+    if name == "sqlite":
+        return SQLiteBackend(RATE_LIMIT_SQLITE_PATH)
+    if name == "supabase":
+        return SupabaseBackend()
+    return MemoryBackend()
 
 
 # Singleton
-_limiter = RateLimiter()
+_limiter = RateLimiter(_make_backend(RATE_LIMIT_BACKEND))
+
+
+def _headers(result: RateLimitResult) -> dict:
+    headers = {
+        "X-RateLimit-Limit": str(result.limit),
+        "X-RateLimit-Remaining": str(result.remaining),
+    }
+    if not result.allowed:
+        headers["Retry-After"] = str(result.retry_after)
+    return headers
 
 
 def ai_rate_limit(f):
@@ -40,10 +202,19 @@ def ai_rate_limit(f):
         ip = request.headers.get("X-Forwarded-For", request.remote_addr or "unknown").split(",")[0].strip()
         code = data.get("classCode", "")
         identifier = f"{ip}:{code}"
-        if not _limiter.is_allowed(identifier):
+        try:
+            result = _limiter.check(identifier)
+        except Exception as e:
+            # A broken shared backend must not take the AI routes down with it
+            print(f"[rate_limiter] backend error: {e}")
+            return f(*args, **kwargs)
+        if not result.allowed:
             return jsonify({
                 "success": False,
-                "error": f"Rate limit reached. Max {RATE_LIMIT_AI_MAX} AI requests per {RATE_LIMIT_AI_WINDOW}s. Please wait."
-            }), 429
-        return f(*args, **kwargs)
+                "error": f"Rate limit reached. Max {RATE_LIMIT_AI_MAX} AI requests per {RATE_LIMIT_AI_WINDOW}s. "
+                         f"Please wait {result.retry_after}s."
+            }), 429, _headers(result)
+        response = make_response(f(*args, **kwargs))
+        response.headers.update(_headers(result))
+        return response
     return decorated
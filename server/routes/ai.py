@@ -1,10 +1,25 @@
-from flask import Blueprint, request, jsonify, send_file
+from flask import Blueprint, Response, request, jsonify, send_file, stream_with_context
+from middleware.cache_middleware import cache_stats
 from middleware.rate_limiter import ai_rate_limit
+from services.governor import governor
+from services.streaming import sse_event
 import services.ai_service as ai
 
 bp = Blueprint("ai", __name__)
 
 
+def _sse_response(events) -> Response:
+    """Wrap an (event, data) generator as a text/event-stream response."""
+    def frames():
+        try:
+            for event, data in events:
+                yield sse_event(event, data)
+        except Exception as e:
+            yield sse_event("error", {"error": str(e)})
+    return Response(stream_with_context(frames()), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
 @bp.post("/generate_notes")
 @ai_rate_limit
 def generate_notes():
@@ -31,6 +46,31 @@ def generate_notes():
         return jsonify({"success": False, "error": str(e)})
 
 
+@bp.post("/generate_notes/stream")
+@ai_rate_limit
+def generate_notes_stream():
+    """SSE variant of /generate_notes — one `section` event per finished ICAP section."""
+    d = request.json or {}
+
+    def events():
+        for event, data in ai.stream_notes(
+            topic=d.get("topic", ""),
+            level=d.get("level", "Intermediate"),
+            duration=d.get("duration", 75),
+            objectives=d.get("objectives", ""),
+            style=d.get("style", "Lecture-based"),
+            language=d.get("language", "English"),
+        ):
+            if event == "done" and d.get("classCode"):
+                from routes.classes import _save_notes_to_class
+                try:
+                    _save_notes_to_class(d["classCode"], data["notes"])
+                except Exception:
+                    pass
+            yield event, data
+    return _sse_response(events())
+
+
 @bp.post("/generate_slideshow_data")
 @ai_rate_limit
 def generate_slideshow_data():
@@ -50,6 +90,20 @@ def generate_slideshow_data():
         return jsonify({"success": False, "error": str(e)})
 
 
+@bp.post("/generate_slideshow_data/stream")
+@ai_rate_limit
+def generate_slideshow_data_stream():
+    """SSE variant of /generate_slideshow_data — one `slide` event per completed slide."""
+    d = request.json or {}
+    return _sse_response(ai.stream_slideshow(
+        topic=d.get("topic", ""),
+        level=d.get("level", "Intermediate"),
+        duration=d.get("duration", 75),
+        notes=d.get("notes", ""),
+        language=d.get("language", "English"),
+    ))
+
+
 @bp.post("/generate_quiz")
 @ai_rate_limit
 def generate_quiz():
@@ -100,6 +154,18 @@ def generate_study_plan():
         return jsonify({"success": False, "error": str(e)})
 
 
+@bp.post("/ai_feedback")
+@ai_rate_limit
+def ai_feedback():
+    try:
+        d = request.json or {}
+        result = ai.ai_feedback(d.get("title", ""), d.get("description", ""),
+                                d.get("maxScore", 100), d.get("content", ""))
+        return jsonify({"success": True, "feedback": result})
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)})
+
+
 @bp.post("/generate_video_script")
 @ai_rate_limit
 def generate_video_script():
@@ -113,11 +179,19 @@ def generate_video_script():
 
 # ── Layer 2 real-time tools ─────────────────────────────────────
 
+def _semantic_result(answer: str, similarity: float | None) -> dict:
+    """Response body for semantic-cached tools; flags answers reused from a similar question."""
+    if similarity is None:
+        return {"result": answer, "cached": False}
+    return {"result": answer, "cached": True, "similarity": similarity}
+
+
 @bp.post("/layer2/question")
 def layer2_question():
     try:
         d = request.json or {}
-        return jsonify({"result": ai.live_question(d.get("topic",""), d.get("level",""), d.get("question",""))})
+        return jsonify(_semantic_result(*ai.live_question(
+            d.get("topic",""), d.get("level",""), d.get("question",""), class_code=d.get("classCode",""))))
     except Exception as e:
         return jsonify({"error": str(e)})
 
@@ -126,7 +200,8 @@ def layer2_question():
 def layer2_confusion():
     try:
         d = request.json or {}
-        return jsonify({"result": ai.confusion_rescue(d.get("topic",""), d.get("level",""), d.get("confusion",""))})
+        return jsonify(_semantic_result(*ai.confusion_rescue(
+            d.get("topic",""), d.get("level",""), d.get("confusion",""), class_code=d.get("classCode",""))))
     except Exception as e:
         return jsonify({"error": str(e)})
 
@@ -153,7 +228,9 @@ def layer2_conceptcheck():
 def layer2_student_question():
     try:
         d = request.json or {}
-        return jsonify({"result": ai.student_question(d.get("topic",""), d.get("level",""), d.get("name",""), d.get("year",""), d.get("background",""), d.get("question",""))})
+        return jsonify(_semantic_result(*ai.student_question(
+            d.get("topic",""), d.get("level",""), d.get("name",""), d.get("year",""),
+            d.get("background",""), d.get("question",""), class_code=d.get("classCode",""))))
     except Exception as e:
         return jsonify({"error": str(e)})
 
@@ -167,6 +244,13 @@ def layer2_rubric():
         return jsonify({"error": str(e)})
 
 
+@bp.get("/ai/stats")
+def ai_stats():
+    """Per-worker AI counters: cache hit/miss per prompt_key, governor state, per-model latency/tokens."""
+    return jsonify({"success": True, "cache": cache_stats(), "upstream": governor.snapshot(),
+                    "models": ai.model_stats()})
+
+
 @bp.post("/generate_slides")
 def generate_slides():
     """PowerPoint export — imports pptx service."""
@@ -1,6 +1,7 @@
-import json
 from flask import Blueprint, request, jsonify
-from db.supabase_client import supabase
+from middleware.etag import conditional_body, conditional_json
+from services import class_cache
+from storage import repos
 
 bp = Blueprint("classes", __name__)
 
@@ -12,15 +13,8 @@ def save_class():
         code = d.get("code", "").upper().strip()
         if not code:
             return jsonify({"success": False, "error": "No code provided"})
-        sb = supabase()
-        sb.table("classes").upsert({
-            "code": code,
-            "teacher_email": d.get("teacherEmail", ""),
-            "teacher_name": d.get("teacherName", ""),
-            "topic": d.get("topic", ""),
-            "level": d.get("level", ""),
-            "data": json.dumps(d),
-        }, on_conflict="code").execute()
+        repos.classes.save(code, d)
+        class_cache.changed(code)
         print(f"[classes] saved: {code}")
         return jsonify({"success": True, "code": code})
     except Exception as e:
@@ -29,36 +23,37 @@ def save_class():
 
 @bp.post("/get_class")
 def get_class():
+    """The class record without its notes (those come from /get_notes). Revalidate with If-None-Match."""
     try:
         d = request.json or {}
         code = d.get("code", "").upper().strip()
         if not code:
             return jsonify({"success": False, "error": "No code provided"})
-        sb = supabase()
-        result = sb.table("classes").select("data").eq("code", code).limit(1).execute()
-        if result.data:
-            return jsonify({"success": True, "class": json.loads(result.data[0]["data"])})
+        entry = class_cache.get(code)
+        if entry is not None:
+            return conditional_body(entry.class_body, entry.class_etag)
         return jsonify({"success": False, "error": "Code not found"})
     except Exception as e:
         return jsonify({"success": False, "error": str(e)})
 
 
+def _save_notes_to_class(code: str, notes: str) -> None:
+    """Attach notes to an existing class record (used after /generate_notes)."""
+    code = (code or "").upper().strip()
+    if code and repos.classes.set_notes(code, notes):
+        class_cache.changed(code)
+
+
 @bp.post("/save_notes")
 def save_notes():
-    """Store generated notes against a class code in Supabase."""
+    """Store generated notes against a class code."""
     try:
         d = request.json or {}
         code = d.get("classCode", "").upper().strip()
         notes = d.get("notes", "")
         if not code:
             return jsonify({"success": False, "error": "No code"})
-        sb = supabase()
-        # Fetch current data, inject notes, re-save
-        result = sb.table("classes").select("data").eq("code", code).limit(1).execute()
-        if result.data:
-            cls = json.loads(result.data[0]["data"])
-            cls["notes"] = notes
-            sb.table("classes").update({"data": json.dumps(cls)}).eq("code", code).execute()
+        _save_notes_to_class(code, notes)
         return jsonify({"success": True})
     except Exception as e:
         return jsonify({"success": False, "error": str(e)})
@@ -66,14 +61,59 @@ def save_notes():
 
 @bp.post("/get_notes")
 def get_notes():
+    """Cached and precompressed; revalidate with If-None-Match."""
+    try:
+        d = request.json or {}
+        code = d.get("classCode", "").upper().strip()
+        if not code:
+            return jsonify({"success": False, "error": "No code"})
+        entry = class_cache.get(code)
+        if entry is not None and entry.notes:
+            return conditional_body(entry.notes_body, entry.notes_etag, entry.notes_encoded)
+        return jsonify({"success": False, "error": "No notes yet. Ask your teacher to generate notes."})
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)})
+
+
+@bp.post("/class/dashboard")
+def class_dashboard():
+    """Everything the teacher dashboard and reports tab show, in one request."""
     try:
         d = request.json or {}
         code = d.get("classCode", "").upper().strip()
-        sb = supabase()
-        result = sb.table("classes").select("data").eq("code", code).limit(1).execute()
-        if result.data:
-            cls = json.loads(result.data[0]["data"])
-            return jsonify({"success": True, "notes": cls.get("notes", "")})
-        return jsonify({"success": False, "error": "Class not found"})
+        if not code:
+            return jsonify({"success": False, "error": "No code"})
+        return jsonify({"success": True,
+                        "assignments": repos.assignments.stats(code),
+                        "tests": repos.tests.stats(code)})
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)})
+
+
+@bp.post("/student/bootstrap")
+def student_bootstrap():
+    """A student's whole class view in one request: class, notes, work with their own
+    submissions and results, and discussions. Revalidate with If-None-Match."""
+    try:
+        d = request.json or {}
+        code = d.get("classCode", "").upper().strip()
+        email = d.get("studentEmail", "")
+        if not code:
+            return jsonify({"success": False, "error": "No code"})
+        entry = class_cache.get(code)
+        if entry is None:
+            return jsonify({"success": False, "error": "Code not found"})
+        assignments = repos.assignments.list_for_class(code)
+        submissions = repos.submissions.for_student([a["id"] for a in assignments], email)
+        tests = repos.tests.list_for_class(code)
+        results = repos.test_results.for_student([t["id"] for t in tests], email)
+        return conditional_json({
+            "success": True,
+            "class": entry.cls,
+            "notes": entry.notes,
+            "assignments": [{**a, "submission": submissions.get(a["id"])} for a in assignments],
+            "tests": [{**t, "result": results.get(t["id"])} for t in tests],
+            "posts": repos.discussions.list_for_class(code),
+        })
     except Exception as e:
         return jsonify({"success": False, "error": str(e)})
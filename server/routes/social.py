@@ -1,6 +1,6 @@
-import uuid
-from flask import Blueprint, request, jsonify
-from db.supabase_client import supabase
+from flask import Blueprint, Response, request, jsonify, stream_with_context
+from services import classroom, live, reactions
+from storage import repos
 
 bp = Blueprint("social", __name__)
 
@@ -10,18 +10,14 @@ bp = Blueprint("social", __name__)
 def discussion_post():
     try:
         d = request.json or {}
-        sb = supabase()
-        did = str(uuid.uuid4())
-        sb.table("discussions").insert({
-            "id": did,
-            "class_code": d.get("classCode", ""),
-            "student_name": d.get("studentName", ""),
-            "student_email": d.get("studentEmail", ""),
-            "question": d.get("question", ""),
-            "reply": "",
-            "replied_by": "",
-        }).execute()
-        return jsonify({"success": True, "id": did})
+        post = repos.discussions.post(
+            class_code=d.get("classCode", ""),
+            student_name=d.get("studentName", ""),
+            student_email=d.get("studentEmail", ""),
+            question=d.get("question", ""),
+        )
+        live.publish(post["class_code"], "discussion", post)
+        return jsonify({"success": True, "id": post["id"]})
     except Exception as e:
         return jsonify({"success": False, "error": str(e)})
 
@@ -30,10 +26,7 @@ def discussion_post():
 def discussion_get():
     try:
         d = request.json or {}
-        result = supabase().table("discussions").select("*") \
-            .eq("class_code", d.get("classCode", "")) \
-            .order("created_at", desc=True).execute()
-        return jsonify({"success": True, "posts": result.data or []})
+        return jsonify({"success": True, "posts": repos.discussions.list_for_class(d.get("classCode", ""))})
     except Exception as e:
         return jsonify({"success": False, "error": str(e)})
 
@@ -42,10 +35,10 @@ def discussion_get():
 def discussion_reply():
     try:
         d = request.json or {}
-        supabase().table("discussions").update({
-            "reply": d.get("reply", ""),
-            "replied_by": d.get("repliedBy", ""),
-        }).eq("id", d.get("id", "")).execute()
+        repos.discussions.reply(d.get("id", ""), d.get("reply", ""), d.get("repliedBy", ""))
+        if d.get("classCode"):
+            live.publish(d["classCode"], "reply", {"id": d.get("id", ""), "reply": d.get("reply", ""),
+                                                   "replied_by": d.get("repliedBy", "")})
         return jsonify({"success": True})
     except Exception as e:
         return jsonify({"success": False, "error": str(e)})
@@ -57,18 +50,11 @@ def discussion_reply():
 def save_reaction():
     try:
         d = request.json or {}
-        sb = supabase()
-        # Remove recent duplicate from same student
-        sb.table("reactions").delete() \
-            .eq("class_code", d.get("classCode", "")) \
-            .eq("student_email", d.get("studentEmail", "")).execute()
-        sb.table("reactions").insert({
-            "id": str(uuid.uuid4()),
-            "class_code": d.get("classCode", ""),
-            "student_email": d.get("studentEmail", ""),
-            "student_name": d.get("studentName", ""),
-            "reaction": d.get("reaction", ""),
-        }).execute()
+        code = d.get("classCode", "")
+        # Replaces the same student's reaction from the last 30 seconds
+        reactions.record(code, d.get("studentEmail", ""), d.get("studentName", ""), d.get("reaction", ""))
+        # A replace can lower a count, so viewers get the new totals rather than a +1
+        live.publish(code, "reactions", reactions.counts(code))
         return jsonify({"success": True})
     except Exception as e:
         return jsonify({"success": False, "error": str(e)})
@@ -78,13 +64,8 @@ def save_reaction():
 def get_reactions():
     try:
         d = request.json or {}
-        # Get reactions from last 5 minutes
-        result = supabase().table("reactions").select("reaction") \
-            .eq("class_code", d.get("classCode", "")).execute()
-        counts: dict = {}
-        for r in (result.data or []):
-            counts[r["reaction"]] = counts.get(r["reaction"], 0) + 1
-        return jsonify({"success": True, "reactions": counts})
+        # Counts over the last 5 minutes, from the in-memory window
+        return jsonify({"success": True, "reactions": reactions.counts(d.get("classCode", ""))})
     except Exception as e:
         return jsonify({"success": False, "error": str(e)})
 
@@ -95,15 +76,37 @@ def get_reactions():
 def save_confusion():
     try:
         d = request.json or {}
-        supabase().table("confusion_events").insert({
-            "id": str(uuid.uuid4()),
-            "class_code": d.get("classCode", ""),
-            "student_email": d.get("studentEmail", ""),
-            "student_name": d.get("studentName", ""),
-            "slide_index": int(d.get("slideIndex", 0)),
-            "slide_title": d.get("slideTitle", ""),
-        }).execute()
-        return jsonify({"success": True})
+        # Written behind; viewers get the event now and the slide's counters after the write
+        queued = classroom.record_confusion(
+            class_code=d.get("classCode", ""),
+            student_email=d.get("studentEmail", ""),
+            student_name=d.get("studentName", ""),
+            slide_index=int(d.get("slideIndex", 0)),
+            slide_title=d.get("slideTitle", ""),
+        )
+        return jsonify({"success": True, "queued": queued})
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)})
+
+
+@bp.post("/confusion/heatmap")
+def confusion_heatmap():
+    try:
+        d = request.json or {}
+        code = d.get("classCode", "")
+        # Precomputed per-slide counters, plus the latest events for the log
+        return jsonify({"success": True, "slides": repos.confusion.heatmap(code),
+                        "recent": repos.confusion.recent(code, limit=30)})
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)})
+
+
+@bp.post("/confusion/history")
+def confusion_history():
+    try:
+        d = request.json or {}
+        return jsonify({"success": True, "buckets": repos.confusion.history(d.get("classCode", ""),
+                                                                            int(d.get("bucketMins", 5)))})
     except Exception as e:
         return jsonify({"success": False, "error": str(e)})
 
@@ -112,10 +115,7 @@ def save_confusion():
 def get_confusion():
     try:
         d = request.json or {}
-        result = supabase().table("confusion_events").select("*") \
-            .eq("class_code", d.get("classCode", "")) \
-            .order("created_at", desc=True).execute()
-        return jsonify({"success": True, "events": result.data or []})
+        return jsonify({"success": True, "events": repos.confusion.recent(d.get("classCode", ""))})
     except Exception as e:
         return jsonify({"success": False, "error": str(e)})
 
@@ -126,25 +126,14 @@ def get_confusion():
 def save_attendance():
     try:
         d = request.json or {}
-        sb = supabase()
-        existing = sb.table("attendance").select("id") \
-            .eq("class_code", d.get("classCode", "")) \
-            .eq("student_name", d.get("studentName", "")) \
-            .eq("session_date", d.get("sessionDate", "")).limit(1).execute()
-        present = 1 if d.get("present", True) else 0
-        if existing.data:
-            sb.table("attendance").update({"present": present}) \
-                .eq("id", existing.data[0]["id"]).execute()
-        else:
-            sb.table("attendance").insert({
-                "id": str(uuid.uuid4()),
-                "class_code": d.get("classCode", ""),
-                "teacher_email": d.get("teacherEmail", ""),
-                "student_name": d.get("studentName", ""),
-                "session_date": d.get("sessionDate", ""),
-                "present": present,
-            }).execute()
-        return jsonify({"success": True})
+        queued = classroom.mark_attendance(
+            class_code=d.get("classCode", ""),
+            teacher_email=d.get("teacherEmail", ""),
+            student_name=d.get("studentName", ""),
+            session_date=d.get("sessionDate", ""),
+            present=bool(d.get("present", True)),
+        )
+        return jsonify({"success": True, "queued": queued})
     except Exception as e:
         return jsonify({"success": False, "error": str(e)})
 
@@ -153,9 +142,17 @@ def save_attendance():
 def get_attendance():
     try:
         d = request.json or {}
-        result = supabase().table("attendance").select("*") \
-            .eq("class_code", d.get("classCode", "")) \
-            .order("session_date", desc=True).execute()
-        return jsonify({"success": True, "attendance": result.data or []})
+        return jsonify({"success": True, "attendance": repos.attendance.list_for_class(d.get("classCode", ""))})
     except Exception as e:
         return jsonify({"success": False, "error": str(e)})
+
+
+# ── LIVE PUSH ───────────────────────────────────────────────────
+
+@bp.get("/live/<code>")
+def live_stream(code):
+    """SSE feed for one class: current reaction counts, then reactions,
+    confusion, discussion and reply events as they are written."""
+    snapshot = lambda: [("reactions", reactions.counts(code))]  # noqa: E731
+    return Response(stream_with_context(live.stream(code, snapshot)), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
@@ -1,7 +1,5 @@
-import uuid
-import json
 from flask import Blueprint, request, jsonify
-from db.supabase_client import supabase
+from storage import repos
 
 bp = Blueprint("tests", __name__)
 
@@ -10,15 +8,13 @@ bp = Blueprint("tests", __name__)
 def create_test():
     try:
         d = request.json or {}
-        tid = str(uuid.uuid4())
-        supabase().table("tests").insert({
-            "id": tid,
-            "class_code": d.get("classCode", ""),
-            "teacher_email": d.get("teacherEmail", ""),
-            "title": d.get("title", ""),
-            "questions": json.dumps(d.get("questions", [])),
-            "time_limit": int(d.get("timeLimit", 0)),
-        }).execute()
+        tid = repos.tests.create(
+            class_code=d.get("classCode", ""),
+            teacher_email=d.get("teacherEmail", ""),
+            title=d.get("title", ""),
+            questions=d.get("questions", []),
+            time_limit=int(d.get("timeLimit", 0)),
+        )
         return jsonify({"success": True, "id": tid})
     except Exception as e:
         return jsonify({"success": False, "error": str(e)})
@@ -29,13 +25,7 @@ def get_tests():
     try:
         d = request.json or {}
         code = d.get("classCode", "").upper().strip()
-        result = supabase().table("tests").select("*") \
-            .eq("class_code", code).order("created_at", desc=True).execute()
-        rows = []
-        for r in (result.data or []):
-            r["questions"] = json.loads(r["questions"]) if isinstance(r["questions"], str) else r["questions"]
-            rows.append(r)
-        return jsonify({"success": True, "tests": rows})
+        return jsonify({"success": True, "tests": repos.tests.list_for_class(code)})
     except Exception as e:
         return jsonify({"success": False, "error": str(e)})
 
@@ -44,10 +34,7 @@ def get_tests():
 def delete_test():
     try:
         d = request.json or {}
-        tid = d.get("id", "")
-        sb = supabase()
-        sb.table("test_submissions").delete().eq("test_id", tid).execute()
-        sb.table("tests").delete().eq("id", tid).execute()
+        repos.tests.delete(d.get("id", ""))
         return jsonify({"success": True})
     except Exception as e:
         return jsonify({"success": False, "error": str(e)})
@@ -63,22 +50,16 @@ def submit_test():
             1 for i, q in enumerate(questions)
             if str(i) in answers and int(answers[str(i)]) == int(q.get("ans", -1))
         )
-        sb = supabase()
-        existing = sb.table("test_submissions").select("id") \
-            .eq("test_id", d.get("testId", "")) \
-            .eq("student_email", d.get("studentEmail", "")).limit(1).execute()
-        if existing.data:
-            return jsonify({"success": False, "error": "Already submitted"})
-        sb.table("test_submissions").insert({
-            "id": str(uuid.uuid4()),
-            "test_id": d.get("testId", ""),
-            "class_code": d.get("classCode", ""),
-            "student_email": d.get("studentEmail", ""),
-            "student_name": d.get("studentName", ""),
-            "answers": json.dumps(answers),
-            "score": score,
-            "total": len(questions),
-        }).execute()
+        # A resubmit replaces the earlier result rather than being rejected
+        repos.test_results.submit(
+            test_id=d.get("testId", ""),
+            class_code=d.get("classCode", ""),
+            student_email=d.get("studentEmail", ""),
+            student_name=d.get("studentName", ""),
+            answers=answers,
+            score=score,
+            total=len(questions),
+        )
         return jsonify({"success": True, "score": score, "total": len(questions)})
     except Exception as e:
         return jsonify({"success": False, "error": str(e)})
@@ -88,10 +69,7 @@ def submit_test():
 def get_test_results():
     try:
         d = request.json or {}
-        result = supabase().table("test_submissions").select("*") \
-            .eq("test_id", d.get("testId", "")) \
-            .order("submitted_at", desc=True).execute()
-        return jsonify({"success": True, "results": result.data or []})
+        return jsonify({"success": True, "results": repos.test_results.list_for_test(d.get("testId", ""))})
     except Exception as e:
         return jsonify({"success": False, "error": str(e)})
 
@@ -100,9 +78,7 @@ def get_test_results():
 def get_my_test_result():
     try:
         d = request.json or {}
-        result = supabase().table("test_submissions").select("*") \
-            .eq("test_id", d.get("testId", "")) \
-            .eq("student_email", d.get("studentEmail", "")).limit(1).execute()
-        return jsonify({"success": True, "result": result.data[0] if result.data else None})
+        result = repos.test_results.get_for_student(d.get("testId", ""), d.get("studentEmail", ""))
+        return jsonify({"success": True, "result": result})
     except Exception as e:
         return jsonify({"success": False, "error": str(e)})
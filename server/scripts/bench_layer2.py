@@ -0,0 +1,123 @@
+"""Concurrent load benchmark for the /layer2/* live tools.
+
+Fires a fixed number of requests at a running server with N concurrent
+clients and reports throughput and latency percentiles. To measure the
+worker model rather than Groq, start the bundled fake upstream and point
+the app at it via GROQ_BASE_URL (read by the Groq SDK). Lift the token
+budget so the governor does not pace the run:
+
+    python server/scripts/bench_layer2.py --fake-upstream 8099 --latency-ms 1000 &
+    export GROQ_API_KEY=x GROQ_BASE_URL=http://127.0.0.1:8099 GROQ_TOKENS_PER_MINUTE=10000000
+    WEB_WORKER_CLASS=sync gunicorn -c server/gunicorn.conf.py --chdir server app:app   # before
+    gunicorn -c server/gunicorn.conf.py --chdir server app:app                        # after (gevent)
+    python server/scripts/bench_layer2.py --url http://127.0.0.1:5000 -c 100 -n 300
+
+Each concurrent client sends its own classCode, so per-(IP, class) AI rate
+limits count every client separately. If the limit is still too low for a run,
+start the server with a higher RATE_LIMIT_AI_MAX. Every question is distinct,
+so the semantic cache never answers one in place of the upstream.
+"""
+import argparse
+import json
+import statistics
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PAYLOADS = {
+    "/layer2/question":     {"topic": "Linear Regression", "level": "Intermediate",
+                             "question": "Why do we square the residuals?"},
+    "/layer2/confusion":    {"topic": "Linear Regression", "level": "Intermediate",
+                             "confusion": "Students mix up R-squared and correlation"},
+    "/layer2/conceptcheck": {"topic": "Linear Regression", "level": "Intermediate",
+                             "question": "What does the slope mean?", "correct_pct": 45},
+    "/layer2/pacing":       {"topic": "Linear Regression", "total_duration": 75,
+                             "mins_elapsed": 40, "current_segment": "Worked examples"},
+}
+
+
+def _post(url: str, body: dict) -> tuple[float, bool]:
+    start = time.perf_counter()
+    req = urllib.request.Request(url, data=json.dumps(body).encode(),
+                                 headers={"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(req, timeout=300) as r:
+            ok = r.status == 200 and "result" in json.loads(r.read())
+    except Exception:
+        ok = False
+    return time.perf_counter() - start, ok
+
+
+def _payload(i: int, concurrency: int) -> tuple[str, dict]:
+    """Request i: its client's own classCode, and a question no earlier request asked."""
+    path = list(PAYLOADS)[i % len(PAYLOADS)]
+    body = {**PAYLOADS[path], "classCode": f"BENCH{i % concurrency:04d}"}
+    for field in ("question", "confusion"):
+        if field in body:
+            # The number keeps the semantic cache from answering it as a near-duplicate
+            body[field] = f"{body[field]} (#{i})"
+    return path, body
+
+
+def run(base_url: str, concurrency: int, total: int) -> None:
+    jobs = [(base_url + path, body) for path, body in (_payload(i, concurrency) for i in range(total))]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(lambda j: _post(*j), jobs))
+    wall = time.perf_counter() - start
+    lat = sorted(r[0] for r in results)
+    ok = sum(1 for r in results if r[1])
+    print(f"requests     {total} ({ok} ok, {total - ok} failed)")
+    print(f"concurrency  {concurrency}")
+    print(f"wall time    {wall:.2f}s")
+    print(f"throughput   {total / wall:.1f} req/s")
+    print(f"latency p50  {statistics.median(lat) * 1000:.0f} ms")
+    print(f"latency p95  {lat[int(len(lat) * 0.95) - 1] * 1000:.0f} ms")
+
+
+# Long enough to pass the fast tier's completeness check, so each request is one upstream call
+_FAKE_ANSWER = ("Benchmark answer: residuals are squared so errors of either sign add up "
+                "and large misses weigh more.")
+
+
+def serve_fake_upstream(port: int, latency_ms: int) -> None:
+    """Minimal OpenAI-compatible /chat/completions that sleeps like a real LLM."""
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            time.sleep(latency_ms / 1000)
+            body = json.dumps({
+                "id": "bench", "object": "chat.completion", "created": int(time.time()),
+                "model": "bench",
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": _FAKE_ANSWER}}],
+                "usage": {"prompt_tokens": 50, "completion_tokens": 5, "total_tokens": 55},
+            }).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    ThreadingHTTPServer.daemon_threads = True
+    print(f"fake Groq upstream on :{port} ({latency_ms} ms per call)")
+    ThreadingHTTPServer(("127.0.0.1", port), Handler).serve_forever()
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--url", default="http://127.0.0.1:5000")
+    ap.add_argument("-c", "--concurrency", type=int, default=100)
+    ap.add_argument("-n", "--requests", type=int, default=500)
+    ap.add_argument("--fake-upstream", type=int, metavar="PORT",
+                    help="serve a fake Groq API on PORT instead of benchmarking")
+    ap.add_argument("--latency-ms", type=int, default=1500)
+    args = ap.parse_args()
+    if args.fake_upstream:
+        serve_fake_upstream(args.fake_upstream, args.latency_ms)
+    else:
+        run(args.url.rstrip("/"), args.concurrency, args.requests)
@@ -0,0 +1,87 @@
+"""Storage backend benchmark: one workload through the repositories on each backend.
+
+Runs the same mix — class saves/reads, single vs batched reactions,
+submission upserts and library list/search pages — against the memory
+and SQLite backends (SQLite on a throwaway DATA_DIR), and against
+Supabase when --supabase is given and SUPABASE_URL/SUPABASE_SERVICE_KEY
+are set. Reports operations per second for each step.
+
+    python server/scripts/bench_storage.py
+    python server/scripts/bench_storage.py -n 2000 --supabase
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# config reads DATA_DIR at import, so point it somewhere disposable first
+os.environ.setdefault("DATA_DIR", tempfile.mkdtemp(prefix="lectureai-bench-"))
+
+from storage import Repositories  # noqa: E402
+from db.sqlite_client import init_schema  # noqa: E402
+
+
+def _timed(label: str, ops: int, fn) -> None:
+    start = time.perf_counter()
+    fn()
+    wall = time.perf_counter() - start
+    print(f"  {label:<28} {ops:>6} ops  {ops / wall:>10.0f} ops/s")
+
+
+def workload(repos: Repositories, n: int) -> None:
+    tag = f"bench{int(time.time())}"
+    codes = [f"{tag}{i}" for i in range(max(1, n // 10))]
+    _timed("class save", len(codes), lambda: [
+        repos.classes.save(c, {"code": c, "topic": "Linear Regression", "level": "Intermediate"})
+        for c in codes])
+    _timed("class get", n, lambda: [repos.classes.get(codes[i % len(codes)]) for i in range(n)])
+    _timed("class get_many", 1, lambda: repos.classes.get_many(codes))
+
+    reaction = lambda i: {"class_code": codes[0], "student_email": f"s{i}@{tag}",  # noqa: E731
+                          "student_name": f"Student {i}", "reaction": "👍"}
+    _timed("reaction add", n, lambda: [repos.reactions.add(**reaction(i)) for i in range(n)])
+    _timed("reaction add_many", n, lambda: repos.reactions.add_many([reaction(i) for i in range(n)]))
+    _timed("reaction counts", n // 10 or 1,
+           lambda: [repos.reactions.counts(codes[0]) for _ in range(n // 10 or 1)])
+
+    submission = lambda i: {"assignment_id": tag, "class_code": codes[0],  # noqa: E731
+                            "student_email": f"s{i % 50}@{tag}", "student_name": f"Student {i}",
+                            "content": f"answer {i}"}
+    _timed("submission submit", n, lambda: [repos.submissions.submit(**submission(i)) for i in range(n)])
+    _timed("submission submit_many", n,
+           lambda: repos.submissions.submit_many([submission(i) for i in range(n)]))
+
+    _timed("library save", n // 10 or 1, lambda: [
+        repos.library.save({"teacherEmail": f"t{i % 5}@{tag}", "teacherName": "Bench",
+                            "topic": f"{tag} topic {i}", "notes": "x" * 2000, "subject": "Statistics"})
+        for i in range(n // 10 or 1)])
+    _timed("library list page", n // 10 or 1,
+           lambda: [repos.library.list(page=1 + i % 3) for i in range(n // 10 or 1)])
+    _timed("library search", n // 10 or 1,
+           lambda: [repos.library.list(search="topic 1") for _ in range(n // 10 or 1)])
+
+    for c in codes:     # leave shared backends as we found them (classes have no delete)
+        repos.classes.db.delete("classes", {"code": c})
+    repos.reactions.db.delete("reactions", {"class_code": codes[0]})
+    repos.submissions.delete_for_assignment(tag)
+    for i in range(5):
+        for row in repos.library.list(teacher_email=f"t{i}@{tag}", per_page=10_000)[0]:
+            repos.library.delete(row["id"], f"t{i}@{tag}")
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("-n", "--ops", type=int, default=1000, help="operations per step")
+    ap.add_argument("--supabase", action="store_true", help="also run against Supabase")
+    args = ap.parse_args()
+
+    backends = ["memory", "sqlite"] + (["supabase"] if args.supabase else [])
+    for name in backends:
+        if name == "sqlite":
+            init_schema()
+            print(f"sqlite ({os.environ['DATA_DIR']})")
+        else:
+            print(name)
+        workload(Repositories(default=name, per_table={}), args.ops)
@@ -0,0 +1,54 @@
+import threading
+from collections import deque
+
+
+class TierMetrics:
+    """Latency and token counters per model, for comparing fast vs large tiers."""
+
+    def __init__(self, window: int = 500):
+        self._window = window
+        self._models: dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+    def _entry(self, model: str) -> dict:
+        m = self._models.get(model)
+        if m is None:
+            m = self._models[model] = {
+                "calls": 0, "errors": 0, "fallbacks": 0,
+                "prompt_tokens": 0, "completion_tokens": 0,
+                "latencies": deque(maxlen=self._window), "kinds": {},
+            }
+        return m
+
+    def record(self, model: str, kind: str, latency_secs: float,
+               prompt_tokens: int = 0, completion_tokens: int = 0) -> None:
+        with self._lock:
+            m = self._entry(model)
+            m["calls"] += 1
+            m["prompt_tokens"] += prompt_tokens
+            m["completion_tokens"] += completion_tokens
+            m["latencies"].append(latency_secs)
+            m["kinds"][kind] = m["kinds"].get(kind, 0) + 1
+
+    def record_error(self, model: str) -> None:
+        with self._lock:
+            self._entry(model)["errors"] += 1
+
+    def record_fallback(self, model: str) -> None:
+        """Count an output from `model` that failed validation and was regenerated."""
+        with self._lock:
+            self._entry(model)["fallbacks"] += 1
+
+    def snapshot(self) -> dict:
+        out = {}
+        with self._lock:
+            for model, m in self._models.items():
+                lat = sorted(m["latencies"])
+                out[model] = {
+                    "calls": m["calls"], "errors": m["errors"], "fallbacks": m["fallbacks"],
+                    "prompt_tokens": m["prompt_tokens"], "completion_tokens": m["completion_tokens"],
+                    "latency_p50_ms": round(lat[len(lat) // 2] * 1000) if lat else None,
+                    "latency_p95_ms": round(lat[max(0, int(len(lat) * 0.95) - 1)] * 1000) if lat else None,
+                    "kinds": dict(m["kinds"]),
+                }
+        return out
@@ -1,57 +1,326 @@
+import hashlib
 import json
 import re
+import time
+from typing import Callable, Iterator
+import httpx
 from groq import Groq
-from config import GROQ_API_KEY, GROQ_MODEL, GROQ_MAX_TOKENS
-from middleware.cache_middleware import get_cached, set_cache
+from config import (GROQ_API_KEY, GROQ_MODEL, GROQ_MAX_TOKENS, MODEL_POLICIES,
+                    GROQ_MAX_CONNECTIONS, GROQ_TIMEOUT_SECS,
+                    AI_FILL_LOCK_ENABLED, AI_FILL_LOCK_SECS,
+                    SEMANTIC_CACHE_ENABLED, SEMANTIC_CACHE_THRESHOLD, SEMANTIC_CACHE_TTL_SECS)
+from middleware.cache_middleware import (get_cached, set_cache, cache_key,
+                                         acquire_fill_lock, release_fill_lock, wait_for_fill)
+from services.ai_metrics import TierMetrics
+from services.governor import (governor, call_with_retry,
+                               PRIORITY_LIVE, PRIORITY_INTERACTIVE, PRIORITY_BULK)
+from services.semantic_cache import SemanticCache
+from services.singleflight import SingleFlight
+from services.streaming import IcapSectionSplitter, JsonArrayStreamParser
+from services import structured
 
 _client: Groq | None = None
+_flights = SingleFlight()
+_semantic = SemanticCache(SEMANTIC_CACHE_THRESHOLD, SEMANTIC_CACHE_TTL_SECS)
 
 
 def _groq() -> Groq:
     global _client
     if _client is None:
-        _client = Groq(api_key=GROQ_API_KEY)
+        # One pooled client per process: under the gevent worker hundreds of
+        # requests share it, so the pool must be as wide as the worker.
+        _client = Groq(
+            api_key=GROQ_API_KEY,
+            max_retries=0,      # retries are done by call_with_retry, outside the governor slot
+            http_client=httpx.Client(
+                limits=httpx.Limits(max_connections=GROQ_MAX_CONNECTIONS,
+                                    max_keepalive_connections=GROQ_MAX_CONNECTIONS // 5),
+                timeout=GROQ_TIMEOUT_SECS,
+            ),
+        )
     return _client
 
 
+_PRIORITIES = {"live": PRIORITY_LIVE, "interactive": PRIORITY_INTERACTIVE, "bulk": PRIORITY_BULK}
+_metrics = TierMetrics()
+
+
+def policy(kind: str) -> dict:
+    """Model/max_tokens/temperature/priority for a prompt kind (see config.MODEL_POLICIES)."""
+    p = MODEL_POLICIES.get(kind, {})
+    return {
+        "model": p.get("model", GROQ_MODEL),
+        "max_tokens": p.get("max_tokens", GROQ_MAX_TOKENS),
+        "temperature": p.get("temperature", 0.7),
+        "priority": _PRIORITIES[p.get("priority", "interactive")],
+        "json_mode": p.get("json_mode", False),
+    }
+
+
+def model_stats() -> dict:
+    return _metrics.snapshot()
+
+
+def _estimate_tokens(prompt: str, max_tokens: int) -> int:
+    """Upper bound charged against the TPM budget: ~4 chars per prompt token plus max_tokens."""
+    return len(prompt) // 4 + max_tokens
+
+
+def _failed_generation(exc: Exception) -> str | None:
+    """Text Groq rejected in JSON mode (400 json_validate_failed), if any."""
+    body = getattr(exc, "body", None)
+    if not isinstance(body, dict):
+        return None
+    error = body.get("error", body)
+    return error.get("failed_generation") if isinstance(error, dict) else None
+
+
+def _complete(prompt: str, model: str, max_tokens: int, temperature: float,
+              priority: int, kind: str, json_mode: bool = False) -> tuple[str, str | None]:
+    """One governed, retried Groq completion; returns (text, finish_reason).
+
+    With json_mode, output Groq rejects as invalid JSON is returned with
+    finish_reason "json_invalid" so the caller can repair it.
+    """
+    extra = {"response_format": {"type": "json_object"}} if json_mode else {}
+
+    def attempt():
+        with governor.slot(_estimate_tokens(prompt, max_tokens), priority) as slot:
+            start = time.perf_counter()
+            try:
+                r = _groq().chat.completions.create(
+                    model=model,
+                    messages=[{"role": "user", "content": prompt}],
+                    max_tokens=max_tokens,
+                    temperature=temperature,
+                    **extra,
+                )
+            except Exception as e:
+                _metrics.record_error(model)
+                failed = _failed_generation(e) if json_mode else None
+                if failed is None:
+                    raise
+                return failed, "json_invalid"
+            usage = r.usage
+            _metrics.record(model, kind, time.perf_counter() - start,
+                            usage.prompt_tokens if usage else 0,
+                            usage.completion_tokens if usage else 0)
+            if usage:
+                slot.used = usage.total_tokens
+            choice = r.choices[0]
+            return (choice.message.content or "").strip(), choice.finish_reason
+    return call_with_retry(attempt)
+
+
 def ask(prompt: str, max_tokens: int = GROQ_MAX_TOKENS,
-        temperature: float = 0.7) -> str:
-    """Raw Groq call — returns text string."""
-    r = _groq().chat.completions.create(
-        model=GROQ_MODEL,
-        messages=[{"role": "user", "content": prompt}],
-        max_tokens=max_tokens,
-        temperature=temperature,
-    )
-    return r.choices[0].message.content.strip()
+        temperature: float = 0.7, coalesce: bool = False,
+        priority: int = PRIORITY_INTERACTIVE, model: str = GROQ_MODEL) -> str:
+    """Raw Groq call — returns text string.
+
+    Admitted through the upstream governor at `priority` and retried on
+    429/5xx. With coalesce=True, identical prompts already in flight in this
+    process share one upstream call instead of each issuing their own.
+    """
+    if coalesce:
+        raw = f"{model}:{max_tokens}:{temperature}:{prompt}"
+        key = "ask:" + hashlib.sha256(raw.encode()).hexdigest()
+        result, _ = _flights.do(key, lambda: ask(prompt, max_tokens, temperature,
+                                                 priority=priority, model=model))
+        return result
+    text, _ = _complete(prompt, model, max_tokens, temperature, priority, "adhoc")
+    return text
+
+
+def _looks_complete(text: str, finish_reason: str | None) -> bool:
+    """Default check for fast-tier output: substantive and not cut off by max_tokens."""
+    return finish_reason != "length" and len(text) >= 40
+
+
+def ask_kind(kind: str, prompt: str,
+             validate: Callable[[str], bool] | None = None, json_mode: bool = False) -> str:
+    """Ask with the model policy configured for `kind`.
+
+    Output from a smaller model is validated (`validate`, or a completeness
+    check by default); on failure the prompt is re-run on GROQ_MODEL.
+    json_mode is only honoured when the policy for `kind` allows it.
+    """
+    p = policy(kind)
+    json_mode = json_mode and p["json_mode"]
+    text, finish = _complete(prompt, p["model"], p["max_tokens"], p["temperature"], p["priority"],
+                             kind, json_mode)
+    if p["model"] == GROQ_MODEL:
+        return text
+    ok = validate(text) if validate else _looks_complete(text, finish)
+    if ok:
+        return text
+    print(f"[ai_service] {kind}: {p['model']} output failed validation, retrying on {GROQ_MODEL}")
+    _metrics.record_fallback(p["model"])
+    text, _ = _complete(prompt, GROQ_MODEL, p["max_tokens"], p["temperature"], p["priority"],
+                        kind, json_mode)
+    return text
+
+
+# ── Structured output ──────────────────────────────────────────
+# JSON-returning kinds go through JSON mode, are validated item by item
+# (services/structured.py), and a short or truncated reply is topped up
+# with a continuation prompt for just the missing items rather than
+# regenerating everything.
+
+_CONTINUE_ROUNDS = 2
+
+
+def ask_json_array(kind: str, prompt: str, validate: structured.Validator, key: str,
+                   expected: int, min_items: int = 1) -> list[dict]:
+    """Validated list of up to `expected` items; [] if fewer than `min_items` survive."""
+    items = structured.salvage_array(
+        ask_kind(kind, structured.json_mode_prompt(prompt, key),
+                 validate=lambda t: len(structured.salvage_array(t, validate)) >= min_items,
+                 json_mode=True),
+        validate)
+    return _complete_array(kind, prompt, items, validate, key, expected, min_items)
+
+
+def _complete_array(kind: str, prompt: str, items: list[dict], validate: structured.Validator,
+                    key: str, expected: int, min_items: int) -> list[dict]:
+    items = list(items)
+    for _ in range(_CONTINUE_ROUNDS):
+        if len(items) >= expected:
+            break
+        print(f"[ai_service] {kind}: {len(items)}/{expected} items, asking for the rest")
+        more = structured.salvage_array(
+            ask_kind(kind, structured.continue_prompt(prompt, items, expected, key), json_mode=True),
+            validate)
+        if not more:
+            break
+        items += more
+    return items[:expected] if len(items) >= min_items else []
+
+
+def continue_array(kind: str, prompt: str, items: list[dict], validate: structured.Validator,
+                   key: str, expected: int) -> list[dict]:
+    """Only the items that had to be requested to bring `items` up to `expected`."""
+    return _complete_array(kind, prompt, items, validate, key, expected, 0)[len(items):]
+
+
+def ask_json_object(kind: str, prompt: str, validate: structured.Validator) -> dict | None:
+    """One validated JSON object, re-asked once if the first reply cannot be repaired."""
+    for _ in range(2):
+        item = structured.salvage_object(ask_kind(kind, prompt, json_mode=True), validate)
+        if item is not None:
+            return item
+    return None
+
+
+def stream_json_array(kind: str, prompt: str, validate: structured.Validator, key: str,
+                      expected: int) -> Iterator[dict]:
+    """Yield validated items as they stream in, then any the stream failed to deliver."""
+    parser, items = JsonArrayStreamParser(), []
+    for delta in ask_stream(prompt, kind=kind):
+        for obj in parser.feed(delta):
+            item = validate(obj)
+            if item is not None:
+                items.append(item)
+                yield item
+    yield from continue_array(kind, prompt, items, validate, key, expected)
+
+
+def ask_stream(prompt: str, kind: str = "notes") -> Iterator[str]:
+    """Streaming Groq call with the policy for `kind` — yields text deltas as they arrive.
+
+    The governor slot is held until the stream is exhausted or closed;
+    only opening the stream is retried.
+    """
+    p = policy(kind)
+    with governor.slot(_estimate_tokens(prompt, p["max_tokens"]), p["priority"]):
+        start = time.perf_counter()
+        stream = call_with_retry(lambda: _groq().chat.completions.create(
+            model=p["model"],
+            messages=[{"role": "user", "content": prompt}],
+            max_tokens=p["max_tokens"],
+            temperature=p["temperature"],
+            stream=True,
+        ))
+        for chunk in stream:
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if delta:
+                yield delta
+        _metrics.record(p["model"], kind, time.perf_counter() - start)
+
+
+def _cache_params(prompt_key: str, params: dict) -> dict:
+    """Prompt params plus the generation settings that also shape the output."""
+    p = policy(prompt_key)
+    return {**params, "model": p["model"], "max_tokens": p["max_tokens"]}
 
 
 def ask_cached(prompt_key: str, params: dict, prompt: str,
-               max_tokens: int = GROQ_MAX_TOKENS) -> str:
-    """Ask Groq but check/write Supabase cache first."""
+               produce: Callable[[], str] | None = None) -> str:
+    """Ask Groq (policy for `prompt_key`) but check/write Supabase cache first.
+
+    `params` must hold every argument the prompt was built from. `produce`
+    replaces the plain ask_kind() call when the cached value is derived
+    (e.g. validated JSON); an empty result is returned but not cached.
+    """
+    params = _cache_params(prompt_key, params)
     cached = get_cached(prompt_key, params)
     if cached:
         print(f"[ai_service] cache HIT: {prompt_key}/{params.get('topic')}")
         return cached
-    result = ask(prompt, max_tokens=max_tokens)
-    set_cache(prompt_key, params, result)
+    # Identical misses in flight share one Groq call (thirty students, one quiz)
+    result, shared = _flights.do(cache_key(prompt_key, params),
+                                 lambda: _fill_cache(prompt_key, params,
+                                                     produce or (lambda: ask_kind(prompt_key, prompt))))
+    if shared:
+        print(f"[ai_service] coalesced: {prompt_key}/{params.get('topic')}")
     return result
 
 
-def parse_json_response(text: str) -> list | dict | None:
-    """Safely extract JSON from an AI response that may have prose around it."""
-    for attempt in [
-        lambda: json.loads(text),
-        lambda: json.loads(re.search(r'(\[[\s\S]*\]|\{[\s\S]*\})', text).group()),
-        lambda: json.loads(re.sub(r'^```(?:json)?\s*|\s*```$', '', text.strip())),
-    ]:
-        try:
-            result = attempt()
-            if result is not None:
-                return result
-        except Exception:
-            pass
-    return None
+def _fill_cache(prompt_key: str, params: dict, produce: Callable[[], str]) -> str:
+    locked = None
+    if AI_FILL_LOCK_ENABLED:
+        locked = acquire_fill_lock(prompt_key, params, AI_FILL_LOCK_SECS)
+        if locked is False:
+            # Another worker is generating it — wait for its set_cache()
+            waited = wait_for_fill(prompt_key, params, AI_FILL_LOCK_SECS)
+            if waited:
+                return waited
+    try:
+        result = produce()
+        if result:
+            set_cache(prompt_key, params, result)
+        return result
+    finally:
+        if locked:
+            release_fill_lock(prompt_key, params)
+
+
+def ask_semantic(kind: str, scope: str, topic: str, level: str, question: str,
+                 build_prompt, student_name: str = "",
+                 context: tuple[str, ...] = ()) -> tuple[str, float | None]:
+    """Answer from the per-class semantic cache when a near-duplicate question exists.
+
+    Returns (answer, similarity); similarity is None when Groq was called.
+    Without a scope (class code) the cache is bypassed. `context` lists the
+    other prompt inputs an answer was written for; only askers with the same
+    context share it. Answers addressed to `student_name` are re-addressed
+    to the new asker on a hit.
+    """
+    if SEMANTIC_CACHE_ENABLED and scope:
+        match = _semantic.lookup(scope, kind, topic, level, question, context)
+        if match:
+            entry, similarity = match
+            print(f"[ai_service] semantic HIT ({similarity:.2f}): {kind}/{topic}")
+            answer = entry["answer"]
+            if entry["student_name"] and student_name:
+                # Whole words only, so a student named "Al" leaves "Algebra" alone
+                answer = re.sub(rf"(?<!\w){re.escape(entry['student_name'])}(?!\w)",
+                                lambda _m: student_name, answer)
+            return answer, round(similarity, 3)
+    answer = ask_kind(kind, build_prompt())
+    if SEMANTIC_CACHE_ENABLED and scope:
+        _semantic.store(scope, kind, topic, level, question, answer, context,
+                        student_name=student_name)
+    return answer, None
 
 
 # ── High-level helpers used by routes ──────────────────────────
@@ -59,76 +328,128 @@ def parse_json_response(text: str) -> list | dict | None:
 def generate_notes(topic, level, duration, objectives, style, language, class_code="") -> str:
     from prompts.notes_prompt import build_notes_prompt
     prompt = build_notes_prompt(topic, level, duration, objectives, style, language)
-    return ask_cached("notes", {"topic": topic, "level": level, "language": language}, prompt, max_tokens=4000)
+    return ask_cached("notes", _notes_params(topic, level, duration, objectives, style, language), prompt)
+
+
+def _notes_params(topic, level, duration, objectives, style, language) -> dict:
+    return {"topic": topic, "level": level, "duration": duration, "objectives": objectives,
+            "style": style, "language": language}
+
+
+def stream_notes(topic, level, duration, objectives, style, language) -> Iterator[tuple[str, dict]]:
+    """Yield ("section", {...}) events as each ICAP section completes, then ("done", {"notes": ...})."""
+    from prompts.notes_prompt import build_notes_prompt
+    params = _cache_params("notes", _notes_params(topic, level, duration, objectives, style, language))
+    splitter = IcapSectionSplitter()
+    cached = get_cached("notes", params)
+    if cached:
+        for section in splitter.feed(cached) + splitter.close():
+            yield "section", section
+        yield "done", {"notes": cached, "cached": True}
+        return
+    prompt = build_notes_prompt(topic, level, duration, objectives, style, language)
+    parts = []
+    for delta in ask_stream(prompt, kind="notes"):
+        parts.append(delta)
+        for section in splitter.feed(delta):
+            yield "section", section
+    for section in splitter.close():
+        yield "section", section
+    result = "".join(parts).strip()
+    set_cache("notes", params, result)
+    yield "done", {"notes": result}
+
+
+SLIDESHOW_SLIDES = 18
+QUIZ_QUESTIONS = 5
 
 
 def generate_slideshow(topic, level, duration, notes, language) -> list:
     from prompts.slideshow_prompt import build_slideshow_prompt
     prompt = build_slideshow_prompt(topic, level, duration, notes, language)
-    raw = ask(prompt, max_tokens=6000)
-    slides = parse_json_response(raw)
-    if slides and isinstance(slides, list) and len(slides) > 2:
-        return slides
-    return []
+    key = "slideshow:" + hashlib.sha256(prompt.encode()).hexdigest()
+    slides, _ = _flights.do(key, lambda: ask_json_array("slideshow", prompt, structured.slide, "slides",
+                                                        SLIDESHOW_SLIDES, min_items=3))
+    return slides
+
+
+def stream_slideshow(topic, level, duration, notes, language) -> Iterator[tuple[str, dict]]:
+    """Yield ("slide", {...}) for every completed slide object, then ("done", {"slides": [...]})."""
+    from prompts.slideshow_prompt import build_slideshow_prompt
+    prompt = build_slideshow_prompt(topic, level, duration, notes, language)
+    slides = []
+    for slide in stream_json_array("slideshow", prompt, structured.slide, "slides", SLIDESHOW_SLIDES):
+        yield "slide", {"index": len(slides), "slide": slide}
+        slides.append(slide)
+    yield "done", {"slides": slides}
 
 
 def generate_quiz(topic, level, notes, language) -> list:
     from prompts.quiz_prompt import build_quiz_prompt
     prompt = build_quiz_prompt(topic, level, notes, language)
-    raw = ask_cached("quiz", {"topic": topic, "level": level, "language": language}, prompt, max_tokens=900)
-    result = parse_json_response(raw)
-    return result if isinstance(result, list) else []
+
+    def produce() -> str:
+        questions = ask_json_array("quiz", prompt, structured.quiz_item, "questions", QUIZ_QUESTIONS)
+        return json.dumps(questions) if questions else ""
+
+    # The cache holds the validated question list, not the raw model text
+    raw = ask_cached("quiz", {"topic": topic, "level": level, "notes": notes, "language": language},
+                     prompt, produce)
+    return json.loads(raw) if raw else []
 
 
 def generate_adaptive_question(topic, level, previous_results, language) -> dict:
     from prompts.quiz_prompt import build_adaptive_quiz_prompt
     prompt = build_adaptive_quiz_prompt(topic, level, previous_results, language)
-    raw = ask(prompt, max_tokens=400)
-    result = parse_json_response(raw)
-    return result if isinstance(result, dict) else {}
+    return ask_json_object("adaptive_question", prompt, structured.quiz_item) or {}
 
 
 def generate_study_plan(topic, level, background, language) -> str:
     from prompts.live_tools_prompts import build_study_plan_prompt
     prompt = build_study_plan_prompt(topic, level, background, language)
-    return ask(prompt, max_tokens=1500)
+    return ask_kind("study_plan", prompt)
 
 
 def ai_feedback(title, description, max_score, content) -> str:
     from prompts.live_tools_prompts import build_feedback_prompt
-    return ask(build_feedback_prompt(title, description, max_score, content), max_tokens=300)
+    return ask_kind("ai_feedback", build_feedback_prompt(title, description, max_score, content))
 
 
-def live_question(topic, level, question) -> str:
+def live_question(topic, level, question, class_code="") -> tuple[str, float | None]:
     from prompts.live_tools_prompts import build_live_question_prompt
-    return ask(build_live_question_prompt(topic, level, question))
+    return ask_semantic("live_question", class_code, topic, level, question,
+                        lambda: build_live_question_prompt(topic, level, question))
 
 
-def confusion_rescue(topic, level, confusion) -> str:
+def confusion_rescue(topic, level, confusion, class_code="") -> tuple[str, float | None]:
     from prompts.live_tools_prompts import build_confusion_rescue_prompt
-    return ask(build_confusion_rescue_prompt(topic, level, confusion))
+    return ask_semantic("confusion_rescue", class_code, topic, level, confusion,
+                        lambda: build_confusion_rescue_prompt(topic, level, confusion))
 
 
 def pacing_check(topic, total, elapsed, segment) -> str:
     from prompts.live_tools_prompts import build_pacing_prompt
-    return ask(build_pacing_prompt(topic, total, elapsed, segment))
+    return ask_kind("pacing_check", build_pacing_prompt(topic, total, elapsed, segment))
 
 
 def concept_check(topic, level, question, correct_pct) -> str:
     from prompts.live_tools_prompts import build_concept_check_prompt
-    return ask(build_concept_check_prompt(topic, level, question, correct_pct))
+    return ask_kind("concept_check", build_concept_check_prompt(topic, level, question, correct_pct))
 
 
-def student_question(topic, level, name, year, background, question) -> str:
+def student_question(topic, level, name, year, background, question,
+                     class_code="") -> tuple[str, float | None]:
     from prompts.live_tools_prompts import build_student_question_prompt
-    return ask(build_student_question_prompt(topic, level, name, year, background, question))
+    return ask_semantic("student_question", class_code, topic, level, question,
+                        lambda: build_student_question_prompt(topic, level, name, year, background, question),
+                        student_name=name, context=(year, background))
 
 
 def video_script(topic, level) -> str:
     from prompts.live_tools_prompts import build_video_script_prompt
-    return ask(build_video_script_prompt(topic, level), max_tokens=1200)
+    return ask_kind("video_script", build_video_script_prompt(topic, level))
 
 
 def rubric(task, rubric_type) -> str:
     from prompts.live_tools_prompts import build_rubric_prompt
-    return ask(build_rubric_prompt(task, rubric_type))
+    return ask_kind("rubric", build_rubric_prompt(task, rubric_type))
@@ -0,0 +1,123 @@
+"""Read-through cache of class records and notes, per class code.
+
+Every student of a class calls /get_class and /get_notes when they join,
+usually all at once at the start of the lecture. The first call reads
+and parses the class row; concurrent misses for the same code wait on
+that one read (SingleFlight), and later calls get the cached entry. It
+holds the parsed class without its notes, the notes, the ready-to-send
+response bodies with their ETags, and the notes body precompressed with
+gzip (and brotli when installed).
+
+save_class and save_notes invalidate the code here and, over the live
+bus, in the other workers; CLASS_CACHE_TTL_SECS bounds staleness if a
+relay is missed.
+"""
+import gzip
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from config import CLASS_CACHE_MAX_ENTRIES, CLASS_CACHE_TTL_SECS
+from services import live
+from services.singleflight import SingleFlight
+from storage import repos
+
+try:
+    import brotli
+except ImportError:     # optional: gzip only
+    brotli = None
+
+_COMPRESS_MIN_BYTES = 1024
+
+
+def _body(payload: dict) -> tuple[bytes, str]:
+    body = json.dumps(payload, separators=(",", ":"), sort_keys=True, default=str).encode("utf-8")
+    return body, hashlib.sha256(body).hexdigest()[:32]
+
+
+def _encodings(body: bytes) -> dict[str, bytes]:
+    if len(body) < _COMPRESS_MIN_BYTES:
+        return {}
+    encoded = {"gzip": gzip.compress(body, compresslevel=6)}
+    if brotli is not None:
+        encoded["br"] = brotli.compress(body, quality=9)
+    return encoded
+
+
+class ClassEntry:
+    __slots__ = ("cls", "notes", "class_body", "class_etag", "notes_body", "notes_etag",
+                 "notes_encoded", "expires")
+
+    def __init__(self, cls: dict, ttl_secs: float):
+        cls = dict(cls)
+        self.notes: str = cls.pop("notes", "") or ""
+        self.cls = cls
+        self.class_body, self.class_etag = _body({"success": True, "class": cls})
+        self.notes_body, self.notes_etag = _body({"success": True, "notes": self.notes})
+        self.notes_encoded = _encodings(self.notes_body) if self.notes else {}
+        self.expires = time.monotonic() + ttl_secs
+
+
+class ClassCache:
+    def __init__(self, load, ttl_secs: float = CLASS_CACHE_TTL_SECS,
+                 max_entries: int = CLASS_CACHE_MAX_ENTRIES):
+        self.load = load            # load(code) -> class dict or None
+        self.ttl_secs = ttl_secs
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, ClassEntry] = OrderedDict()
+        self._lock = threading.Lock()
+        self._flights = SingleFlight()
+        self._filling: dict[str, bool] = {}    # code -> still fresh, only while its fill is in flight
+
+    def get(self, code: str) -> ClassEntry | None:
+        """The cached entry for `code`, reading it once on a miss; None if there is no such class."""
+        with self._lock:
+            entry = self._entries.get(code)
+            if entry is not None and entry.expires > time.monotonic():
+                self._entries.move_to_end(code)
+                return entry
+        entry, _ = self._flights.do(code, lambda: self._fill(code))
+        return entry
+
+    def _fill(self, code: str) -> ClassEntry | None:
+        # SingleFlight runs one fill per code at a time, so the flag is ours alone
+        with self._lock:
+            self._filling[code] = True
+        try:
+            cls = self.load(code)
+            entry = ClassEntry(cls, self.ttl_secs) if cls is not None else None
+        finally:
+            with self._lock:
+                fresh = self._filling.pop(code)
+        # A save that landed while we were reading makes this entry stale: serve it once, don't keep it
+        if entry is None or not fresh:
+            return entry
+        with self._lock:
+            self._entries[code] = entry
+            self._entries.move_to_end(code)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def invalidate(self, code: str) -> None:
+        with self._lock:
+            self._entries.pop(code, None)
+            if code in self._filling:
+                self._filling[code] = False
+
+
+cache = ClassCache(lambda code: repos.classes.get(code))
+
+
+def get(code: str) -> ClassEntry | None:
+    return cache.get(code)
+
+
+def changed(code: str) -> None:
+    """Drop `code` here and in the other workers after a write."""
+    cache.invalidate(code)
+    live.relay(code, "class_changed", {"code": code})
+
+
+live.listen("class_changed", lambda _channel, data: cache.invalidate(data["code"]))
@@ -0,0 +1,50 @@
+"""Confusion taps and attendance marks, acknowledged now and written behind.
+
+Both go through services/ingest.py queues, so a handler only builds the
+row and queues it. Confusion viewers get the event straight away and the
+slide's updated counters once its batch is written; attendance marks
+coalesce per (class, date, student), so the latest mark wins.
+"""
+from services import ingest, live
+from storage import repos
+from storage.backends import new_id, now
+
+
+def _write_confusion(events: list[dict]) -> None:
+    repos.confusion.add_many(events)
+    for code, idx in dict.fromkeys((e["class_code"], e["slide_index"]) for e in events):
+        live.publish(code, "confusion", {"slide": repos.confusion.slide(code, idx)})
+
+
+def _write_attendance(marks: list[dict]) -> None:
+    registers: dict[tuple, list[tuple[str, bool]]] = {}
+    for m in marks:
+        registers.setdefault((m["class_code"], m["teacher_email"], m["session_date"]), []) \
+            .append((m["student_name"], m["present"]))
+    for (code, teacher_email, session_date), register in registers.items():
+        repos.attendance.mark_many(code, teacher_email, session_date, register)
+
+
+_confusion = ingest.queue("confusion", _write_confusion)
+_attendance = ingest.queue("attendance", _write_attendance)
+
+
+def record_confusion(class_code: str, student_email: str, student_name: str,
+                     slide_index: int, slide_title: str) -> bool:
+    """Queue one confusion event and push it to viewers; False if it was dropped."""
+    event = {"id": new_id(), "class_code": class_code, "student_email": student_email,
+             "student_name": student_name, "slide_index": slide_index, "slide_title": slide_title,
+             "created_at": now()}
+    if not _confusion.put(event):
+        return False
+    live.publish(class_code, "confusion",
+                 {"event": {k: event[k] for k in ("student_name", "slide_index", "slide_title", "created_at")}})
+    return True
+
+
+def mark_attendance(class_code: str, teacher_email: str, student_name: str,
+                    session_date: str, present: bool) -> bool:
+    """Queue one attendance mark; False if it was dropped."""
+    return _attendance.put({"class_code": class_code, "teacher_email": teacher_email,
+                            "student_name": student_name, "session_date": session_date,
+                            "present": present}, key=(class_code, session_date, student_name))
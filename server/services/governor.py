@@ -0,0 +1,244 @@
+import heapq
+import itertools
+import random
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, TypeVar
+from config import (GROQ_TOKENS_PER_MINUTE, GROQ_BUDGET_BACKEND, GROQ_BUDGET_SQLITE_PATH,
+                    GROQ_MAX_CONCURRENT, GROQ_QUEUE_MAX, GROQ_QUEUE_TIMEOUT_SECS, GROQ_MAX_RETRIES)
+from db.sqlite_client import busy_timeout_ms, immediate
+
+T = TypeVar("T")
+
+# Lower value = served first
+PRIORITY_LIVE = 0           # Layer 2 tools used while a lecture is running
+PRIORITY_INTERACTIVE = 1    # feedback, rubrics, study plans — someone is waiting
+PRIORITY_BULK = 2           # notes, slideshows, quizzes
+
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+
+class UpstreamBusyError(RuntimeError):
+    """Raised when a call cannot be admitted (queue full or waited too long)."""
+
+
+class UpstreamError(RuntimeError):
+    """Raised when Groq keeps failing after all retries."""
+
+
+class _Slot:
+    __slots__ = ("estimate", "used")
+
+    def __init__(self, estimate: int):
+        self.estimate = estimate
+        self.used: int | None = None    # set to the real token usage when known
+
+
+# ── Token budget ────────────────────────────────────────────────
+# A token bucket of `capacity` tokens refilled at `rate` per second. Each
+# backend applies one change to the refilled balance atomically; the
+# governor calls them with its own lock held.
+
+class _Bucket:
+    capacity: float
+    rate: float
+
+    def _update(self, change: Callable[[float], tuple[float, T]]) -> T:
+        """Refill, then replace the balance with change(balance)[0]; returns [1]."""
+        raise NotImplementedError
+
+    def take(self, n: float) -> float:
+        """Take `n` tokens if there are that many; returns how many are missing (0 if taken)."""
+        return self._update(lambda tokens: (tokens - n, 0.0) if tokens >= n else (tokens, n - tokens))
+
+    def give(self, n: float) -> None:
+        self._update(lambda tokens: (min(self.capacity, tokens + n), None))
+
+    def drain(self) -> None:
+        self._update(lambda tokens: (min(tokens, 0.0), None))
+
+    def available(self) -> float:
+        return self._update(lambda tokens: (tokens, tokens))
+
+
+class MemoryBucket(_Bucket):
+    """The budget of one worker process."""
+
+    def __init__(self, capacity: float, rate: float):
+        self.capacity, self.rate = capacity, rate
+        self._tokens = float(capacity)
+        self._stamp = time.monotonic()
+
+    def _update(self, change):
+        now = time.monotonic()
+        tokens = min(self.capacity, self._tokens + (now - self._stamp) * self.rate)
+        self._tokens, result = change(tokens)
+        self._stamp = now
+        return result
+
+
+class SQLiteBucket(_Bucket):
+    """The budget in a local SQLite file, drawn on by every gunicorn worker on the host."""
+
+    def __init__(self, path: str, capacity: float, rate: float, name: str = "groq"):
+        self.path, self.capacity, self.rate, self.name = path, capacity, rate, name
+        self._local = threading.local()
+        self._conn().execute("""CREATE TABLE IF NOT EXISTS token_buckets (
+            name TEXT PRIMARY KEY, tokens REAL, stamp REAL)""")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=busy_timeout_ms() / 1000, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=OFF")
+            self._local.conn = conn
+        return conn
+
+    def _update(self, change):
+        now = time.time()
+        with immediate(self._conn()) as conn:
+            row = conn.execute("SELECT tokens, stamp FROM token_buckets WHERE name=?", (self.name,)).fetchone()
+            tokens = self.capacity if row is None else \
+                min(self.capacity, row[0] + max(0.0, now - row[1]) * self.rate)
+            tokens, result = change(tokens)
+            conn.execute("""INSERT INTO token_buckets (name, tokens, stamp) VALUES(?,?,?)
+                ON CONFLICT(name) DO UPDATE SET tokens=excluded.tokens, stamp=excluded.stamp""",
+                         (self.name, tokens, now))
+        return result
+
+
+class UpstreamGovernor:
+    """Admission control for Groq calls.
+
+    Budgets tokens per minute with a token bucket, charged at admission by
+    the caller's estimate (prompt + max_tokens) and refunded once the real
+    usage is known. The bucket is this worker's own or, given a
+    SQLiteBucket, shared by every worker on the host, so N workers still
+    spend one budget. Waiters queue in this worker by priority then
+    arrival; the queue is bounded in length and wait time. A share of the
+    worker's concurrency slots is held back for live Layer 2 calls, so bulk
+    generation can never starve a lecture that is in progress.
+    """
+
+    def __init__(self, tokens_per_minute: int, max_concurrent: int, max_queue: int,
+                 max_wait_secs: float, live_reserve: float = 0.25, bucket: _Bucket | None = None):
+        self.capacity = tokens_per_minute
+        self.rate = tokens_per_minute / 60.0
+        self.max_concurrent = max_concurrent
+        self.bulk_concurrent = max(1, int(max_concurrent * (1 - live_reserve)))
+        self.max_queue = max_queue
+        self.max_wait_secs = max_wait_secs
+        self._bucket = bucket or MemoryBucket(self.capacity, self.rate)
+        self._in_flight = 0
+        self._queue: list[tuple[int, int]] = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+
+    def _concurrency_limit(self, priority: int) -> int:
+        return self.max_concurrent if priority == PRIORITY_LIVE else self.bulk_concurrent
+
+    @contextmanager
+    def slot(self, estimate: int, priority: int = PRIORITY_INTERACTIVE):
+        """Hold one upstream slot; set `slot.used` to refund unused tokens."""
+        estimate = min(max(1, estimate), self.capacity)
+        entry = (priority, next(self._seq))
+        deadline = time.monotonic() + self.max_wait_secs
+        with self._cond:
+            if len(self._queue) >= self.max_queue:
+                raise UpstreamBusyError("AI service is busy — please try again in a few seconds.")
+            heapq.heappush(self._queue, entry)
+            try:
+                while True:
+                    missing = None
+                    if self._queue[0] == entry and self._in_flight < self._concurrency_limit(priority):
+                        missing = self._bucket.take(estimate)
+                        if not missing:
+                            break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise UpstreamBusyError("AI service is busy — please try again in a few seconds.")
+                    # Other workers' refunds don't notify us; the refill time bounds the wait
+                    self._cond.wait(remaining if missing is None else min(remaining, missing / self.rate))
+            finally:
+                self._queue.remove(entry)
+                heapq.heapify(self._queue)
+                self._cond.notify_all()
+            self._in_flight += 1
+        s = _Slot(estimate)
+        try:
+            yield s
+        finally:
+            with self._cond:
+                self._in_flight -= 1
+                if s.used is not None and s.used < estimate:
+                    self._bucket.give(estimate - s.used)
+                self._cond.notify_all()
+
+    def penalize(self) -> None:
+        """Upstream said 429 — drain the bucket so everyone backs off together."""
+        with self._cond:
+            self._bucket.drain()
+
+    def snapshot(self) -> dict:
+        with self._cond:
+            return {"tokens_available": int(self._bucket.available()), "in_flight": self._in_flight,
+                    "queued": len(self._queue)}
+
+
+def _status_of(exc: Exception) -> int | None:
+    status = getattr(exc, "status_code", None)
+    if status is None and getattr(exc, "response", None) is not None:
+        status = getattr(exc.response, "status_code", None)
+    return status
+
+
+def _is_retryable(exc: Exception) -> bool:
+    import groq
+    if isinstance(exc, (groq.APIConnectionError, groq.APITimeoutError)):
+        return True
+    return _status_of(exc) in RETRYABLE_STATUS
+
+
+def _retry_after(exc: Exception) -> float | None:
+    response = getattr(exc, "response", None)
+    try:
+        return float(response.headers.get("retry-after"))
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+def call_with_retry(fn: Callable[[], T], retries: int = GROQ_MAX_RETRIES,
+                    base_delay: float = 0.5, max_delay: float = 20.0) -> T:
+    """Run fn, retrying retryable Groq errors with full-jitter exponential backoff."""
+    for attempt in range(retries + 1):
+        try:
+            return fn()
+        except UpstreamBusyError:
+            raise
+        except Exception as e:
+            if not _is_retryable(e):
+                raise
+            if _status_of(e) == 429:
+                governor.penalize()
+            if attempt == retries:
+                raise UpstreamError("AI service is temporarily unavailable — please try again shortly.") from e
+            delay = _retry_after(e) or random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+            print(f"[governor] retry {attempt + 1}/{retries} in {delay:.1f}s after: {e}")
+            time.sleep(min(delay, max_delay))
+    raise AssertionError("unreachable")
+
+
+def _make_bucket(name: str) -> _Bucket:
+    rate = GROQ_TOKENS_PER_MINUTE / 60.0
+    if name == "sqlite":
+        return SQLiteBucket(GROQ_BUDGET_SQLITE_PATH, GROQ_TOKENS_PER_MINUTE, rate)
+    return MemoryBucket(GROQ_TOKENS_PER_MINUTE, rate)
+
+
+# Singleton
+governor = UpstreamGovernor(GROQ_TOKENS_PER_MINUTE, GROQ_MAX_CONCURRENT,
+                            GROQ_QUEUE_MAX, GROQ_QUEUE_TIMEOUT_SECS,
+                            bucket=_make_bucket(GROQ_BUDGET_BACKEND))
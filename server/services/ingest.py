@@ -0,0 +1,237 @@
+"""Write-behind ingestion for high-frequency classroom events.
+
+Handlers put() an event and return at once; a background flusher per
+queue hands whatever has accumulated to its sink in batches, so a burst
+of hundreds of taps per second becomes a few bulk writes.
+
+Each queue is bounded. Events that carry a coalesce key replace the
+pending event with the same key (a student re-marked present twice is
+one write); anything else arriving at a full queue is dropped and
+counted, so overload sheds load instead of growing memory.
+
+Accepted events are appended to a spill file in INGEST_SPILL_DIR before
+put() returns, and the file is deleted once its events are written. A
+batch whose write fails goes back to the front of the queue, its spill
+file kept, and is retried with backoff. A worker holds a flock on each of
+its spill files until they are deleted; a worker that starts up replays
+every spill file it can lock, i.e. those of dead workers, so a crash or a
+container restart loses nothing already acknowledged. Spill lines are
+flushed to the OS, not fsynced: a host crash can still lose the last
+moments.
+
+Replays and retries can hand a sink events it has already written, so
+sinks must be idempotent (rows are inserted by id, see insert_new()).
+"""
+import atexit
+import fcntl
+import glob
+import json
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Callable
+from config import INGEST_BATCH, INGEST_FLUSH_MS, INGEST_QUEUE_MAX, INGEST_SPILL_DIR
+
+_MAX_BACKOFF_SECS = 30
+
+
+class _SpillFile:
+    """A journal of accepted events, flock'ed by its writer until they are written.
+
+    It is created under a temporary name and renamed once locked, so replay()
+    never finds an unlocked spill file whose writer is still alive. Names are
+    unique per process start, so files from before a restart never look like
+    ours, whatever PIDs the new workers get.
+    """
+
+    def __init__(self, spill_dir: str, name: str):
+        os.makedirs(spill_dir, exist_ok=True)
+        stem = f"{name}-{time.time_ns()}-{uuid.uuid4().hex[:12]}"
+        tmp = os.path.join(spill_dir, f".{stem}.tmp")
+        self.path = os.path.join(spill_dir, f"{stem}.jsonl")
+        self._file = open(tmp, "a", encoding="utf-8")
+        fcntl.flock(self._file, fcntl.LOCK_EX)
+        os.rename(tmp, self.path)
+
+    def append(self, event: dict) -> None:
+        self._file.write(json.dumps(event) + "\n")
+        self._file.flush()
+
+    def discard(self) -> None:
+        # Delete before unlocking, so a replaying worker never locks a written file
+        os.remove(self.path)
+        self._file.close()
+
+
+class WriteBehind:
+    def __init__(self, name: str, sink: Callable[[list[dict]], None], maxsize: int = INGEST_QUEUE_MAX,
+                 batch: int = INGEST_BATCH, flush_secs: float = INGEST_FLUSH_MS / 1000,
+                 spill_dir: str | None = INGEST_SPILL_DIR):
+        self.name = name
+        self.sink = sink            # sink(events) writes one batch; raising keeps the spill file
+        self.maxsize = maxsize
+        self.batch = batch
+        self.flush_secs = flush_secs
+        self.spill_dir = spill_dir
+        self.dropped = 0
+        self.coalesced = 0
+        self._pending: OrderedDict[object, dict] = OrderedDict()
+        self._seq = 0
+        self._cond = threading.Condition()
+        self._spill: _SpillFile | None = None
+        self._kept: list[_SpillFile] = []   # spill files of failed batches, now back in _pending
+        self._failures = 0
+        self._started = False
+
+    # ── Handler side ────────────────────────────────────────────
+
+    def put(self, event: dict, key=None) -> bool:
+        """Queue `event` for writing; False if it was dropped because the queue is full."""
+        with self._cond:
+            if key is not None and key in self._pending:
+                self._pending[key] = event
+                self.coalesced += 1
+            elif len(self._pending) >= self.maxsize:
+                self.dropped += 1
+                return False
+            else:
+                if key is None:
+                    self._seq += 1
+                    key = ("_", self._seq)
+                self._pending[key] = event
+            self._journal(event)
+            self._cond.notify()
+        self._start()
+        return True
+
+    def _journal(self, event: dict) -> None:
+        # Caller holds the lock
+        if not self.spill_dir:
+            return
+        if self._spill is None:
+            self._spill = _SpillFile(self.spill_dir, self.name)
+        self._spill.append(event)
+
+    # ── Flusher side ────────────────────────────────────────────
+
+    def _take(self) -> tuple[list[tuple[object, dict]], list[_SpillFile]]:
+        """Everything pending and the spill files that hold at least those events."""
+        with self._cond:
+            items, self._pending = list(self._pending.items()), OrderedDict()
+            files, self._kept = self._kept, []
+            if self._spill is not None:
+                files.append(self._spill)
+                self._spill = None
+        return items, files
+
+    def _requeue(self, items: list[tuple[object, dict]], files: list[_SpillFile]) -> None:
+        # Ahead of anything queued since, which also wins on a shared coalesce key
+        with self._cond:
+            pending = OrderedDict(items)
+            pending.update(self._pending)
+            self._pending = pending
+            self._kept += files
+
+    def flush(self) -> int:
+        """Write everything pending now; returns how many events were written.
+
+        On failure the unwritten events are queued again and kept in their
+        spill files until a later flush writes them.
+        """
+        items, files = self._take()
+        written = 0
+        try:
+            for i in range(0, len(items), self.batch):
+                self.sink([event for _, event in items[i:i + self.batch]])
+                written = min(i + self.batch, len(items))
+        except Exception as e:
+            self._failures += 1
+            print(f"[ingest] {self.name}: write of {len(items) - written} events failed, will retry: {e}")
+            self._requeue(items[written:], files)
+            return written
+        self._failures = 0
+        for spill in files:
+            spill.discard()
+        return written
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+            # Let the burst build into one batch; back off while writes keep failing
+            time.sleep(min(self.flush_secs * 2 ** min(self._failures, 16), _MAX_BACKOFF_SECS))
+            self.flush()
+
+    def _start(self) -> None:
+        if self._started:
+            return
+        with self._cond:
+            if self._started:
+                return
+            self._started = True
+        threading.Thread(target=self._run, name=f"ingest-{self.name}", daemon=True).start()
+
+    # ── Crash recovery ──────────────────────────────────────────
+
+    def replay(self) -> int:
+        """Write the spill files no live worker holds; returns how many events."""
+        if not self.spill_dir:
+            return 0
+        total = 0
+        for path in sorted(glob.glob(os.path.join(self.spill_dir, f"{self.name}-*.jsonl"))):
+            try:
+                f = open(path, encoding="utf-8")
+            except FileNotFoundError:
+                continue
+            with f:
+                try:
+                    # Held by its live writer, or by another worker replaying it
+                    fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    continue
+                if not os.path.exists(path):    # written and deleted while we opened it
+                    continue
+                # A line cut short by the crash is the only one that can fail to parse
+                events = [json.loads(line) for line in f if line.endswith("\n")]
+                try:
+                    for i in range(0, len(events), self.batch):
+                        self.sink(events[i:i + self.batch])
+                except Exception as e:
+                    print(f"[ingest] {self.name}: replay of {path} failed: {e}")
+                    continue
+                os.remove(path)
+            total += len(events)
+        if total:
+            print(f"[ingest] {self.name}: replayed {total} events from spill files")
+        return total
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {"pending": len(self._pending), "dropped": self.dropped, "coalesced": self.coalesced}
+
+
+_queues: list[WriteBehind] = []
+
+
+def queue(name: str, sink: Callable[[list[dict]], None]) -> WriteBehind:
+    """A write-behind queue that is replayed at startup and drained at exit."""
+    q = WriteBehind(name, sink)
+    _queues.append(q)
+    return q
+
+
+def replay_spills() -> None:
+    for q in _queues:
+        try:
+            q.replay()
+        except Exception as e:
+            print(f"[ingest] {q.name}: replay failed: {e}")
+
+
+@atexit.register
+def _drain() -> None:
+    for q in _queues:
+        q.flush()
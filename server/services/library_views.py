@@ -0,0 +1,61 @@
+"""Library view counts, aggregated in memory and written in bulk.
+
+/library/get only bumps a per-lecture counter here. Every
+LIBRARY_VIEW_FLUSH_SECS the counts are swapped out and added to
+view_count and trend_score with one bulk update (LibraryRepo.add_views),
+so a popular lecture costs one write per interval instead of one per
+view, and no increment is lost to a read-modify-write. Views still held
+in memory when a worker is killed are lost; exit flushes them.
+"""
+import atexit
+import threading
+import time
+from typing import Callable
+from config import LIBRARY_VIEW_FLUSH_SECS
+from storage import repos
+
+
+class ViewCounter:
+    def __init__(self, flush: Callable[[dict[str, int]], None], interval_secs: float):
+        self._flush = flush
+        self.interval_secs = interval_secs
+        self._pending: dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._started = False
+
+    def record(self, lid: str, n: int = 1) -> None:
+        with self._lock:
+            self._pending[lid] = self._pending.get(lid, 0) + n
+            start, self._started = not self._started, True
+        if start:
+            threading.Thread(target=self._run, name="library-views", daemon=True).start()
+
+    def flush(self) -> int:
+        """Write the pending counts now; returns how many lectures were updated."""
+        with self._lock:
+            views, self._pending = self._pending, {}
+        if not views:
+            return 0
+        try:
+            self._flush(views)
+        except Exception as e:
+            # Keep them for the next interval rather than drop them
+            print(f"[library_views] flush of {len(views)} lectures failed: {e}")
+            with self._lock:
+                for lid, n in views.items():
+                    self._pending[lid] = self._pending.get(lid, 0) + n
+            return 0
+        return len(views)
+
+    def _run(self) -> None:
+        while True:
+            time.sleep(self.interval_secs)
+            self.flush()
+
+
+counter = ViewCounter(lambda views: repos.library.add_views(views), LIBRARY_VIEW_FLUSH_SECS)
+atexit.register(counter.flush)
+
+
+def record(lid: str) -> None:
+    counter.record(lid)
@@ -0,0 +1,235 @@
+"""Live push: per-class fan-out of reaction, confusion and discussion events.
+
+Writers call publish(); every open /live/<code> stream for that class gets
+the event over SSE. Each viewer has a bounded queue, so a slow client
+never holds up a writer: when its queue overflows the backlog is dropped
+and the viewer is sent one `resync` event telling it to refetch.
+
+With several gunicorn workers a viewer is connected to only one of them,
+so events are also relayed through a bus (LIVE_BUS) that every worker on
+the host polls. The same bus carries relay() messages, which go to
+listen() callbacks in the other workers instead of to viewers — that is
+how per-worker in-memory state (services/reactions.py) stays in step.
+"""
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Callable, Iterator
+from config import (LIVE_BUS, LIVE_BUS_SQLITE_PATH, LIVE_BUS_POLL_MS, LIVE_HEARTBEAT_SECS,
+                    LIVE_QUEUE_MAX)
+from db.sqlite_client import busy_timeout_ms, immediate
+from services.streaming import sse_event
+
+RESYNC = "resync"
+_RELAY = "@"       # bus event prefix for relay() messages
+
+
+def channel(class_code: str) -> str:
+    return (class_code or "").upper().strip()
+
+
+class Subscriber:
+    def __init__(self, maxsize: int):
+        self.queue: queue.Queue[tuple[str, object]] = queue.Queue(maxsize=maxsize)
+
+    def offer(self, event: str, data) -> None:
+        try:
+            self.queue.put_nowait((event, data))
+        except queue.Full:
+            # Backpressure: discard the backlog, tell the client to refetch instead
+            while True:
+                try:
+                    self.queue.get_nowait()
+                except queue.Empty:
+                    break
+            self.queue.put_nowait((RESYNC, {}))
+
+
+class Hub:
+    """In-process subscribers per class channel."""
+
+    def __init__(self, queue_max: int = LIVE_QUEUE_MAX):
+        self.queue_max = queue_max
+        self._subs: dict[str, set[Subscriber]] = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, code: str) -> Subscriber:
+        sub = Subscriber(self.queue_max)
+        with self._lock:
+            self._subs.setdefault(code, set()).add(sub)
+        return sub
+
+    def unsubscribe(self, code: str, sub: Subscriber) -> None:
+        with self._lock:
+            subs = self._subs.get(code)
+            if subs is not None:
+                subs.discard(sub)
+                if not subs:
+                    del self._subs[code]
+
+    def deliver(self, code: str, event: str, data) -> None:
+        with self._lock:
+            subs = list(self._subs.get(code, ()))
+        for sub in subs:
+            sub.offer(event, data)
+
+    def viewers(self, code: str | None = None) -> int:
+        with self._lock:
+            if code is not None:
+                return len(self._subs.get(code, ()))
+            return sum(len(s) for s in self._subs.values())
+
+
+# ── Cross-worker bus ────────────────────────────────────────────
+
+class SQLiteBus:
+    """Relays events between workers on one host through a local SQLite file.
+
+    Every worker appends what it publishes and polls for rows other workers
+    appended. Rows older than `retain_secs` are swept; a worker with no
+    viewers just skips ahead.
+    """
+
+    def __init__(self, path: str, hub: Hub, poll_secs: float, retain_secs: int = 60):
+        self.hub = hub
+        self.poll_secs = poll_secs
+        self.retain_secs = retain_secs
+        self.origin = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._conn = sqlite3.connect(path, timeout=busy_timeout_ms() / 1000, isolation_level=None,
+                                     check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=OFF")       # events are transient
+        self._conn.execute("""CREATE TABLE IF NOT EXISTS live_events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, origin TEXT, channel TEXT,
+            event TEXT, data TEXT, created_at REAL)""")
+        self._lock = threading.Lock()
+        self._last_id = self._max_id()
+        self._started = False
+
+    def _max_id(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COALESCE(MAX(id), 0) FROM live_events").fetchone()[0]
+
+    def publish(self, code: str, event: str, data) -> None:
+        with self._lock, immediate(self._conn) as conn:
+            conn.execute(
+                "INSERT INTO live_events (origin, channel, event, data, created_at) VALUES(?,?,?,?,?)",
+                (self.origin, code, event, json.dumps(data), time.time()))
+
+    def poll(self) -> int:
+        """Deliver events other workers published since the last poll; returns how many."""
+        if not self.hub.viewers() and not _listeners:
+            self._last_id = self._max_id()
+            return 0
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, origin, channel, event, data FROM live_events WHERE id > ? ORDER BY id",
+                (self._last_id,)).fetchall()
+        for row_id, origin, code, event, data in rows:
+            self._last_id = row_id
+            if origin == self.origin:
+                continue
+            if event.startswith(_RELAY):
+                for fn in _listeners.get(event[len(_RELAY):], ()):
+                    fn(code, json.loads(data))
+            else:
+                self.hub.deliver(code, event, json.loads(data))
+        return len(rows)
+
+    def sweep(self) -> None:
+        with self._lock, immediate(self._conn) as conn:
+            conn.execute("DELETE FROM live_events WHERE created_at < ?", (time.time() - self.retain_secs,))
+
+    def _run(self) -> None:
+        next_sweep = 0.0
+        while True:
+            time.sleep(self.poll_secs)
+            try:
+                self.poll()
+                if time.monotonic() >= next_sweep:
+                    self.sweep()
+                    next_sweep = time.monotonic() + self.retain_secs
+            except Exception as e:
+                print(f"[live] bus error: {e}")
+
+    def start(self) -> None:
+        if not self._started:
+            self._started = True
+            threading.Thread(target=self._run, name="live-bus", daemon=True).start()
+
+
+# ── Module API ──────────────────────────────────────────────────
+
+_hub = Hub()
+_bus: SQLiteBus | None = None
+_bus_lock = threading.Lock()
+_listeners: dict[str, list[Callable[[str, object], None]]] = {}
+
+
+def _get_bus() -> SQLiteBus | None:
+    global _bus
+    if LIVE_BUS != "sqlite":
+        return None
+    with _bus_lock:
+        if _bus is None:
+            _bus = SQLiteBus(LIVE_BUS_SQLITE_PATH, _hub, LIVE_BUS_POLL_MS / 1000)
+            _bus.start()
+        return _bus
+
+
+def publish(class_code: str, event: str, data) -> None:
+    """Push `event` to every viewer of the class, in this worker and the others."""
+    code = channel(class_code)
+    if not code:
+        return
+    _hub.deliver(code, event, data)
+    bus = _get_bus()
+    if bus is not None:
+        try:
+            bus.publish(code, event, data)
+        except sqlite3.Error as e:
+            print(f"[live] bus publish failed: {e}")   # local viewers already have it
+
+
+def relay(class_code: str, event: str, data) -> None:
+    """Send `event` to the listen() callbacks of the other workers (not to viewers)."""
+    bus = _get_bus()
+    if bus is not None:
+        try:
+            bus.publish(channel(class_code), _RELAY + event, data)
+        except sqlite3.Error as e:
+            print(f"[live] bus relay failed: {e}")
+
+
+def listen(event: str, fn: Callable[[str, object], None]) -> None:
+    """Call fn(channel, data) for each relay() of `event` made by another worker."""
+    _listeners.setdefault(event, []).append(fn)
+    _get_bus()
+
+
+def stream(class_code: str, snapshot: Callable[[], list[tuple[str, object]]] | None = None,
+           heartbeat_secs: float = LIVE_HEARTBEAT_SECS) -> Iterator[str]:
+    """SSE frames for one viewer: the `snapshot()` events, then live events, with heartbeats.
+
+    The snapshot is taken after subscribing, so no write can fall between the two.
+    """
+    code = channel(class_code)
+    _get_bus()      # make sure this worker is listening before the first event
+    sub = _hub.subscribe(code)
+    try:
+        for event, data in (snapshot() if snapshot else []):
+            yield sse_event(event, data)
+        while True:
+            try:
+                event, data = sub.queue.get(timeout=heartbeat_secs)
+            except queue.Empty:
+                # SSE comment: keeps proxies from idling the connection out
+                yield ": ping\n\n"
+                continue
+            yield sse_event(event, data)
+    finally:
+        _hub.unsubscribe(code, sub)
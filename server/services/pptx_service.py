@@ -1,11 +1,11 @@
 import io
-import json
 import re
 from pptx import Presentation
 from pptx.util import Inches, Pt
 from pptx.dml.color import RGBColor
 from pptx.enum.text import PP_ALIGN
 import services.ai_service as ai
+from services import structured
 
 
 GREEN   = RGBColor(0x2d, 0x6a, 0x4f)
@@ -51,7 +51,7 @@ def _txt(slide, text, l, t, w, h, sz=18, bold=False, color=None, align=PP_ALIGN.
     run.font.color.rgb = color if color else DARK
 
 
-def _parse_sections(notes: str, topic: str, level: str) -> list:
+def _parse_sections(notes: str, topic: str, level: str, objectives: str = "") -> list:
     """Extract slide sections from notes or generate via AI."""
     slide_sections = []
     if notes and len(notes) > 200:
@@ -66,10 +66,12 @@ def _parse_sections(notes: str, topic: str, level: str) -> list:
             if lines:
                 slide_sections.append({"title": header.strip(), "bullets": lines, "icap": tag})
 
+    objs = [o.strip() for o in objectives.split("\n") if o.strip()][:4]
     if len(slide_sections) < 5:
         try:
+            given = "The teacher's learning objectives:\n" + "\n".join(objs) + "\n" if objs else ""
             gen_p = f"""For a {level}-level lecture on "{topic}", generate slide content.
-Return ONLY valid JSON array (no markdown):
+{given}Return ONLY valid JSON array (no markdown):
 [
   {{"title":"Learning Objectives","bullets":["Obj 1","Obj 2","Obj 3"],"icap":"PASSIVE"}},
   {{"title":"Why This Matters","bullets":["Point 1","Point 2","Point 3"],"icap":"PASSIVE"}},
@@ -82,16 +84,14 @@ Return ONLY valid JSON array (no markdown):
   {{"title":"Key Takeaways","bullets":["Key 1","Key 2","Key 3","Key 4"],"icap":"PASSIVE"}}
 ]
 Make every bullet a complete, informative sentence about {topic}."""
-            raw = ai.ask(gen_p, max_tokens=2000)
-            match = re.search(r'\[.*\]', raw, re.DOTALL)
-            if match:
-                slide_sections = json.loads(match.group())
+            slide_sections = ai.ask_json_array("slide_outline", gen_p, structured.outline_section,
+                                               "sections", 9, min_items=3) or slide_sections
         except Exception:
             pass
 
     if len(slide_sections) < 3:
         slide_sections = [
-            {"title": "Learning Objectives",    "bullets": [f"Understand {topic}", "Apply key concepts", "Analyse and evaluate", "Connect to practice"], "icap": "PASSIVE"},
+            {"title": "Learning Objectives",    "bullets": objs or [f"Understand {topic}", "Apply key concepts", "Analyse and evaluate", "Connect to practice"], "icap": "PASSIVE"},
             {"title": "Why This Matters",        "bullets": [f"Real relevance of {topic}", "Industry applications", "What problem it solves", "Why professionals need this"], "icap": "PASSIVE"},
             {"title": "Core Concepts",           "bullets": ["Fundamental definitions", "Key properties", "How components relate", "Underlying logic"], "icap": "ACTIVE"},
             {"title": "Worked Example",          "bullets": ["Define the problem", "Choose the approach", "Apply step by step", "Interpret the result"], "icap": "ACTIVE"},
@@ -146,7 +146,7 @@ def build_pptx(d: dict) -> io.BytesIO:
     _txt(s2, "Higher engagement → deeper learning outcomes (Chi & Wylie, 2014)", 0.5, 5.2, 12.33, 0.5, sz=14, bold=True, color=GREEN)
 
     # ── Content slides ───────────────────────────────────────────
-    slide_sections = _parse_sections(notes, topic, level)
+    slide_sections = _parse_sections(notes, topic, level, objectives)
     for idx, section in enumerate(slide_sections):
         s = prs.slides.add_slide(blank)
         is_dark  = idx % 2 == 1
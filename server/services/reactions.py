@@ -0,0 +1,134 @@
+"""Rolling reaction counts served from memory.
+
+Each class keeps a ring of per-second buckets covering the count window,
+so recording a reaction is O(1) and reading the counts is O(window) no
+matter how many reactions arrive. A student's reaction replaces their own
+from the last REPLACE_WINDOW_SECS, as the table-backed version did.
+
+Rows are still written to the reactions table as an append-only history,
+through a write-behind queue (services/ingest.py); a worker that has not
+seen a class yet replays the window from there. Workers relay reactions
+to each other over the live bus so every worker's counts are whole.
+"""
+import calendar
+import threading
+import time
+from services import ingest, live
+from storage import repos
+from storage.backends import new_id, now
+from storage.repositories import ReactionRepo
+
+def _epoch(stamp: str) -> int:
+    return calendar.timegm(time.strptime(stamp, "%Y-%m-%d %H:%M:%S"))
+
+
+class _ClassWindow:
+    __slots__ = ("seconds", "buckets", "last", "seen", "active")
+
+    def __init__(self, size: int):
+        self.seconds = [-1] * size                      # which epoch second each slot holds
+        self.buckets: list[dict[str, int]] = [{} for _ in range(size)]
+        self.last: dict[str, tuple[int, str]] = {}     # student -> (second, reaction)
+        self.seen: dict[str, int] = {}                 # reaction id -> second, to skip replays
+        self.active = 0
+
+
+class ReactionWindow:
+    def __init__(self, window_secs: int = ReactionRepo.COUNT_WINDOW_SECS,
+                 replace_secs: int = ReactionRepo.REPLACE_WINDOW_SECS, loader=None):
+        self.window_secs = window_secs
+        self.replace_secs = replace_secs
+        self.loader = loader            # loader(code) -> rows with id, student_email, reaction, created_at
+        self._classes: dict[str, _ClassWindow] = {}
+        self._lock = threading.Lock()
+        self._next_sweep = 0.0
+
+    def _window(self, code: str) -> _ClassWindow:
+        cw = self._classes.get(code)
+        if cw is not None:
+            return cw
+        rows = self.loader(code) if self.loader else []
+        with self._lock:
+            if code not in self._classes:
+                self._classes[code] = cw = _ClassWindow(self.window_secs)
+                for r in rows:
+                    self._apply(cw, r["id"], r["student_email"] or "", r["reaction"], _epoch(r["created_at"]))
+            return self._classes[code]
+
+    def _apply(self, cw: _ClassWindow, rid: str, student: str, reaction: str, sec: int) -> None:
+        if rid in cw.seen:
+            return
+        cw.seen[rid] = sec
+        prev = cw.last.get(student)
+        # A relayed reaction can arrive after a newer one from the same student:
+        # it never replaces that one, and is dropped if that one would have replaced it
+        newer = prev is None or sec >= prev[0]
+        if not newer and prev[0] - sec < self.replace_secs:
+            return
+        if newer and prev and sec - prev[0] < self.replace_secs:
+            i = prev[0] % self.window_secs
+            if cw.seconds[i] == prev[0] and cw.buckets[i].get(prev[1]):
+                cw.buckets[i][prev[1]] -= 1
+        i = sec % self.window_secs
+        if cw.seconds[i] != sec:
+            cw.seconds[i], cw.buckets[i] = sec, {}
+        cw.buckets[i][reaction] = cw.buckets[i].get(reaction, 0) + 1
+        if newer:
+            cw.last[student] = (sec, reaction)
+        cw.active = max(cw.active, sec)
+
+    def add(self, code: str, rid: str, student: str, reaction: str, at: float | None = None) -> None:
+        cw = self._window(code)
+        with self._lock:
+            self._apply(cw, rid, student, reaction, int(at if at is not None else time.time()))
+
+    def counts(self, code: str, at: float | None = None) -> dict[str, int]:
+        """Reactions per emoji over the last window_secs."""
+        cw = self._window(code)
+        floor = int(at if at is not None else time.time()) - self.window_secs
+        totals: dict[str, int] = {}
+        with self._lock:
+            for sec, bucket in zip(cw.seconds, cw.buckets):
+                if sec > floor:
+                    for reaction, n in bucket.items():
+                        if n:
+                            totals[reaction] = totals.get(reaction, 0) + n
+            self._maybe_sweep(floor)
+        return totals
+
+    def _maybe_sweep(self, floor: int) -> None:
+        # Caller holds the lock. Forget idle classes and expired per-student state.
+        if time.monotonic() < self._next_sweep:
+            return
+        self._next_sweep = time.monotonic() + self.replace_secs
+        for code in [c for c, cw in self._classes.items() if cw.active <= floor]:
+            del self._classes[code]
+        for cw in self._classes.values():
+            cw.last = {s: v for s, v in cw.last.items() if v[0] > floor}
+            cw.seen = {r: sec for r, sec in cw.seen.items() if sec > floor}
+
+
+window = ReactionWindow(loader=lambda code: repos.reactions.since(code))
+_history = ingest.queue("reactions", lambda rows: repos.reactions.add_many(rows))
+
+
+def record(class_code: str, student_email: str, student_name: str, reaction: str) -> None:
+    """Count a reaction now; persist it and tell the other workers in the background."""
+    rid, stamp = new_id(), now()
+    at = _epoch(stamp)
+    window.add(class_code, rid, student_email, reaction, at)
+    _history.put({"id": rid, "class_code": class_code, "student_email": student_email,
+                  "student_name": student_name, "reaction": reaction, "created_at": stamp})
+    live.relay(class_code, "reaction", {"id": rid, "class_code": class_code, "student": student_email,
+                                        "reaction": reaction, "at": at})
+
+
+def counts(class_code: str) -> dict[str, int]:
+    return window.counts(class_code)
+
+
+def _on_remote(_channel: str, data: dict) -> None:
+    window.add(data["class_code"], data["id"], data["student"], data["reaction"], data["at"])
+
+
+live.listen("reaction", _on_remote)
@@ -0,0 +1,129 @@
+import math
+import re
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+_WORD = re.compile(r"[a-z0-9]+")
+# Negations are deliberately not stopwords: "is a whale a fish" and "is a
+# whale not a fish" must not share an answer
+_STOPWORDS = frozenset("""
+a an and are as at be but by can could did do does doing for from had has have how i if in
+is it its me my of on or so that the their them then there these they this to was we were
+what when where which who why will with would you your please just really actually still s
+""".split())
+_NEGATIONS = frozenset("not no never nor none neither without".split())
+_CONTRACTION = re.compile(r"(?:n't|n’t)\b|\bcannot\b")
+_NUMBER = re.compile(r"\d+(?:\.\d+)?")
+_SYMBOL = re.compile(r"[^\w\s.,;:!?'\"’()\[\]]")
+_DIM = 1 << 18
+
+
+def _normalise(text: str) -> str:
+    return _CONTRACTION.sub(" not", text.lower())
+
+
+def signature(text: str) -> frozenset[str]:
+    """Tokens two questions must share exactly to count as duplicates.
+
+    Numbers, math symbols and negation flip the meaning of a question while
+    barely moving its vector ("derivative of x^2" vs "x^3"), so they are
+    compared as a set rather than by similarity.
+    """
+    text = _normalise(text)
+    return frozenset(_NUMBER.findall(text)) | frozenset(_SYMBOL.findall(text)) \
+        | ({"not"} if _NEGATIONS.intersection(_WORD.findall(text)) else frozenset())
+
+
+def vectorize(text: str) -> dict[int, float]:
+    """Lightweight local embedding: hashed word + character-trigram features, L2-normalised.
+
+    Words carry the meaning, trigrams absorb typos and inflections
+    ("regressions" ~ "regression"), and no model or network call is needed.
+    """
+    words = [w for w in _WORD.findall(_normalise(text)) if w not in _STOPWORDS]
+    counts: dict[int, float] = {}
+    for w in words:
+        h = zlib.crc32(w.encode()) % _DIM
+        counts[h] = counts.get(h, 0.0) + 2.0
+        padded = f"#{w}#"
+        for i in range(len(padded) - 2):
+            g = zlib.crc32(padded[i:i + 3].encode()) % _DIM
+            counts[g] = counts.get(g, 0.0) + 1.0
+    vec = {k: 1.0 + math.log(v) for k, v in counts.items()}
+    norm = math.sqrt(sum(v * v for v in vec.values()))
+    return {k: v / norm for k, v in vec.items()} if norm else {}
+
+
+def cosine(a: dict[int, float], b: dict[int, float]) -> float:
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(v * b.get(k, 0.0) for k, v in a.items())
+
+
+class SemanticCache:
+    """Per-scope store of (question vector, answer) pairs for near-duplicate lookups.
+
+    A scope is normally a class code, so answers never leak between classes.
+    Entries are bucketed by (kind, topic, level, context) and only questions
+    within the same bucket and with the same signature() are compared.
+    `context` holds whatever else personalises the prompt (e.g. the asker's
+    year and background). Each scope keeps at most `max_entries`, scopes
+    themselves are LRU-bounded, and entries expire after `ttl_secs`.
+    """
+
+    def __init__(self, threshold: float, ttl_secs: int, max_entries: int = 200,
+                 max_scopes: int = 500):
+        self.threshold = threshold
+        self.ttl_secs = ttl_secs
+        self.max_entries = max_entries
+        self.max_scopes = max_scopes
+        self._scopes: OrderedDict[str, list[dict]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _bucket(kind: str, topic: str, level: str, context: tuple[str, ...]) -> tuple:
+        return (kind, " ".join(topic.split()).casefold(), level.strip().casefold(),
+                tuple(" ".join(str(c).split()).casefold() for c in context))
+
+    def lookup(self, scope: str, kind: str, topic: str, level: str,
+               question: str, context: tuple[str, ...] = ()) -> tuple[dict, float] | None:
+        """Return (entry, similarity) for the closest live match above threshold."""
+        vec = vectorize(question)
+        if not vec:
+            return None
+        sig = signature(question)
+        bucket = self._bucket(kind, topic, level, context)
+        now = time.time()
+        best, best_sim = None, self.threshold
+        with self._lock:
+            entries = self._scopes.get(scope)
+            if not entries:
+                return None
+            self._scopes.move_to_end(scope)
+            entries[:] = [e for e in entries if e["expires"] > now]
+            for e in entries:
+                if e["bucket"] != bucket or e["sig"] != sig:
+                    continue
+                sim = cosine(vec, e["vec"])
+                if sim >= best_sim:
+                    best, best_sim = e, sim
+        return (best, best_sim) if best else None
+
+    def store(self, scope: str, kind: str, topic: str, level: str, question: str,
+              answer: str, context: tuple[str, ...] = (), **extra) -> None:
+        vec = vectorize(question)
+        if not vec or not answer:
+            return
+        entry = {"bucket": self._bucket(kind, topic, level, context), "vec": vec, "sig": signature(question),
+                 "question": question,
+                 "answer": answer, "expires": time.time() + self.ttl_secs, **extra}
+        with self._lock:
+            entries = self._scopes.setdefault(scope, [])
+            self._scopes.move_to_end(scope)
+            entries.append(entry)
+            if len(entries) > self.max_entries:
+                del entries[0]
+            while len(self._scopes) > self.max_scopes:
+                self._scopes.popitem(last=False)
@@ -0,0 +1,122 @@
+import json
+import re
+
+ICAP_HEADER = re.compile(r'^\[(PASSIVE|ACTIVE|CONSTRUCTIVE|INTERACTIVE)\]\s*(.*)$', re.I)
+TRAILING_COMMA = re.compile(r',\s*([}\]])')
+
+
+def sse_event(event: str, data) -> str:
+    """Format one Server-Sent-Events frame."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+class IcapSectionSplitter:
+    """Incrementally split streamed ICAP notes into completed sections.
+
+    A section is complete once the next `[TAG] N. TITLE` header line arrives
+    (or the stream ends), so each yielded section is final and can be
+    rendered straight away.
+    """
+
+    def __init__(self):
+        self._pending = ""          # partial line not yet terminated by \n
+        self._lines: list[str] = []
+        self._icap: str | None = None
+        self._title = ""
+
+    def feed(self, chunk: str) -> list[dict]:
+        self._pending += chunk
+        *complete, self._pending = self._pending.split("\n")
+        done = []
+        for line in complete:
+            m = ICAP_HEADER.match(line.strip())
+            if m:
+                section = self._flush()
+                if section:
+                    done.append(section)
+                self._icap, self._title = m.group(1).upper(), m.group(2).strip()
+            self._lines.append(line)
+        return done
+
+    def close(self) -> list[dict]:
+        if self._pending:
+            done = self.feed("\n")
+        else:
+            done = []
+        section = self._flush()
+        if section:
+            done.append(section)
+        return done
+
+    def _flush(self) -> dict | None:
+        text = "\n".join(self._lines).strip("\n")
+        self._lines = []
+        if not text.strip():
+            return None
+        return {"icap": self._icap, "title": self._title, "text": text}
+
+
+class JsonArrayStreamParser:
+    """Incrementally extract complete objects from a streamed JSON array.
+
+    Prose or markdown fences around the array are skipped. Each element is
+    yielded as soon as its closing brace arrives, so a truncated response
+    still gives back every object that was finished.
+    """
+
+    def __init__(self):
+        self._depth = 0             # 0 = outside array, 1 = in array, 2+ = in element
+        self._in_string = False
+        self._escape = False
+        self._buf: list[str] = []
+        self.done = False           # top-level array closed
+
+    def feed(self, chunk: str) -> list:
+        items = []
+        for ch in chunk:
+            if self.done:
+                break
+            if self._depth >= 2:
+                self._buf.append(ch)
+                if self._in_string:
+                    if self._escape:
+                        self._escape = False
+                    elif ch == "\\":
+                        self._escape = True
+                    elif ch == '"':
+                        self._in_string = False
+                elif ch == '"':
+                    self._in_string = True
+                elif ch in "{[":
+                    self._depth += 1
+                elif ch in "}]":
+                    self._depth -= 1
+                    if self._depth == 1:
+                        item = self._decode()
+                        if item is not None:
+                            items.append(item)
+            elif self._depth == 1:
+                if ch == "{":
+                    self._depth = 2
+                    self._buf = [ch]
+                elif ch == "]":
+                    self.done = True
+                elif not (ch.isspace() or ch == ","):
+                    # Not an array of objects (e.g. "[PASSIVE]" in prose) — rescan
+                    self._depth = 0
+            elif ch == "[":
+                self._depth = 1
+        return items
+
+    def _decode(self):
+        raw = "".join(self._buf)
+        self._buf = []
+        try:
+            return json.loads(raw)
+        except ValueError:
+            pass
+        try:
+            # Models often leave a trailing comma before } or ]
+            return json.loads(TRAILING_COMMA.sub(r"\1", raw))
+        except ValueError:
+            return None
@@ -0,0 +1,130 @@
+import json
+import re
+from typing import Callable
+from services.streaming import JsonArrayStreamParser
+
+ICAP_MODES = ("passive", "active", "constructive", "interactive")
+SLIDE_TYPES = ("title", "content", "example", "activity", "summary")
+
+Validator = Callable[[object], dict | None]
+
+_FENCE = re.compile(r'^```(?:json)?\s*|\s*```$')
+
+
+# ── Schemas ─────────────────────────────────────────────────────
+# Each validator returns a normalised copy of a usable item, or None.
+# Missing optional fields get defaults; anything the client would
+# render wrongly (no title, fewer than two options, bad answer index)
+# is rejected.
+
+def _text(value) -> str:
+    return value.strip() if isinstance(value, str) else ""
+
+
+def _strings(value) -> list[str]:
+    if isinstance(value, str):
+        value = [value]
+    if not isinstance(value, list):
+        return []
+    return [str(s).strip() for s in value
+            if isinstance(s, (str, int, float)) and not isinstance(s, bool) and str(s).strip()]
+
+
+def slide(obj) -> dict | None:
+    """Slideshow slide: title, bullets, narration, icap (lowercase), type."""
+    if not isinstance(obj, dict) or not _text(obj.get("title")):
+        return None
+    icap = _text(obj.get("icap")).lower()
+    kind = _text(obj.get("type")).lower()
+    return {
+        "title": _text(obj["title"]),
+        "bullets": _strings(obj.get("bullets")),
+        "narration": _text(obj.get("narration")),
+        "icap": icap if icap in ICAP_MODES else "passive",
+        "type": kind if kind in SLIDE_TYPES else "content",
+    }
+
+
+def outline_section(obj) -> dict | None:
+    """PPTX outline section: title, at least one bullet, icap (uppercase)."""
+    if not isinstance(obj, dict) or not _text(obj.get("title")):
+        return None
+    bullets = _strings(obj.get("bullets"))
+    if not bullets:
+        return None
+    icap = _text(obj.get("icap")).lower()
+    return {"title": _text(obj["title"]), "bullets": bullets,
+            "icap": (icap if icap in ICAP_MODES else "passive").upper()}
+
+
+def quiz_item(obj) -> dict | None:
+    """Multiple-choice question: q, options (2+), ans (valid index), exp."""
+    if not isinstance(obj, dict) or not _text(obj.get("q")):
+        return None
+    options = _strings(obj.get("options"))
+    ans = obj.get("ans")
+    if isinstance(ans, str) and ans.strip().isdigit():
+        ans = int(ans.strip())
+    elif isinstance(ans, str) and len(ans.strip()) == 1 and ans.strip().upper() in "ABCDEF":
+        ans = "ABCDEF".index(ans.strip().upper())
+    if len(options) < 2 or not isinstance(ans, int) or isinstance(ans, bool) \
+            or not 0 <= ans < len(options):
+        return None
+    item = {"q": _text(obj["q"]), "options": options, "ans": ans, "exp": _text(obj.get("exp"))}
+    if _text(obj.get("difficulty")):
+        item["difficulty"] = _text(obj["difficulty"])
+    return item
+
+
+# ── Salvage ─────────────────────────────────────────────────────
+
+def salvage_array(text: str, validate: Validator) -> list[dict]:
+    """Every valid element of the first array of objects in `text`.
+
+    Works on bare arrays, arrays wrapped in a JSON-mode object
+    ({"slides": [...]}), fenced or prose-wrapped output, and output cut off
+    mid-element — complete elements before the cut are kept.
+    """
+    parser = JsonArrayStreamParser()
+    return [item for item in map(validate, parser.feed(text or "")) if item is not None]
+
+
+def salvage_object(text: str, validate: Validator) -> dict | None:
+    """The first object in `text` that passes `validate`."""
+    text = _FENCE.sub("", (text or "").strip())
+    try:
+        item = validate(json.loads(text))
+        if item is not None:
+            return item
+    except ValueError:
+        pass
+    decoder = json.JSONDecoder()
+    for m in re.finditer(r"\{", text):
+        try:
+            obj, _ = decoder.raw_decode(text, m.start())
+        except ValueError:
+            continue
+        item = validate(obj)
+        if item is not None:
+            return item
+    return None
+
+
+# ── Prompt adapters ─────────────────────────────────────────────
+
+def json_mode_prompt(prompt: str, key: str) -> str:
+    """JSON mode only returns objects, so ask for the array under `key`."""
+    return (f"{prompt}\n\nOUTPUT FORMAT: respond with one JSON object of the form "
+            f'{{"{key}": [ ... ]}} whose "{key}" array holds exactly the items described above.')
+
+
+def continue_prompt(prompt: str, done: list[dict], expected: int, key: str) -> str:
+    """Re-prompt for only the items still missing after a short or truncated reply."""
+    if not done:
+        return json_mode_prompt(prompt, key)
+    titles = "\n".join(f"{i + 1}. {item.get('title') or item.get('q', '')}"
+                       for i, item in enumerate(done))
+    return (f"{prompt}\n\nThe first {len(done)} of the {expected} items are already written:\n"
+            f"{titles}\n\nWrite ONLY items {len(done) + 1} to {expected}, continuing the same "
+            f'sequence without repeating any of the above. Respond with one JSON object of the form '
+            f'{{"{key}": [ ... ]}}.')
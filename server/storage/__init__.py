@@ -0,0 +1,101 @@
+"""Storage: repositories over a backend chosen per table.
+
+    from storage import repos
+    repos.classes.get(code)
+
+STORAGE_BACKEND picks the default backend and STORAGE_TABLE_BACKENDS moves
+single tables elsewhere (config.py). Repositories are built on first use,
+so a process that never touches storage never opens a database.
+"""
+import threading
+from config import STORAGE_BACKEND, STORAGE_TABLE_BACKENDS
+from storage import repositories as _r
+from storage.backends import MemoryBackend, SQLiteBackend, SupabaseBackend
+
+_BACKENDS = {"sqlite": SQLiteBackend, "supabase": SupabaseBackend, "memory": MemoryBackend}
+
+
+class Repositories:
+    def __init__(self, default: str = STORAGE_BACKEND, per_table: dict[str, str] | None = None):
+        self.default = default
+        self.per_table = dict(STORAGE_TABLE_BACKENDS if per_table is None else per_table)
+        unknown = {default, *self.per_table.values()} - set(_BACKENDS)
+        if unknown:
+            raise ValueError(f"Unknown storage backend(s): {', '.join(sorted(unknown))}")
+        self._backends: dict[str, object] = {}
+        self._repos: dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    def backend_name(self, table: str) -> str:
+        return self.per_table.get(table, self.default)
+
+    def uses(self, name: str) -> bool:
+        """True if any table is stored on backend `name`."""
+        return name == self.default or name in self.per_table.values()
+
+    def _backend(self, table: str):
+        name = self.backend_name(table)
+        if name not in self._backends:
+            self._backends[name] = _BACKENDS[name]()
+        return self._backends[name]
+
+    def _repo(self, attr: str, build):
+        with self._lock:
+            if attr not in self._repos:
+                self._repos[attr] = build()
+            return self._repos[attr]
+
+    # Each repository gets the backend chosen for its own table
+
+    @property
+    def classes(self) -> _r.ClassRepo:
+        return self._repo("classes", lambda: _r.ClassRepo(self._backend(_r.ClassRepo.table)))
+
+    @property
+    def submissions(self) -> _r.SubmissionRepo:
+        return self._repo("submissions",
+                          lambda: _r.SubmissionRepo(self._backend(_r.SubmissionRepo.table)))
+
+    @property
+    def assignments(self) -> _r.AssignmentRepo:
+        submissions = self.submissions
+        return self._repo("assignments",
+                          lambda: _r.AssignmentRepo(self._backend(_r.AssignmentRepo.table), submissions))
+
+    @property
+    def test_results(self) -> _r.TestResultRepo:
+        return self._repo("test_results",
+                          lambda: _r.TestResultRepo(self._backend(_r.TestResultRepo.table)))
+
+    @property
+    def tests(self) -> _r.TestRepo:
+        results = self.test_results
+        return self._repo("tests", lambda: _r.TestRepo(self._backend(_r.TestRepo.table), results))
+
+    @property
+    def attendance(self) -> _r.AttendanceRepo:
+        return self._repo("attendance",
+                          lambda: _r.AttendanceRepo(self._backend(_r.AttendanceRepo.table)))
+
+    @property
+    def discussions(self) -> _r.DiscussionRepo:
+        return self._repo("discussions",
+                          lambda: _r.DiscussionRepo(self._backend(_r.DiscussionRepo.table)))
+
+    @property
+    def reactions(self) -> _r.ReactionRepo:
+        return self._repo("reactions",
+                          lambda: _r.ReactionRepo(self._backend(_r.ReactionRepo.table)))
+
+    @property
+    def confusion(self) -> _r.ConfusionRepo:
+        return self._repo("confusion",
+                          lambda: _r.ConfusionRepo(self._backend(_r.ConfusionRepo.table)))
+
+    @property
+    def library(self) -> _r.LibraryRepo:
+        return self._repo("library", lambda: _r.LibraryRepo(self._backend(_r.LibraryRepo.table)))
+
+
+# Singleton
+repos = Repositories()
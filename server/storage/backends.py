@@ -0,0 +1,612 @@
+"""Storage backends: the same small set of table primitives on SQLite, Supabase and memory.
+
+Repositories (storage/repositories.py) hold all the domain logic and talk only to
+these primitives, so any table can move between backends without its
+handlers changing.
+
+`where` maps column -> value; a list/tuple value means IN. `since` is
+(column, timestamp) and keeps rows strictly newer — timestamps are the
+'YYYY-MM-DD HH:MM:SS' UTC text from now(), which compares correctly as
+text. `search` is (columns, term): a case-insensitive substring match on
+any of the columns. `order` is a list of (column, descending); select()'s
+`after` holds the order columns' values from the last row already seen
+and keeps only rows past it (keyset paging — every order column must
+sort the same way). `only` is
+(column, minimum) and restricts aggregate counts and sums to rows at or
+above it.
+
+text_search() is ranked full-text search: `fields` maps each indexed
+column, in index order, to its weight, and every word of the text must
+match as a prefix. Rows come back best first with a `rank` (lower is
+better) and `after` is the (rank, id) of the last row already seen.
+"""
+import math
+import re
+import threading
+import time
+import uuid
+from typing import Iterable, NamedTuple
+from db.sqlite_client import connection, transaction
+
+Where = dict[str, object]
+
+
+def now(offset_secs: float = 0) -> str:
+    """UTC timestamp in SQLite datetime('now') form, optionally shifted."""
+    return time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(time.time() + offset_secs))
+
+
+def new_id() -> str:
+    return str(uuid.uuid4())
+
+
+def _terms(text: str) -> list[str]:
+    """The words of a search, lower-cased; punctuation never reaches a query parser."""
+    return re.findall(r"\w+", (text or "").lower())
+
+
+class Decay(NamedTuple):
+    """An exponentially decaying total for increment_many() to keep in `column`.
+
+    The total is stored as of the time of its latest addition (`at_column`,
+    unix seconds), so adding means ageing it to then first; nothing is
+    ever scaled up and no value grows without bound. `rank_column` holds
+    when the total will have decayed to 1, as_of + half-life * log2(total):
+    ordering by it orders rows by their totals decayed to any common time,
+    so an index on it serves the ranking.
+    """
+    column: str
+    at_column: str
+    rank_column: str
+    at: float
+    half_life_secs: float
+
+    def add(self, total: float | None, as_of: float | None, n: float) -> tuple[float, float, float]:
+        """(total, as_of, rank) after adding `n` at self.at to `total` as of `as_of`."""
+        as_of = as_of or self.at
+        t = max(as_of, self.at)
+        total = ((total or 0) * 2 ** ((as_of - t) / self.half_life_secs)
+                 + n * 2 ** ((self.at - t) / self.half_life_secs))
+        return total, t, (t + self.half_life_secs * math.log2(total) if total > 0 else 0)
+
+
+# ── SQLite ──────────────────────────────────────────────────────
+
+class SQLiteBackend:
+    name = "sqlite"
+
+    @staticmethod
+    def _where(where: Where | None, since=None, search=None, alias: str = "") -> tuple[str, list]:
+        clauses, params = [], []
+        for col, value in (where or {}).items():
+            if isinstance(value, (list, tuple)):
+                if not value:
+                    clauses.append("0")
+                    continue
+                clauses.append(f"{alias}{col} IN ({','.join('?' * len(value))})")
+                params += list(value)
+            else:
+                clauses.append(f"{alias}{col}=?")
+                params.append(value)
+        if since:
+            clauses.append(f"{since[0]} > ?")
+            params.append(since[1])
+        if search:
+            cols, term = search
+            clauses.append("(" + " OR ".join(f"{c} LIKE ?" for c in cols) + ")")
+            params += [f"%{term}%"] * len(cols)
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+    def insert(self, table: str, rows: list[dict]) -> None:
+        if not rows:
+            return
+        cols = list(rows[0])
+        sql = f"INSERT INTO {table} ({','.join(cols)}) VALUES({','.join('?' * len(cols))})"
+        with transaction() as conn:
+            conn.executemany(sql, [tuple(r.get(c) for c in cols) for r in rows])
+
+    def insert_new(self, table: str, rows: list[dict], pk: str = "id") -> list[dict]:
+        """Insert the rows whose `pk` is not stored yet; returns those rows.
+
+        Lets a replayed batch be written again without duplicating anything.
+        """
+        if not rows:
+            return []
+        cols = list(rows[0])
+        sql = (f"INSERT INTO {table} ({','.join(cols)}) VALUES({','.join('?' * len(cols))}) "
+               f"ON CONFLICT({pk}) DO NOTHING")
+        with transaction() as conn:
+            return [r for r in rows if conn.execute(sql, tuple(r.get(c) for c in cols)).rowcount]
+
+    def upsert(self, table: str, rows: list[dict], key: tuple[str, ...], pk: str = "id",
+               defaults: dict | None = None) -> list[tuple[str, bool]]:
+        """Insert or update each row by its natural `key`; returns [(pk, existed)].
+
+        On update the existing row keeps its pk; `defaults` are columns written
+        only when a row is inserted. One write transaction for the batch.
+        """
+        results = []
+        with transaction() as conn:
+            for row in rows:
+                clause, params = self._where({k: row[k] for k in key})
+                existing = conn.execute(f"SELECT {pk} FROM {table}{clause}", params).fetchone()
+                if existing:
+                    values = {c: v for c, v in row.items() if c != pk and c not in key}
+                    if values:
+                        conn.execute(
+                            f"UPDATE {table} SET {','.join(f'{c}=?' for c in values)} WHERE {pk}=?",
+                            (*values.values(), existing[0]))
+                    results.append((existing[0], True))
+                else:
+                    row = {**(defaults or {}), **row}
+                    cols = list(row)
+                    conn.execute(
+                        f"INSERT INTO {table} ({','.join(cols)}) VALUES({','.join('?' * len(cols))})",
+                        tuple(row.values()))
+                    results.append((row[pk], False))
+        return results
+
+    def update(self, table: str, where: Where, values: dict) -> None:
+        clause, params = self._where(where)
+        with transaction() as conn:
+            conn.execute(f"UPDATE {table} SET {','.join(f'{c}=?' for c in values)}{clause}",
+                         (*values.values(), *params))
+
+    def update_many(self, table: str, updates: Iterable[tuple[Where, dict]]) -> None:
+        with transaction() as conn:
+            for where, values in updates:
+                clause, params = self._where(where)
+                conn.execute(f"UPDATE {table} SET {','.join(f'{c}=?' for c in values)}{clause}",
+                             (*values.values(), *params))
+
+    def increment(self, table: str, where: Where, column: str, by: int = 1) -> None:
+        clause, params = self._where(where)
+        with transaction() as conn:
+            conn.execute(f"UPDATE {table} SET {column}={column}+?{clause}", (by, *params))
+
+    def increment_many(self, table: str, deltas: dict[str, dict[str, float]], pk: str = "id",
+                       decay: Decay | None = None) -> None:
+        """Add deltas[pk value][column] to each existing row, in one transaction.
+
+        With `decay`, decay.column's delta is added to its decayed total instead.
+        """
+        deltas = {key: dict(by) for key, by in deltas.items()}
+        added = {key: by.pop(decay.column, 0) for key, by in deltas.items()} if decay else {}
+        groups: dict[tuple[str, ...], list[tuple]] = {}
+        for key, by in deltas.items():
+            if by:
+                groups.setdefault(tuple(by), []).append((*by.values(), key))
+        with transaction() as conn:
+            if decay:
+                keys, rows = list(added), []
+                for i in range(0, len(keys), 500):
+                    chunk = keys[i:i + 500]
+                    rows += conn.execute(f"SELECT {pk}, {decay.column}, {decay.at_column} FROM {table} "
+                                         f"WHERE {pk} IN ({','.join('?' * len(chunk))})", chunk).fetchall()
+                conn.executemany(
+                    f"UPDATE {table} SET {decay.column}=?, {decay.at_column}=?, {decay.rank_column}=? WHERE {pk}=?",
+                    [(*decay.add(total, as_of, added[key]), key) for key, total, as_of in rows])
+            for cols, params in groups.items():
+                conn.executemany(f"UPDATE {table} SET {','.join(f'{c}={c}+?' for c in cols)} WHERE {pk}=?",
+                                 params)
+
+    def bump(self, table: str, key: dict, counters: dict[str, int], values: dict | None = None) -> None:
+        """Add `counters` to the row at `key`, creating it from zero; also set `values`.
+
+        One atomic upsert — `key` must be the table's primary key or a unique index.
+        """
+        row = {**key, **counters, **(values or {})}
+        cols = list(row)
+        updates = [f"{c}={c}+excluded.{c}" for c in counters] + [f"{c}=excluded.{c}" for c in values or {}]
+        with transaction() as conn:
+            conn.execute(
+                f"INSERT INTO {table} ({','.join(cols)}) VALUES({','.join('?' * len(cols))}) "
+                f"ON CONFLICT({','.join(key)}) DO UPDATE SET {','.join(updates)}",
+                tuple(row.values()))
+
+    def delete(self, table: str, where: Where, since=None) -> None:
+        clause, params = self._where(where, since)
+        with transaction() as conn:
+            conn.execute(f"DELETE FROM {table}{clause}", params)
+
+    def select(self, table: str, where: Where | None = None, columns: str = "*",
+               order: list[tuple[str, bool]] = (), limit: int | None = None, offset: int = 0,
+               since=None, search=None, after: tuple | None = None) -> list[dict]:
+        clause, params = self._where(where, since, search)
+        if after:
+            cols = ", ".join(c for c, _ in order)
+            clause += (" AND " if clause else " WHERE ") + \
+                f"({cols}) {'<' if order[0][1] else '>'} ({','.join('?' * len(after))})"
+            params += list(after)
+        sql = f"SELECT {columns} FROM {table}{clause}"
+        if order:
+            sql += " ORDER BY " + ", ".join(f"{c} {'DESC' if desc else 'ASC'}" for c, desc in order)
+        if limit is not None:
+            sql += " LIMIT ? OFFSET ?"
+            params += [limit, offset]
+        with connection() as conn:
+            return [dict(r) for r in conn.execute(sql, params).fetchall()]
+
+    def count(self, table: str, where: Where | None = None, since=None, search=None) -> int:
+        clause, params = self._where(where, since, search)
+        with connection() as conn:
+            return conn.execute(f"SELECT COUNT(*) FROM {table}{clause}", params).fetchone()[0]
+
+    def aggregate(self, table: str, where: Where | None = None, sums: tuple[str, ...] = (),
+                  only: tuple[str, object] | None = None) -> dict:
+        """{"rows": matching rows, "count": rows passing `only`, <col>: SUM(col) over those}."""
+        clause, params = self._where(where)
+        if only:
+            col, minimum = only
+            cond = f"{col} >= ?"
+            exprs = [f"COALESCE(SUM(CASE WHEN {cond} THEN 1 ELSE 0 END), 0)"]
+            exprs += [f"COALESCE(SUM(CASE WHEN {cond} THEN {c} END), 0)" for c in sums]
+            cond_params = [minimum] * (1 + len(sums))
+        else:
+            exprs = ["COUNT(*)"] + [f"COALESCE(SUM({c}), 0)" for c in sums]
+            cond_params = []
+        with connection() as conn:
+            row = conn.execute(f"SELECT COUNT(*), {', '.join(exprs)} FROM {table}{clause}",
+                               (*cond_params, *params)).fetchone()
+        return {"rows": row[0], "count": row[1], **dict(zip(sums, row[2:]))}
+
+    # Full-text search runs on the <table>_fts FTS5 index (db/migrations.py)
+
+    def _fts(self, table: str, fields: dict[str, float], text: str, where: Where | None,
+               columns: str) -> tuple[str, list] | None:
+        terms = _terms(text)
+        if not terms:
+            return None
+        clause, params = self._where(where, alias="t.")
+        cols = "t.*" if columns == "*" else ", ".join(f"t.{c.strip()}" for c in columns.split(","))
+        # The index's first column is the unindexed id
+        weights = ", ".join(str(w) for w in (0, *fields.values()))
+        sql = (f"SELECT {cols}, bm25({table}_fts, {weights}) AS rank FROM {table}_fts "
+               f"JOIN {table} t ON t.id={table}_fts.id WHERE {table}_fts MATCH ?"
+               + clause.replace(" WHERE ", " AND ", 1))
+        return sql, [" ".join(f'"{t}"*' for t in terms), *params]
+
+    def text_search(self, table: str, fields: dict[str, float], text: str, where: Where | None = None,
+                    columns: str = "*", limit: int | None = None, offset: int = 0,
+                    after: tuple | None = None) -> list[dict]:
+        match = self._fts(table, fields, text, where, columns)
+        if match is None:
+            return []
+        sql, params = match
+        sql = f"SELECT * FROM ({sql})"
+        if after:
+            sql += " WHERE (rank, id) > (?, ?)"
+            params += list(after)
+        sql += " ORDER BY rank, id"
+        if limit is not None or offset:
+            sql += " LIMIT ? OFFSET ?"
+            params += [-1 if limit is None else limit, offset]
+        with connection() as conn:
+            return [dict(r) for r in conn.execute(sql, params).fetchall()]
+
+    def text_count(self, table: str, fields: dict[str, float], text: str,
+                   where: Where | None = None) -> int:
+        match = self._fts(table, fields, text, where, "id")
+        if match is None:
+            return 0
+        sql, params = match
+        with connection() as conn:
+            return conn.execute(f"SELECT COUNT(*) FROM ({sql})", params).fetchone()[0]
+
+
+# ── Supabase ────────────────────────────────────────────────────
+
+class SupabaseBackend:
+    """PostgREST has no multi-statement transactions, so upsert is
+    select-then-write per row; two concurrent first writes of the same key
+    can race, exactly as the old blueprint handlers could."""
+
+    name = "supabase"
+
+    @staticmethod
+    def _filter(q, where: Where | None, since=None, search=None):
+        for col, value in (where or {}).items():
+            q = q.in_(col, list(value)) if isinstance(value, (list, tuple)) else q.eq(col, value)
+        if since:
+            q = q.gt(since[0], since[1])
+        if search:
+            cols, term = search
+            # , ( ) are PostgREST syntax inside or=(...)
+            term = "".join(ch for ch in term if ch not in ",()")
+            q = q.or_(",".join(f"{c}.ilike.%{term}%" for c in cols))
+        return q
+
+    @staticmethod
+    def _table(table: str):
+        from db.supabase_client import supabase
+        return supabase().table(table)
+
+    def insert(self, table: str, rows: list[dict]) -> None:
+        if rows:
+            self._table(table).insert(rows).execute()
+
+    def insert_new(self, table: str, rows: list[dict], pk: str = "id") -> list[dict]:
+        if not rows:
+            return []
+        # ON CONFLICT DO NOTHING: PostgREST returns only the rows it inserted
+        inserted = self._table(table).upsert(rows, on_conflict=pk, ignore_duplicates=True).execute().data
+        ids = {r[pk] for r in inserted or []}
+        return [r for r in rows if r[pk] in ids]
+
+    def upsert(self, table: str, rows: list[dict], key: tuple[str, ...], pk: str = "id",
+               defaults: dict | None = None) -> list[tuple[str, bool]]:
+        results, inserts = [], []
+        for row in rows:
+            existing = self._filter(self._table(table).select(pk), {k: row[k] for k in key}) \
+                .limit(1).execute().data
+            if existing:
+                values = {c: v for c, v in row.items() if c != pk and c not in key}
+                if values:
+                    self._table(table).update(values).eq(pk, existing[0][pk]).execute()
+                results.append((existing[0][pk], True))
+            else:
+                inserts.append({**(defaults or {}), **row})
+                results.append((row[pk], False))
+        self.insert(table, inserts)
+        return results
+
+    def update(self, table: str, where: Where, values: dict) -> None:
+        self._filter(self._table(table).update(values), where).execute()
+
+    def update_many(self, table: str, updates: Iterable[tuple[Where, dict]]) -> None:
+        for where, values in updates:
+            self.update(table, where, values)
+
+    def increment(self, table: str, where: Where, column: str, by: int = 1) -> None:
+        for row in self.select(table, where, columns=f"{column}"):
+            self.update(table, where, {column: (row.get(column) or 0) + by})
+
+    def increment_many(self, table: str, deltas: dict[str, dict[str, float]], pk: str = "id",
+                       decay: Decay | None = None) -> None:
+        # Atomic in Postgres: the <table>_increment function (db/supabase/) adds them in one
+        # UPDATE, and ages the table's decayed total itself; `decay` only supplies when and how fast
+        if deltas:
+            params = {"at": decay.at, "half_life_secs": decay.half_life_secs} if decay else {}
+            self._rpc(f"{table}_increment", {"deltas": deltas, **params})
+
+    def bump(self, table: str, key: dict, counters: dict[str, int], values: dict | None = None) -> None:
+        # Read-modify-write: concurrent bumps of one row can lose an increment
+        rows = self.select(table, key, columns=",".join(counters), limit=1)
+        if rows:
+            self.update(table, key, {**{c: (rows[0].get(c) or 0) + by for c, by in counters.items()},
+                                     **(values or {})})
+        else:
+            self.insert(table, [{**key, **counters, **(values or {})}])
+
+    def delete(self, table: str, where: Where, since=None) -> None:
+        self._filter(self._table(table).delete(), where, since).execute()
+
+    def select(self, table: str, where: Where | None = None, columns: str = "*",
+               order: list[tuple[str, bool]] = (), limit: int | None = None, offset: int = 0,
+               since=None, search=None, after: tuple | None = None) -> list[dict]:
+        q = self._filter(self._table(table).select(columns.replace(" ", "")), where, since, search)
+        if after:
+            # (a, b) < (x, y) spelled out: a<x, or a=x and b<y; values quoted for PostgREST
+            op = "lt" if order[0][1] else "gt"
+            keys = [(c, '"' + str(v).replace('"', '\\"') + '"') for (c, _), v in zip(order, after)]
+            q = q.or_(",".join(
+                "and(" + ",".join([f"{c}.eq.{v}" for c, v in keys[:i]] + [f"{keys[i][0]}.{op}.{keys[i][1]}"]) + ")"
+                for i in range(len(keys))))
+        for col, desc in order:
+            q = q.order(col, desc=desc)
+        if limit is not None:
+            q = q.range(offset, offset + limit - 1)
+        return q.execute().data or []
+
+    def count(self, table: str, where: Where | None = None, since=None, search=None) -> int:
+        q = self._filter(self._table(table).select("*", count="exact").limit(1), where, since, search)
+        return q.execute().count or 0
+
+    def aggregate(self, table: str, where: Where | None = None, sums: tuple[str, ...] = (),
+                  only: tuple[str, object] | None = None) -> dict:
+        # PostgREST aggregates are off by default: fetch just the needed columns in one call
+        columns = list(dict.fromkeys(([only[0]] if only else []) + list(sums))) or ["id"]
+        return _aggregate(self.select(table, where, columns=",".join(columns)), sums, only)
+
+    # Full-text search runs in the <table>_search and <table>_search_count
+    # functions (db/supabase/), whose tsvector index carries the field weights
+
+    @staticmethod
+    def _rpc(function: str, params: dict):
+        from db.supabase_client import supabase
+        return supabase().rpc(function, params).execute().data
+
+    def text_search(self, table: str, fields: dict[str, float], text: str, where: Where | None = None,
+                    columns: str = "*", limit: int | None = None, offset: int = 0,
+                    after: tuple | None = None) -> list[dict]:
+        terms = _terms(text)
+        if not terms:
+            return []
+        rows = self._rpc(f"{table}_search", {
+            "query": " & ".join(f"{t}:*" for t in terms), "filters": where or {},
+            "after_rank": after[0] if after else None, "after_id": after[1] if after else None,
+            "max_rows": limit, "skip_rows": offset,
+        }) or []
+        if columns != "*":
+            cols = [c.strip() for c in columns.split(",")] + ["rank"]
+            rows = [{c: r.get(c) for c in cols} for r in rows]
+        return rows
+
+    def text_count(self, table: str, fields: dict[str, float], text: str,
+                   where: Where | None = None) -> int:
+        terms = _terms(text)
+        if not terms:
+            return 0
+        return self._rpc(f"{table}_search_count",
+                         {"query": " & ".join(f"{t}:*" for t in terms), "filters": where or {}}) or 0
+
+
+# ── Memory ──────────────────────────────────────────────────────
+
+class MemoryBackend:
+    """Per-process tables of dicts — for benchmarks, local dev and ephemeral data."""
+
+    name = "memory"
+
+    def __init__(self):
+        self._tables: dict[str, list[dict]] = {}
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def _match(row: dict, where: Where | None, since=None, search=None) -> bool:
+        for col, value in (where or {}).items():
+            if isinstance(value, (list, tuple)):
+                if row.get(col) not in value:
+                    return False
+            elif row.get(col) != value:
+                return False
+        if since and not (row.get(since[0]) or "") > since[1]:
+            return False
+        if search:
+            cols, term = search
+            if not any(term.lower() in str(row.get(c) or "").lower() for c in cols):
+                return False
+        return True
+
+    def _rows(self, table: str) -> list[dict]:
+        return self._tables.setdefault(table, [])
+
+    def insert(self, table: str, rows: list[dict]) -> None:
+        with self._lock:
+            self._rows(table).extend(dict(r) for r in rows)
+
+    def insert_new(self, table: str, rows: list[dict], pk: str = "id") -> list[dict]:
+        with self._lock:
+            stored = {r.get(pk) for r in self._rows(table)}
+            new = []
+            for r in rows:
+                if r[pk] not in stored:
+                    stored.add(r[pk])
+                    new.append(r)
+            self._rows(table).extend(dict(r) for r in new)
+        return new
+
+    def upsert(self, table: str, rows: list[dict], key: tuple[str, ...], pk: str = "id",
+               defaults: dict | None = None) -> list[tuple[str, bool]]:
+        results = []
+        with self._lock:
+            for row in rows:
+                match = {k: row[k] for k in key}
+                existing = next((r for r in self._rows(table) if self._match(r, match)), None)
+                if existing:
+                    existing.update({c: v for c, v in row.items() if c != pk and c not in key})
+                    results.append((existing[pk], True))
+                else:
+                    self._rows(table).append({**(defaults or {}), **row})
+                    results.append((row[pk], False))
+        return results
+
+    def update(self, table: str, where: Where, values: dict) -> None:
+        with self._lock:
+            for row in self._rows(table):
+                if self._match(row, where):
+                    row.update(values)
+
+    def update_many(self, table: str, updates: Iterable[tuple[Where, dict]]) -> None:
+        with self._lock:
+            for where, values in updates:
+                self.update(table, where, values)
+
+    def increment(self, table: str, where: Where, column: str, by: int = 1) -> None:
+        with self._lock:
+            for row in self._rows(table):
+                if self._match(row, where):
+                    row[column] = (row.get(column) or 0) + by
+
+    def increment_many(self, table: str, deltas: dict[str, dict[str, float]], pk: str = "id",
+                       decay: Decay | None = None) -> None:
+        with self._lock:
+            for row in self._rows(table):
+                for c, by in deltas.get(row.get(pk), {}).items():
+                    if decay and c == decay.column:
+                        row[c], row[decay.at_column], row[decay.rank_column] = \
+                            decay.add(row.get(c), row.get(decay.at_column), by)
+                    else:
+                        row[c] = (row.get(c) or 0) + by
+
+    def bump(self, table: str, key: dict, counters: dict[str, int], values: dict | None = None) -> None:
+        with self._lock:
+            row = next((r for r in self._rows(table) if self._match(r, key)), None)
+            if row is None:
+                self._rows(table).append({**key, **counters, **(values or {})})
+            else:
+                for c, by in counters.items():
+                    row[c] = (row.get(c) or 0) + by
+                row.update(values or {})
+
+    def delete(self, table: str, where: Where, since=None) -> None:
+        with self._lock:
+            self._tables[table] = [r for r in self._rows(table) if not self._match(r, where, since)]
+
+    def select(self, table: str, where: Where | None = None, columns: str = "*",
+               order: list[tuple[str, bool]] = (), limit: int | None = None, offset: int = 0,
+               since=None, search=None, after: tuple | None = None) -> list[dict]:
+        with self._lock:
+            rows = [dict(r) for r in self._rows(table) if self._match(r, where, since, search)]
+        if after:
+            key = lambda r: tuple(r.get(c) for c, _ in order)  # noqa: E731
+            rows = [r for r in rows if (key(r) < tuple(after) if order[0][1] else key(r) > tuple(after))]
+        for col, desc in reversed(list(order)):     # stable sorts, last key first
+            rows.sort(key=lambda r: (r.get(col) is None, "" if r.get(col) is None else r.get(col)),
+                      reverse=desc)
+        if limit is not None:
+            rows = rows[offset:offset + limit]
+        if columns != "*":
+            cols = [c.strip() for c in columns.split(",")]
+            rows = [{c: r.get(c) for c in cols} for r in rows]
+        return rows
+
+    def count(self, table: str, where: Where | None = None, since=None, search=None) -> int:
+        with self._lock:
+            return sum(1 for r in self._rows(table) if self._match(r, where, since, search))
+
+    def aggregate(self, table: str, where: Where | None = None, sums: tuple[str, ...] = (),
+                  only: tuple[str, object] | None = None) -> dict:
+        return _aggregate(self.select(table, where), sums, only)
+
+    def _ranked(self, table: str, fields: dict[str, float], text: str, where: Where | None) -> list[dict]:
+        # Each word must prefix-match a word of some field; rank is minus the weighted hits
+        terms = _terms(text)
+        if not terms:
+            return []
+        ranked = []
+        for row in self.select(table, where):
+            words = {f: _terms(str(row.get(f) or "")) for f in fields}
+            score = 0.0
+            for term in terms:
+                hits = sum(w * sum(1 for word in words[f] if word.startswith(term)) for f, w in fields.items())
+                if not hits:
+                    break
+                score += hits
+            else:
+                ranked.append({**row, "rank": -score})
+        ranked.sort(key=lambda r: (r["rank"], r["id"]))
+        return ranked
+
+    def text_search(self, table: str, fields: dict[str, float], text: str, where: Where | None = None,
+                    columns: str = "*", limit: int | None = None, offset: int = 0,
+                    after: tuple | None = None) -> list[dict]:
+        rows = self._ranked(table, fields, text, where)
+        if after:
+            rows = [r for r in rows if (r["rank"], r["id"]) > tuple(after)]
+        rows = rows[offset:] if limit is None else rows[offset:offset + limit]
+        if columns != "*":
+            cols = [c.strip() for c in columns.split(",")] + ["rank"]
+            rows = [{c: r.get(c) for c in cols} for r in rows]
+        return rows
+
+    def text_count(self, table: str, fields: dict[str, float], text: str,
+                   where: Where | None = None) -> int:
+        return len(self._ranked(table, fields, text, where))
+
+
+def _aggregate(rows: list[dict], sums: tuple[str, ...], only) -> dict:
+    """aggregate() computed in Python, for backends without SQL."""
+    passing = [r for r in rows if not only or (r.get(only[0]) is not None and r[only[0]] >= only[1])]
+    return {"rows": len(rows), "count": len(passing),
+            **{c: sum(r.get(c) or 0 for r in passing) for c in sums}}
@@ -0,0 +1,583 @@
+"""Domain repositories — the one code path every storage route goes through.
+
+Each repository owns one table and takes the backend chosen for that
+table (see storage/__init__.py), so behaviour is identical whichever
+backend holds the data.
+"""
+import base64
+import json
+import math
+import threading
+import time
+from datetime import datetime
+from config import LIBRARY_TRENDING_HALF_LIFE_HOURS
+from storage.backends import Decay, new_id, now
+
+
+def _percent(part: float, whole: float) -> int | None:
+    """Rounded like the client's Math.round; None when there is nothing to average."""
+    return math.floor(part / whole + 0.5) if whole else None
+
+
+def _encode_cursor(*values) -> str:
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> tuple:
+    try:
+        return tuple(json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))))
+    except ValueError:
+        raise ValueError("Invalid cursor") from None
+
+
+class ClassRepo:
+    """Class metadata in columns, notes in class_artifacts.
+
+    get() still returns the shape save() was given — the teacher's fields
+    under their camelCase keys, plus anything else they sent — so callers
+    see no difference from the old single JSON blob.
+    """
+    table = "classes"
+    ARTIFACTS = "class_artifacts"
+    COLUMNS = {"teacherEmail": "teacher_email", "teacherName": "teacher_name",
+               "topic": "topic", "level": "level"}
+    SELECT = "code, teacher_email, teacher_name, topic, level, extra"
+
+    def __init__(self, db):
+        self.db = db
+
+    def save(self, code: str, data: dict) -> None:
+        """Save class metadata; notes are only touched if `data` carries them."""
+        extra = {k: v for k, v in data.items() if k not in self.COLUMNS and k not in ("code", "notes")}
+        self.db.upsert(self.table, [{
+            "code": code,
+            **{col: data.get(key, "") for key, col in self.COLUMNS.items()},
+            "extra": json.dumps(extra),
+        }], key=("code",), pk="code")
+        if "notes" in data:
+            self.set_notes(code, data["notes"])
+
+    def _from_row(self, row: dict) -> dict:
+        return {**json.loads(row.get("extra") or "{}"), "code": row["code"],
+                **{key: row.get(col) or "" for key, col in self.COLUMNS.items()}}
+
+    def get(self, code: str, with_notes: bool = True) -> dict | None:
+        """The class as saved by the teacher, with its notes unless told not to, or None."""
+        rows = self.db.select(self.table, {"code": code}, columns=self.SELECT, limit=1)
+        if not rows:
+            return None
+        cls = self._from_row(rows[0])
+        notes = self.get_notes(code) if with_notes else ""
+        if notes:
+            cls["notes"] = notes
+        return cls
+
+    def get_many(self, codes: list[str]) -> dict[str, dict]:
+        """Metadata of several classes, without notes."""
+        rows = self.db.select(self.table, {"code": list(codes)}, columns=self.SELECT)
+        return {r["code"]: self._from_row(r) for r in rows}
+
+    def get_notes(self, code: str) -> str:
+        rows = self.db.select(self.ARTIFACTS, {"class_code": code, "kind": "notes"}, columns="body", limit=1)
+        return (rows[0]["body"] or "") if rows else ""
+
+    def set_notes(self, code: str, notes: str) -> bool:
+        """Attach generated notes to an existing class; False if the class doesn't exist."""
+        if not self.db.count(self.table, {"code": code}):
+            return False
+        self.db.upsert(self.ARTIFACTS, [{"class_code": code, "kind": "notes", "body": notes,
+                                         "updated_at": now()}],
+                       key=("class_code", "kind"), pk="class_code")
+        return True
+
+
+class AssignmentRepo:
+    table = "assignments"
+
+    def __init__(self, db, submissions: "SubmissionRepo"):
+        self.db = db
+        self.submissions = submissions
+
+    def create(self, class_code: str, teacher_email: str, title: str, description: str,
+               due_date: str, max_score: int) -> str:
+        aid = new_id()
+        self.db.insert(self.table, [{
+            "id": aid, "class_code": class_code, "teacher_email": teacher_email,
+            "title": title, "description": description, "due_date": due_date,
+            "max_score": max_score, "created_at": now(),
+        }])
+        return aid
+
+    def list_for_class(self, class_code: str) -> list[dict]:
+        return self.db.select(self.table, {"class_code": class_code}, order=[("created_at", True)])
+
+    def delete(self, aid: str) -> None:
+        self.db.delete(self.table, {"id": aid})
+        self.submissions.delete_for_assignment(aid)
+
+    def stats(self, class_code: str) -> dict:
+        """Assignment count plus submission/grading totals for a class, in two queries."""
+        ids = [r["id"] for r in self.db.select(self.table, {"class_code": class_code}, columns="id")]
+        totals = self.submissions.totals(ids)
+        return {"count": len(ids), "submissions": totals["rows"], "graded": totals["count"],
+                "avgScore": _percent(totals["score"], totals["count"])}
+
+
+class SubmissionRepo:
+    table = "submissions"
+
+    def __init__(self, db):
+        self.db = db
+
+    def submit(self, assignment_id: str, class_code: str, student_email: str,
+               student_name: str, content: str) -> str:
+        """One submission per student per assignment; resubmitting replaces the content."""
+        return self.submit_many([{
+            "assignment_id": assignment_id, "class_code": class_code,
+            "student_email": student_email, "student_name": student_name, "content": content,
+        }])[0]
+
+    def submit_many(self, submissions: list[dict]) -> list[str]:
+        stamp = now()
+        results = self.db.upsert(self.table, [{"id": new_id(), **s, "submitted_at": stamp}
+                                              for s in submissions],
+                                 key=("assignment_id", "student_email"),
+                                 defaults={"score": -1, "feedback": ""})   # a resubmit keeps its grade
+        return [sid for sid, _ in results]
+
+    def list_for_assignment(self, assignment_id: str) -> list[dict]:
+        return self.db.select(self.table, {"assignment_id": assignment_id},
+                              order=[("submitted_at", True)])
+
+    def get_for_student(self, assignment_id: str, student_email: str) -> dict | None:
+        rows = self.db.select(self.table, {"assignment_id": assignment_id,
+                                           "student_email": student_email}, limit=1)
+        return rows[0] if rows else None
+
+    def for_student(self, assignment_ids: list[str], student_email: str) -> dict[str, dict]:
+        """The student's submission to each of the assignments, keyed by assignment id."""
+        if not assignment_ids:
+            return {}
+        rows = self.db.select(self.table, {"assignment_id": assignment_ids, "student_email": student_email})
+        return {r["assignment_id"]: r for r in rows}
+
+    def grade(self, submission_id: str, score: int, feedback: str) -> None:
+        self.db.update(self.table, {"id": submission_id}, {"score": score, "feedback": feedback})
+
+    def grade_many(self, grades: list[tuple[str, int, str]]) -> None:
+        self.db.update_many(self.table, [({"id": sid}, {"score": score, "feedback": feedback})
+                                         for sid, score, feedback in grades])
+
+    def totals(self, assignment_ids: list[str]) -> dict:
+        """Submissions across the assignments; "count" and "score" cover graded ones only."""
+        if not assignment_ids:
+            return {"rows": 0, "count": 0, "score": 0}
+        return self.db.aggregate(self.table, {"assignment_id": assignment_ids},
+                                 sums=("score",), only=("score", 0))
+
+    def delete_for_assignment(self, assignment_id: str) -> None:
+        self.db.delete(self.table, {"assignment_id": assignment_id})
+
+
+class TestRepo:
+    table = "tests"
+
+    def __init__(self, db, results: "TestResultRepo"):
+        self.db = db
+        self.results = results
+
+    def create(self, class_code: str, teacher_email: str, title: str,
+               questions: list, time_limit: int) -> str:
+        tid = new_id()
+        self.db.insert(self.table, [{
+            "id": tid, "class_code": class_code, "teacher_email": teacher_email, "title": title,
+            "questions": json.dumps(questions), "time_limit": time_limit, "created_at": now(),
+        }])
+        return tid
+
+    def list_for_class(self, class_code: str) -> list[dict]:
+        rows = self.db.select(self.table, {"class_code": class_code}, order=[("created_at", True)])
+        for r in rows:
+            try:
+                r["questions"] = json.loads(r["questions"]) if isinstance(r["questions"], str) \
+                    else r["questions"] or []
+            except ValueError:
+                r["questions"] = []
+        return rows
+
+    def delete(self, tid: str) -> None:
+        self.db.delete(self.table, {"id": tid})
+        self.results.delete_for_test(tid)
+
+    def stats(self, class_code: str) -> dict:
+        """Test count plus attempt totals for a class, in two queries."""
+        ids = [r["id"] for r in self.db.select(self.table, {"class_code": class_code}, columns="id")]
+        totals = self.results.totals(ids)
+        return {"count": len(ids), "attempts": totals["rows"],
+                "avgPct": _percent(totals["score"] * 100, totals["total"])}
+
+
+class TestResultRepo:
+    table = "test_submissions"
+
+    def __init__(self, db):
+        self.db = db
+
+    def submit(self, test_id: str, class_code: str, student_email: str, student_name: str,
+               answers: dict, score: int, total: int) -> str:
+        """One result per student per test; a resubmit replaces answers and score."""
+        (rid, _), = self.db.upsert(self.table, [{
+            "id": new_id(), "test_id": test_id, "class_code": class_code,
+            "student_email": student_email, "student_name": student_name,
+            "answers": json.dumps(answers), "score": score, "total": total, "submitted_at": now(),
+        }], key=("test_id", "student_email"))
+        return rid
+
+    def list_for_test(self, test_id: str) -> list[dict]:
+        return self.db.select(self.table, {"test_id": test_id}, order=[("submitted_at", True)])
+
+    def get_for_student(self, test_id: str, student_email: str) -> dict | None:
+        rows = self.db.select(self.table, {"test_id": test_id, "student_email": student_email}, limit=1)
+        return rows[0] if rows else None
+
+    def for_student(self, test_ids: list[str], student_email: str) -> dict[str, dict]:
+        if not test_ids:
+            return {}
+        rows = self.db.select(self.table, {"test_id": test_ids, "student_email": student_email})
+        return {r["test_id"]: r for r in rows}
+
+    def totals(self, test_ids: list[str]) -> dict:
+        if not test_ids:
+            return {"rows": 0, "count": 0, "score": 0, "total": 0}
+        return self.db.aggregate(self.table, {"test_id": test_ids}, sums=("score", "total"))
+
+    def delete_for_test(self, test_id: str) -> None:
+        self.db.delete(self.table, {"test_id": test_id})
+
+
+class AttendanceRepo:
+    table = "attendance"
+
+    def __init__(self, db):
+        self.db = db
+
+    def mark(self, class_code: str, teacher_email: str, student_name: str,
+             session_date: str, present: bool) -> None:
+        self.mark_many(class_code, teacher_email, session_date, [(student_name, present)])
+
+    def mark_many(self, class_code: str, teacher_email: str, session_date: str,
+                  marks: list[tuple[str, bool]]) -> None:
+        """Record a whole register in one batch."""
+        self.db.upsert(self.table, [{
+            "id": new_id(), "class_code": class_code, "student_name": name,
+            "session_date": session_date, "present": 1 if present else 0,
+        } for name, present in marks], key=("class_code", "session_date", "student_name"),
+            defaults={"teacher_email": teacher_email, "created_at": now()})
+
+    def list_for_class(self, class_code: str) -> list[dict]:
+        return self.db.select(self.table, {"class_code": class_code},
+                              order=[("session_date", True), ("student_name", False)])
+
+
+class DiscussionRepo:
+    table = "discussions"
+
+    def __init__(self, db):
+        self.db = db
+
+    def post(self, class_code: str, student_name: str, student_email: str, question: str) -> dict:
+        """Create a post; returns the stored row."""
+        row = {
+            "id": new_id(), "class_code": class_code, "student_name": student_name,
+            "student_email": student_email, "question": question,
+            "reply": "", "replied_by": "", "created_at": now(),
+        }
+        self.db.insert(self.table, [row])
+        return row
+
+    def list_for_class(self, class_code: str) -> list[dict]:
+        return self.db.select(self.table, {"class_code": class_code}, order=[("created_at", True)])
+
+    def reply(self, did: str, reply: str, replied_by: str) -> None:
+        self.db.update(self.table, {"id": did}, {"reply": reply, "replied_by": replied_by})
+
+
+class ReactionRepo:
+    table = "reactions"
+    REPLACE_WINDOW_SECS = 30    # a student's newer reaction replaces one this recent
+    COUNT_WINDOW_SECS = 300
+
+    def __init__(self, db):
+        self.db = db
+
+    def add(self, class_code: str, student_email: str, student_name: str, reaction: str) -> None:
+        self.db.delete(self.table, {"class_code": class_code, "student_email": student_email},
+                       since=("created_at", now(-self.REPLACE_WINDOW_SECS)))
+        self.add_many([{"class_code": class_code, "student_email": student_email,
+                        "student_name": student_name, "reaction": reaction}])
+
+    def add_many(self, reactions: list[dict]) -> None:
+        """Append reactions without the per-student replace (bulk ingestion).
+
+        Reactions that already carry a stored id are skipped, so a replayed batch is harmless.
+        """
+        stamp = now()
+        self.db.insert_new(self.table, [{"id": new_id(), **r, "created_at": r.get("created_at", stamp)}
+                                        for r in reactions])
+
+    def since(self, class_code: str, secs: int = COUNT_WINDOW_SECS) -> list[dict]:
+        """Raw reactions from the last `secs`, oldest first (for replaying into memory)."""
+        return self.db.select(self.table, {"class_code": class_code},
+                              columns="id, student_email, reaction, created_at",
+                              since=("created_at", now(-secs)), order=[("created_at", False)])
+
+    def counts(self, class_code: str, window_secs: int = COUNT_WINDOW_SECS) -> dict[str, int]:
+        rows = self.db.select(self.table, {"class_code": class_code}, columns="reaction",
+                              since=("created_at", now(-window_secs)))
+        counts: dict[str, int] = {}
+        for r in rows:
+            counts[r["reaction"]] = counts.get(r["reaction"], 0) + 1
+        return counts
+
+
+class ConfusionRepo:
+    """Raw confusion events plus the counters the heatmap reads.
+
+    Every event also bumps its slide's row in confusion_slides (events,
+    distinct students, last event) and its minute in confusion_history, so
+    the heatmap costs one small read however many events a lecture gets.
+    The counter tables live on the same backend as the events.
+    """
+    table = "confusion_events"
+    SLIDES = "confusion_slides"
+    STUDENTS = "confusion_students"
+    HISTORY = "confusion_history"
+
+    def __init__(self, db):
+        self.db = db
+
+    def add(self, class_code: str, student_email: str, student_name: str,
+            slide_index: int, slide_title: str) -> dict:
+        """Record one event; returns the stored row."""
+        return self.add_many([{"class_code": class_code, "student_email": student_email,
+                               "student_name": student_name, "slide_index": slide_index,
+                               "slide_title": slide_title}])[0]
+
+    def add_many(self, events: list[dict]) -> list[dict]:
+        """Store events and count them; returns the rows that were new.
+
+        Events whose id is already stored (a replayed batch) are neither
+        stored nor counted again.
+        """
+        stamp = now()
+        rows = self.db.insert_new(self.table, [{"id": new_id(), **e, "created_at": e.get("created_at", stamp)}
+                                               for e in events])
+        if rows:
+            self._count(rows)
+        return rows
+
+    def _count(self, rows: list[dict]) -> None:
+        # Students are keyed by email, or by name when they joined without one
+        students = {(r["class_code"], r["slide_index"], r.get("student_email") or r.get("student_name") or ""): r
+                    for r in rows}
+        seen = self.db.upsert(self.STUDENTS, [
+            {"class_code": code, "slide_index": idx, "student_email": student}
+            for code, idx, student in students], key=("class_code", "slide_index", "student_email"),
+            pk="student_email")
+        new_students = [(key[0], key[1]) for key, (_, existed) in zip(students, seen) if not existed]
+
+        slides: dict[tuple, dict] = {}
+        minutes: dict[tuple, int] = {}
+        for r in sorted(rows, key=lambda r: r["created_at"]):
+            slide = slides.setdefault((r["class_code"], r["slide_index"]), {"events": 0, "students": 0})
+            slide["events"] += 1
+            slide["slide_title"], slide["last_at"] = r.get("slide_title", ""), r["created_at"]
+            minute = (r["class_code"], r["created_at"][:16], r["slide_index"])
+            minutes[minute] = minutes.get(minute, 0) + 1
+        for key in new_students:
+            slides[key]["students"] += 1
+
+        for (code, idx), s in slides.items():
+            self.db.bump(self.SLIDES, {"class_code": code, "slide_index": idx},
+                         {"events": s["events"], "students": s["students"]},
+                         {"slide_title": s["slide_title"], "last_at": s["last_at"]})
+        for (code, minute, idx), n in minutes.items():
+            self.db.bump(self.HISTORY, {"class_code": code, "minute": minute, "slide_index": idx},
+                         {"events": n})
+
+    def slide(self, class_code: str, slide_index: int) -> dict | None:
+        rows = self.heatmap(class_code, slide_index)
+        return rows[0] if rows else None
+
+    def heatmap(self, class_code: str, slide_index: int | None = None) -> list[dict]:
+        """Per-slide counters, each with `rate`: events in the last minute.
+
+        The rate is a sliding estimate from two minute buckets — the current
+        one plus the share of the previous one the window still covers.
+        """
+        where = {"class_code": class_code}
+        if slide_index is not None:
+            where["slide_index"] = slide_index
+        slides = self.db.select(self.SLIDES, where,
+                                columns="slide_index, slide_title, events, students, last_at",
+                                order=[("slide_index", False)])
+        stamp = now()
+        current, previous = stamp[:16], now(-60)[:16]
+        weight = 1 - int(stamp[17:19]) / 60
+        rates: dict[int, float] = {}
+        for r in self.db.select(self.HISTORY, where, since=("minute", now(-120)[:16])):
+            share = 1 if r["minute"] == current else weight if r["minute"] == previous else 0
+            rates[r["slide_index"]] = rates.get(r["slide_index"], 0) + r["events"] * share
+        for s in slides:
+            s["rate"] = round(rates.get(s["slide_index"], 0), 1)
+        return slides
+
+    def history(self, class_code: str, bucket_mins: int = 5) -> list[dict]:
+        """Events per slide in `bucket_mins` buckets over the whole lecture, oldest first."""
+        bucket_mins = min(max(int(bucket_mins), 1), 1440)
+        buckets: dict[str, dict] = {}
+        for r in self.db.select(self.HISTORY, {"class_code": class_code}, order=[("minute", False)]):
+            t = datetime.strptime(r["minute"], "%Y-%m-%d %H:%M")
+            of_day = (t.hour * 60 + t.minute) // bucket_mins * bucket_mins
+            start = t.replace(hour=of_day // 60, minute=of_day % 60).strftime("%Y-%m-%d %H:%M")
+            b = buckets.setdefault(start, {"start": start, "events": 0, "slides": {}})
+            b["events"] += r["events"]
+            b["slides"][r["slide_index"]] = b["slides"].get(r["slide_index"], 0) + r["events"]
+        return list(buckets.values())
+
+    def recent(self, class_code: str, limit: int = 200) -> list[dict]:
+        return self.db.select(self.table, {"class_code": class_code},
+                              columns="student_name, slide_index, slide_title, created_at",
+                              order=[("created_at", True)], limit=limit)
+
+
+class LibraryRepo:
+    table = "lecture_library"
+    LIST_COLUMNS = ("id, teacher_name, teacher_email, title, topic, subject, level, "
+                    "institution, year, view_count, saved_at")
+    # Full-text fields and their weights, in index order (db/migrations.py, db/supabase/)
+    SEARCH_FIELDS = {"topic": 10.0, "title": 8.0, "subject": 4.0, "teacher_name": 4.0, "notes": 1.0}
+    # Match counts are cached per filter until a save or delete; the TTL bounds
+    # how stale another worker's cache can be if its invalidation is missed
+    COUNT_TTL_SECS = 300
+    COUNT_CACHE_MAX = 1000
+    def __init__(self, db, half_life_hours: float = LIBRARY_TRENDING_HALF_LIFE_HOURS):
+        self.db = db
+        self.half_life_secs = half_life_hours * 3600
+        self._counts: dict[tuple, tuple[float, int]] = {}
+        self._counts_lock = threading.Lock()
+
+    def invalidate_counts(self) -> None:
+        with self._counts_lock:
+            self._counts.clear()
+
+    def _count(self, where: dict, search: str) -> int:
+        key = (search, *sorted(where.items()))
+        with self._counts_lock:
+            hit = self._counts.get(key)
+        if hit and hit[0] > time.monotonic():
+            return hit[1]
+        if search:
+            total = self.db.text_count(self.table, self.SEARCH_FIELDS, search, where)
+        else:
+            total = self.db.count(self.table, where)
+        with self._counts_lock:
+            if len(self._counts) >= self.COUNT_CACHE_MAX:
+                del self._counts[next(iter(self._counts))]
+            self._counts[key] = (time.monotonic() + self.COUNT_TTL_SECS, total)
+        return total
+
+    def save(self, d: dict) -> tuple[str, bool]:
+        """Save a teacher's lecture, one entry per (teacher, topic); returns (id, updated)."""
+        (lid, existed), = self.db.upsert(self.table, [{
+            "id": new_id(),
+            "teacher_email": d.get("teacherEmail", ""),
+            "teacher_name": d.get("teacherName", ""),
+            "title": d.get("title", d.get("topic", "")),
+            "topic": d.get("topic", ""),
+            "subject": d.get("subject", ""),
+            "level": d.get("level", "Intermediate"),
+            "institution": d.get("institution", ""),
+            "notes": d.get("notes", ""),
+            "class_code": d.get("classCode", ""),
+            "is_public": bool(d.get("isPublic", True)),
+            "saved_at": now(),
+            "year": str(datetime.now().year),
+        }], key=("teacher_email", "topic"), defaults={"view_count": 0, "trend_score": 0, "trend_at": 0, "trend_rank": 0})
+        self.invalidate_counts()
+        return lid, existed
+
+    def add_views(self, views: dict[str, int], at: float | None = None) -> None:
+        """Add view counts per lecture id, seen at `at`, in one bulk update.
+
+        trend_score is the views decayed with the half-life, as of trend_at
+        (the last view); trend_rank orders lectures by it (see backends.Decay).
+        """
+        decay = Decay("trend_score", "trend_at", "trend_rank", time.time() if at is None else at,
+                      self.half_life_secs)
+        self.db.increment_many(self.table, {lid: {"view_count": n, "trend_score": n} for lid, n in views.items()},
+                               decay=decay)
+
+    def trending(self, limit: int = 10, level: str = "", year: str = "") -> list[dict]:
+        """Public lectures by decayed view rate, each with `views_per_hour` now."""
+        where = {"is_public": True}
+        if level:
+            where["level"] = level
+        if year:
+            where["year"] = year
+        rows = self.db.select(self.table, where, columns=self.LIST_COLUMNS + ", trend_score, trend_at",
+                              order=[("trend_rank", True), ("id", True)], limit=limit)
+        # Decayed views as of now -> exponentially weighted views per hour
+        now_secs, scale = time.time(), math.log(2) / (self.half_life_secs / 3600)
+        for r in rows:
+            age = now_secs - (r.pop("trend_at") or now_secs)
+            decayed = (r.pop("trend_score") or 0) * 2 ** (-max(age, 0) / self.half_life_secs)
+            r["views_per_hour"] = round(decayed * scale, 2)
+        return [r for r in rows if r["views_per_hour"] > 0]
+
+    def list(self, search: str = "", level: str = "", year: str = "", teacher_email: str = "",
+             page: int = 1, per_page: int = 20, cursor: str = "") -> tuple[list[dict], int, str | None]:
+        """One page of public lectures, the total match count and the next page's cursor.
+
+        Browsing is newest first, searching is by relevance; both page by
+        keyset from `cursor` (None once there are no more rows). Without a
+        cursor, `page` still selects a page by offset.
+        """
+        where = {"is_public": True}
+        if level:
+            where["level"] = level
+        if year:
+            where["year"] = year
+        if teacher_email:
+            where["teacher_email"] = teacher_email
+        after = _decode_cursor(cursor) if cursor else None
+        if after and (len(after) != 3 or after[0] != ("rank" if search else "saved_at")):
+            raise ValueError("Invalid cursor")
+        if search:
+            rows = self.db.text_search(self.table, self.SEARCH_FIELDS, search, where,
+                                       columns=self.LIST_COLUMNS, limit=per_page + 1,
+                                       offset=0 if after else (page - 1) * per_page,
+                                       after=after[1:] if after else None)
+        else:
+            rows = self.db.select(self.table, where, columns=self.LIST_COLUMNS,
+                                  order=[("saved_at", True), ("id", True)], limit=per_page + 1,
+                                  offset=0 if after else (page - 1) * per_page,
+                                  after=after[1:] if after else None)
+        more, rows = len(rows) > per_page, rows[:per_page]
+        next_cursor = None
+        if more:
+            last = rows[-1]
+            next_cursor = _encode_cursor("rank", last["rank"], last["id"]) if search \
+                else _encode_cursor("saved_at", last["saved_at"], last["id"])
+        for r in rows:
+            r.pop("rank", None)
+        return rows, self._count(where, search), next_cursor
+
+    def get(self, lid: str) -> dict | None:
+        """The full lecture; views are counted separately (services/library_views.py)."""
+        rows = self.db.select(self.table, {"id": lid}, limit=1)
+        return rows[0] if rows else None
+
+    def delete(self, lid: str, teacher_email: str) -> None:
+        self.db.delete(self.table, {"id": lid, "teacher_email": teacher_email})
+        self.invalidate_counts()
@@ -0,0 +1,29 @@
+"""A fresh database migrates to LATEST, and every hot query then uses its index.
+
+    cd server && python -m unittest discover tests
+"""
+import sqlite3
+import unittest
+from db.migrations import LATEST, check, current_version, migrate
+
+
+class MigrationsTest(unittest.TestCase):
+    def setUp(self):
+        self.conn = sqlite3.connect(":memory:", isolation_level=None)
+        self.addCleanup(self.conn.close)
+
+    def test_fresh_database_reaches_latest(self):
+        self.assertEqual(migrate(self.conn), LATEST)
+        self.assertEqual(current_version(self.conn), LATEST)
+
+    def test_migrating_again_is_a_no_op(self):
+        migrate(self.conn)
+        self.assertEqual(migrate(self.conn), LATEST)
+
+    def test_hot_queries_use_their_indexes(self):
+        migrate(self.conn)
+        self.assertEqual(check(self.conn), [])
+
+
+if __name__ == "__main__":
+    unittest.main()